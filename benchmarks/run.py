@@ -0,0 +1,233 @@
+"""
+Benchmark suite for ClipKIT.
+
+Generates synthetic aa and nt alignments over a grid of taxa x sites x gap
+rates and trims each one with every trimming mode, with and without codon
+trimming and complement output. Every run happens in a fresh process that
+records the wall time of trimming and writing and the peak RSS of the
+process.
+
+usage (from the repository root):
+    python3 benchmarks/run.py -o results.json
+    python3 benchmarks/run.py --baseline benchmarks/baseline.json
+    python3 benchmarks/run.py --save_baseline benchmarks/baseline.json
+
+Timings depend on the machine, so the baseline is not committed: record
+it with --save_baseline (make benchmark.baseline) on the machine that runs
+the comparison, before the changes being measured.
+"""
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from itertools import product
+
+from generate import generate_alignment, write_fasta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from clipkit.modes import TrimmingMode  # noqa: E402
+from clipkit.profiling import peak_rss  # noqa: E402
+from clipkit.version import __version__  # noqa: E402
+
+# fields that identify a benchmark case
+CASE_FIELDS = (
+    "seq_type",
+    "taxa",
+    "sites",
+    "gap_rate",
+    "mode",
+    "codon",
+    "complement",
+)
+
+
+def measure(input_file, output_file, mode, codon, complement, results):
+    """
+    Runs in a fresh process: trims input_file once and reports the time it
+    took and the peak RSS of the process
+    """
+    from clipkit.clipkit import execute
+
+    # import what execute imports lazily so that it is not timed
+    from clipkit import files, helpers, msa, smart_gap_helper  # noqa: F401
+
+    start = time.perf_counter()
+    execute(
+        input_file=input_file,
+        input_file_format="fasta",
+        output_file=output_file,
+        output_file_format="fasta",
+        sequence_type=None,
+        gaps=0.9,
+        gap_characters=None,
+        complement=complement,
+        codon=codon,
+        mode=TrimmingMode(mode),
+        use_log=False,
+        quiet=True,
+    )
+    results.put(dict(wall_time=time.perf_counter() - start, peak_rss=peak_rss()))
+
+
+def run_case(context, input_file, output_file, mode, codon, complement) -> dict:
+    results = context.Queue()
+    process = context.Process(
+        target=measure,
+        args=(input_file, output_file, mode, codon, complement, results),
+    )
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(
+            f"Trimming {input_file} with mode={mode} codon={codon} "
+            f"complement={complement} failed"
+        )
+    return results.get()
+
+
+def run_benchmarks(args) -> list[dict]:
+    context = multiprocessing.get_context("spawn")
+    cases = []
+    with tempfile.TemporaryDirectory() as directory:
+        for seq_type, taxa, sites, gap_rate in product(
+            args.seq_types, args.taxa, args.sites, args.gap_rates
+        ):
+            input_file = os.path.join(
+                directory, f"{seq_type}_{taxa}_{sites}_{gap_rate}.fa"
+            )
+            write_fasta(input_file, generate_alignment(taxa, sites, gap_rate, seq_type))
+            output_file = f"{input_file}.clipkit"
+
+            for mode, codon, complement in product(
+                args.modes, (False, True), (False, True)
+            ):
+                if codon and mode == TrimmingMode.c3.value:
+                    # incompatible options
+                    continue
+                runs = [
+                    run_case(context, input_file, output_file, mode, codon, complement)
+                    for _ in range(args.repeat)
+                ]
+                case = dict(
+                    seq_type=seq_type,
+                    taxa=taxa,
+                    sites=sites,
+                    gap_rate=gap_rate,
+                    mode=mode,
+                    codon=codon,
+                    complement=complement,
+                    wall_time=min(run["wall_time"] for run in runs),
+                    peak_rss=max(run["peak_rss"] or 0 for run in runs),
+                )
+                cases.append(case)
+                print(
+                    f"{seq_type} taxa={taxa} sites={sites} gaps={gap_rate} "
+                    f"mode={mode} codon={codon} complement={complement}: "
+                    f"{case['wall_time']:.4f}s {case['peak_rss'] / 2**20:.1f} MiB",
+                    flush=True,
+                )
+    return cases
+
+
+def case_key(case: dict) -> tuple:
+    return tuple(case[field] for field in CASE_FIELDS)
+
+
+def find_regressions(
+    cases: list[dict], baseline: list[dict], tolerance: float, min_time: float
+) -> list[str]:
+    """
+    Cases that are slower, or use more memory, than the baseline by more
+    than tolerance (a fraction). Time differences below min_time seconds
+    are ignored as noise.
+    """
+    baseline_cases = {case_key(case): case for case in baseline}
+    regressions = []
+    for case in cases:
+        expected = baseline_cases.get(case_key(case))
+        if expected is None:
+            continue
+        name = " ".join(f"{field}={case[field]}" for field in CASE_FIELDS)
+        if (
+            case["wall_time"] > expected["wall_time"] * (1 + tolerance)
+            and case["wall_time"] - expected["wall_time"] > min_time
+        ):
+            regressions.append(
+                f"{name}: time {expected['wall_time']:.4f}s -> {case['wall_time']:.4f}s"
+            )
+        if case["peak_rss"] > expected["peak_rss"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: peak RSS {expected['peak_rss'] / 2**20:.1f} MiB"
+                f" -> {case['peak_rss'] / 2**20:.1f} MiB"
+            )
+    return regressions
+
+
+def create_parser() -> ArgumentParser:
+    def values(cast):
+        return lambda text: [cast(value) for value in text.split(",")]
+
+    parser = ArgumentParser(description="Benchmark ClipKIT on synthetic alignments")
+    parser.add_argument("--seq_types", type=values(str), default=["aa", "nt"])
+    parser.add_argument("--taxa", type=values(int), default=[10, 100])
+    parser.add_argument("--sites", type=values(int), default=[1200, 12000])
+    parser.add_argument("--gap_rates", type=values(float), default=[0.1, 0.5])
+    parser.add_argument(
+        "--modes",
+        type=values(str),
+        default=[mode.value for mode in TrimmingMode],
+    )
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("-o", "--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this JSON file")
+    parser.add_argument("--save_baseline", help="write results as a new baseline")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed slowdown or memory growth as a fraction (default: 0.25)",
+    )
+    parser.add_argument(
+        "--min_time",
+        type=float,
+        default=0.01,
+        help="ignore time differences below this many seconds (default: 0.01)",
+    )
+    return parser
+
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+    cases = run_benchmarks(args)
+
+    report = dict(
+        clipkit_version=__version__,
+        python=platform.python_version(),
+        platform=platform.platform(),
+        cases=cases,
+    )
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as handle:
+                json.dump(report, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)["cases"]
+        regressions = find_regressions(
+            cases, baseline, args.tolerance, args.min_time
+        )
+        if regressions:
+            print(f"\n{len(regressions)} regressions against {args.baseline}:")
+            print("\n".join(regressions))
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1 +1 @@
-from .api import clipkit
+from .api import clipkit, clipkit_batch
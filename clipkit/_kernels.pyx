@@ -0,0 +1,155 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Compiled versions of the hot loops in clipkit.kernels.
+
+Every function here has a pure numpy counterpart in clipkit/kernels.py with
+the same signature and results; that module decides which one is used.
+"""
+import numpy as np
+
+
+def fasta_to_byte_matrix(const unsigned char[::1] data):
+    cdef Py_ssize_t size = data.shape[0]
+    cdef Py_ssize_t i = 0, line_end
+    cdef Py_ssize_t row = -1, col = 0, length = -1, record_length = 0
+    cdef unsigned char c
+
+    if size == 0 or data[0] != b">":
+        raise ValueError("Not a FASTA file")
+
+    # first pass: titles and sequence lengths
+    titles = []
+    while i < size:
+        line_end = i
+        while line_end < size and data[line_end] != b"\n":
+            line_end += 1
+        if data[i] == b">":
+            if row >= 0:
+                if length == -1:
+                    length = record_length
+                elif record_length != length:
+                    raise ValueError("Sequences must all be the same length")
+            row += 1
+            record_length = 0
+            titles.append(bytes(data[i + 1:line_end]).rstrip())
+        else:
+            while i < line_end:
+                c = data[i]
+                if c != b" " and c != b"\t" and c != b"\r":
+                    record_length += 1
+                i += 1
+        i = line_end + 1
+    if length == -1:
+        length = record_length
+    elif record_length != length:
+        raise ValueError("Sequences must all be the same length")
+
+    matrix = np.empty((len(titles), length), dtype=np.uint8)
+    cdef unsigned char[:, ::1] out = matrix
+
+    # second pass: copy residues
+    i = 0
+    row = -1
+    while i < size:
+        line_end = i
+        while line_end < size and data[line_end] != b"\n":
+            line_end += 1
+        if data[i] == b">":
+            row += 1
+            col = 0
+        else:
+            while i < line_end:
+                c = data[i]
+                if c != b" " and c != b"\t" and c != b"\r":
+                    out[row, col] = c
+                    col += 1
+                i += 1
+        i = line_end + 1
+
+    return titles, matrix
+
+
+def count_states(
+    const unsigned char[:, :] matrix,
+    const Py_ssize_t[::1] state_index,
+    Py_ssize_t n_states,
+):
+    cdef Py_ssize_t n_rows = matrix.shape[0], n_cols = matrix.shape[1]
+    cdef Py_ssize_t row, col, state
+    counts = np.zeros((n_states, n_cols), dtype=np.int32)
+    cdef int[:, ::1] out = counts
+
+    for row in range(n_rows):
+        for col in range(n_cols):
+            state = state_index[matrix[row, col]]
+            if state >= 0:
+                out[state, col] += 1
+    return counts
+
+
+def count_weighted_states(
+    const unsigned char[:, :] matrix,
+    const int[::1] weights,
+    const Py_ssize_t[::1] state_index,
+    Py_ssize_t n_states,
+):
+    cdef Py_ssize_t n_rows = matrix.shape[0], n_cols = matrix.shape[1]
+    cdef Py_ssize_t row, col, state
+    cdef int weight
+    counts = np.zeros((n_states, n_cols), dtype=np.int32)
+    cdef int[:, ::1] out = counts
+
+    for row in range(n_rows):
+        weight = weights[row]
+        for col in range(n_cols):
+            state = state_index[matrix[row, col]]
+            if state >= 0:
+                out[state, col] += weight
+    return counts
+
+
+def unpack_nibbles(
+    const unsigned char[:, :] packed,
+    const unsigned char[::1] high_bytes,
+    const unsigned char[::1] low_bytes,
+    Py_ssize_t n_rows,
+):
+    cdef Py_ssize_t n_cols = packed.shape[1]
+    cdef Py_ssize_t row, col
+    cdef unsigned char byte
+    matrix = np.empty((n_rows, n_cols), dtype=np.uint8)
+    cdef unsigned char[:, ::1] out = matrix
+
+    for row in range(n_rows):
+        if row % 2 == 0:
+            for col in range(n_cols):
+                out[row, col] = high_bytes[packed[row // 2, col]]
+        else:
+            for col in range(n_cols):
+                out[row, col] = low_bytes[packed[row // 2, col]]
+    return matrix
+
+
+def write_fasta(
+    handle,
+    list titles,
+    const unsigned char[:, :] matrix,
+    const Py_ssize_t[::1] positions,
+    Py_ssize_t wrap,
+):
+    cdef Py_ssize_t n_rows = matrix.shape[0], n_positions = positions.shape[0]
+    cdef Py_ssize_t n_lines = (n_positions + wrap - 1) // wrap
+    cdef Py_ssize_t row, idx, offset
+    buffer = bytearray(n_positions + n_lines)
+    cdef unsigned char[::1] out = buffer
+
+    for row in range(n_rows):
+        offset = 0
+        for idx in range(n_positions):
+            out[offset] = matrix[row, positions[idx]]
+            offset += 1
+            if (idx + 1) % wrap == 0 or idx + 1 == n_positions:
+                out[offset] = b"\n"
+                offset += 1
+        handle.write(b">" + titles[row] + b"\n")
+        handle.write(buffer)
@@ -1,16 +1,65 @@
-from typing import TextIO, Union
-from tempfile import NamedTemporaryFile
+import json
+import os
+from collections import deque
+from dataclasses import dataclass
+from functools import partial
+from typing import TYPE_CHECKING, BinaryIO, Iterable, Iterator, TextIO, Union
 
-from .clipkit import run
-from .files import FileFormat
-from .helpers import SeqType, write_msa
+from .clipkit import trim_alignment, TrimRun
+from .file_formats import FileFormat
 from .logger import logger
 from .modes import TrimmingMode
+from .profiling import StageProfile
+from .seq_types import SeqType
+from .settings import DEFAULT_GAPS
+from .stats import TrimmingStats
+from .version import __version__ as current_version
+
+# importing clipkit must stay cheap (see clipkit.clipkit), so numpy and
+# Biopython are imported by the functions that use them
+if TYPE_CHECKING:
+    import numpy as np
+    from Bio.Align import MultipleSeqAlignment
+    from .msa import MSA
+
+
+AlignmentInput = Union[
+    str, bytes, BinaryIO, TextIO, "MultipleSeqAlignment", "np.ndarray"
+]
+
+
+def read_alignment_input(
+    alignment: AlignmentInput,
+    input_file_format: Union[FileFormat, None],
+    sequence_ids=None,
+) -> tuple[Union["MultipleSeqAlignment", "MSA"], FileFormat]:
+    """
+    Reads an alignment held in memory: the text or bytes of an alignment
+    file, a file-like object, a Biopython alignment or a numpy matrix of
+    characters (one row per sequence, named by sequence_ids)
+    """
+    import numpy as np
+    from Bio.Align import MultipleSeqAlignment
+    from .files import read_alignment
+    from .msa import MSA
+
+    if isinstance(alignment, MultipleSeqAlignment):
+        return alignment, input_file_format or FileFormat.fasta
+    if isinstance(alignment, np.ndarray):
+        return (
+            MSA.from_matrix(alignment, sequence_ids),
+            input_file_format or FileFormat.fasta,
+        )
+    if hasattr(alignment, "read"):
+        alignment = alignment.read()
+    if isinstance(alignment, str):
+        alignment = alignment.encode("utf-8")
+    return read_alignment(alignment, input_file_format)
 
 
 def clipkit(
     *,
-    raw_alignment: Union[str, None] = None,
+    raw_alignment: Union[AlignmentInput, None] = None,
     input_file_path: Union[str, None] = None,
     output_file_path: Union[str, None] = None,
     mode: TrimmingMode = TrimmingMode.smart_gap,
@@ -20,42 +69,43 @@ def clipkit(
     output_file_format=FileFormat.fasta,
     sequence_type=SeqType.aa,
     codon: bool = False,
+    sequence_ids=None,
 ) -> TextIO:
     """
     If input_file_path is given with no output_file_path -> Bio MSA (multiple sequence alignment object)
     If input_file_path is given and output_file_path is given -> write to output file
-    If raw_alignment is given we write it to NamedTemporaryFile and then pass to execute
+    If raw_alignment is given it is read in memory, without temporary files
+        * raw_alignment may be a str, bytes, a file-like object, a Bio MSA,
+          or a numpy matrix of characters whose rows are named by sequence_ids
         * handles when output_file_path is given and also when not given
     """
-    logger.disabled = True
-    output_temp_file = None
-    input_temp_file = None
-    if raw_alignment:
-        input_temp_file = NamedTemporaryFile()
-        input_temp_file.write(bytes(raw_alignment, "utf-8"))
-        input_temp_file.flush()
+    from .files import read_alignment
+    from .helpers import write_msa
 
-    if not output_file_path:
-        output_temp_file = NamedTemporaryFile()
+    logger.disabled = True
 
-    # override some options not currently available through programmatic interface
-    complement = False
-    use_log = False
-    quiet = True
+    profile = StageProfile()
+    if raw_alignment is not None:
+        with profile.stage("read", unit="bytes"):
+            alignment, input_file_format = read_alignment_input(
+                raw_alignment, input_file_format, sequence_ids
+            )
+    else:
+        with profile.stage("read", os.path.getsize(input_file_path), "bytes"):
+            alignment, input_file_format = read_alignment(
+                input_file_path, input_file_format
+            )
 
-    trim_run, stats = run(
-        input_temp_file.name if input_temp_file else input_file_path,
+    trim_run, stats = trim_alignment(
+        alignment,
         input_file_format,
-        output_temp_file.name if output_temp_file else output_file_path,
         output_file_format,
         sequence_type,
         gaps,
         gap_characters,
-        complement,
         codon,
         TrimmingMode(mode),
-        use_log,
-        quiet,
+        profile=profile,
     )
 
     if not output_file_path:
@@ -63,3 +113,174 @@ def clipkit(
     else:
         write_msa(trim_run.msa, output_file_path, trim_run.output_file_format)
         return output_file_path, stats
+
+
+@dataclass(frozen=True)
+class BatchSettings:
+    """
+    Trimming options shared by every alignment of a batch, resolved once
+    """
+
+    mode: TrimmingMode
+    gaps: float
+    gap_characters: Union[list, None]
+    input_file_format: Union[FileFormat, None]
+    output_file_format: Union[FileFormat, None]
+    sequence_type: Union[SeqType, None]
+    codon: bool
+
+    @classmethod
+    def resolve(
+        cls,
+        mode=TrimmingMode.smart_gap,
+        gaps=None,
+        gap_characters=None,
+        input_file_format=None,
+        output_file_format=None,
+        sequence_type=None,
+        codon=False,
+    ) -> "BatchSettings":
+        from .helpers import get_gap_chars
+
+        sequence_type = SeqType(sequence_type) if sequence_type else None
+        if gap_characters:
+            gap_characters = list(gap_characters)
+        elif sequence_type:
+            gap_characters = get_gap_chars(sequence_type)
+        else:
+            # depends on the sequence type detected for each alignment
+            gap_characters = None
+
+        return cls(
+            mode=TrimmingMode(mode),
+            gaps=DEFAULT_GAPS if gaps is None else gaps,
+            gap_characters=gap_characters,
+            input_file_format=FileFormat(input_file_format)
+            if input_file_format
+            else None,
+            output_file_format=FileFormat(output_file_format)
+            if output_file_format
+            else None,
+            sequence_type=sequence_type,
+            codon=codon,
+        )
+
+    def trim(
+        self,
+        alignment: Union["MultipleSeqAlignment", "MSA"],
+        input_file_format: FileFormat,
+    ) -> tuple[TrimRun, TrimmingStats]:
+        return trim_alignment(
+            alignment,
+            input_file_format,
+            self.output_file_format,
+            self.sequence_type,
+            self.gaps,
+            self.gap_characters,
+            self.codon,
+            self.mode,
+        )
+
+    def key(self, **extra) -> str:
+        """
+        Stable description of the settings (plus any extra options that
+        affect the output), used to tell runs apart
+        """
+        return json.dumps(
+            {
+                **extra,
+                "mode": self.mode.value,
+                "gaps": self.gaps,
+                "gap_characters": self.gap_characters,
+                "input_file_format": getattr(self.input_file_format, "value", None),
+                "output_file_format": getattr(self.output_file_format, "value", None),
+                "sequence_type": getattr(self.sequence_type, "value", None),
+                "codon": self.codon,
+                "version": current_version,
+            },
+            sort_keys=True,
+        )
+
+
+def read_batch_input(
+    batch_input: Union[os.PathLike, AlignmentInput],
+    input_file_format: Union[FileFormat, None],
+) -> tuple[Union["MultipleSeqAlignment", "MSA"], FileFormat]:
+    """
+    Paths are read from disk, strings containing a newline are parsed as
+    raw alignments and anything else is read by read_alignment_input
+    """
+    from .files import read_alignment
+
+    if isinstance(batch_input, os.PathLike) or (
+        isinstance(batch_input, str) and "\n" not in batch_input
+    ):
+        return read_alignment(os.fspath(batch_input), input_file_format)
+    return read_alignment_input(batch_input, input_file_format)
+
+
+def trim_batch_input(
+    batch_input: Union[os.PathLike, AlignmentInput],
+    settings: BatchSettings,
+) -> tuple[TrimRun, TrimmingStats]:
+    logger.disabled = True
+    alignment, input_file_format = read_batch_input(
+        batch_input, settings.input_file_format
+    )
+    return settings.trim(alignment, input_file_format)
+
+
+def clipkit_batch(
+    inputs: Iterable[Union[os.PathLike, AlignmentInput]],
+    *,
+    mode: TrimmingMode = TrimmingMode.smart_gap,
+    gaps: Union[float, None] = None,
+    gap_characters=None,
+    input_file_format=None,
+    output_file_format=None,
+    sequence_type=None,
+    codon: bool = False,
+    workers: Union[int, None] = None,
+    max_pending: Union[int, None] = None,
+) -> Iterator[tuple[object, TrimRun, TrimmingStats]]:
+    """
+    Lazily trims every alignment of inputs and yields (input, TrimRun, TrimmingStats)
+    in the order the inputs were given.
+
+    Inputs may be file paths, raw alignment strings or bytes, Biopython
+    alignments or numpy character matrices; nothing is written to disk. The file format is auto-detected per input
+    unless input_file_format is given.
+
+    Alignments are trimmed by a pool of worker processes (default: one per CPU;
+    workers=1 trims in the calling process). No more than max_pending inputs
+    (default: twice the number of workers) are read ahead of the caller.
+    """
+    from .parallel import bounded_map
+
+    logger.disabled = True
+    settings = BatchSettings.resolve(
+        mode=mode,
+        gaps=gaps,
+        gap_characters=gap_characters,
+        input_file_format=input_file_format,
+        output_file_format=output_file_format,
+        sequence_type=sequence_type,
+        codon=codon,
+    )
+
+    # inputs are kept on this side of the pool so they are not sent back
+    pending_inputs = deque()
+
+    def remember(inputs):
+        for batch_input in inputs:
+            pending_inputs.append(batch_input)
+            yield batch_input
+
+    results = bounded_map(
+        partial(trim_batch_input, settings=settings),
+        remember(inputs),
+        workers=workers,
+        max_pending=max_pending,
+    )
+    for trim_run, stats in results:
+        yield pending_inputs.popleft(), trim_run, stats
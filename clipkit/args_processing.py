@@ -2,9 +2,10 @@ import logging
 import os.path
 import sys
 
-from .helpers import SeqType
+from .cache import parse_size
+from .seq_types import SeqType
 from .modes import TrimmingMode
-from .settings import DEFAULT_AA_GAP_CHARS
+from .settings import DEFAULT_AA_GAP_CHARS, DEFAULT_GAPS
 
 logger = logging.getLogger(__name__)
 
@@ -28,13 +29,29 @@ def process_args(args) -> dict:
     complement = args.complementary or False
     codon = args.codon or False
     mode = TrimmingMode(args.mode) if args.mode else TrimmingMode.smart_gap
-    gaps = float(args.gaps) if args.gaps is not None else 0.9
+    gaps = float(args.gaps) if args.gaps is not None else DEFAULT_GAPS
     gap_characters = (
         [c for c in args.gap_characters] if args.gap_characters is not None else None
     )
     use_log = args.log or False
     quiet = args.quiet or False
     sequence_type = SeqType(args.sequence_type.lower()) if args.sequence_type else None
+    cache_dir = args.cache_dir
+    cache_max_size = parse_size(args.cache_max_size) if cache_dir else None
+    state_file = args.state
+    save_state = args.save_state or False
+    profile = args.profile or False
+    blocks = args.blocks or False
+    split_blocks = args.split_blocks or False
+    workers = args.workers
+    protein_file = args.protein_alignment
+    mask_file = args.apply_mask
+    save_mask = args.save_mask or False
+    coordinate_map = args.coordinate_map or False
+
+    if state_file is not None and not os.path.isfile(state_file):
+        logger.warning("State file does not exist")
+        sys.exit()
 
     if codon and mode == TrimmingMode.c3:
         logger.warning(
@@ -42,11 +59,63 @@ def process_args(args) -> dict:
         )
         sys.exit()
 
+    if blocks and (complement or use_log or state_file or save_state):
+        logger.warning(
+            "Block-wise trimming does not support complementary output, log files or column states."
+        )
+        sys.exit()
+
+    if protein_file is not None:
+        if not os.path.isfile(protein_file):
+            logger.warning("Protein alignment does not exist")
+            sys.exit()
+        if mode == TrimmingMode.c3 or use_log or state_file or save_state or blocks:
+            logger.warning(
+                "Trimming by a protein alignment does not support c3 mode, log files, column states or blocks."
+            )
+            sys.exit()
+
+    if mask_file is not None:
+        if not os.path.isfile(mask_file):
+            logger.warning("Mask file does not exist")
+            sys.exit()
+        if state_file or protein_file or blocks:
+            logger.warning(
+                "Trimming by a saved mask does not support column states, protein alignments or blocks."
+            )
+            sys.exit()
+
+    # a single output format is passed on as is
+    output_file_format = args.output_file_format
+    if output_file_format is not None and len(output_file_format) == 1:
+        output_file_format = output_file_format[0]
+
+    several_formats = isinstance(output_file_format, list)
+    if (save_mask or coordinate_map or several_formats) and blocks:
+        logger.warning(
+            "Block-wise trimming does not support saving masks or coordinate maps, or several output formats."
+        )
+        sys.exit()
+
+    if blocks and (cache_dir or profile or args.profile_json or args.memory_report):
+        logger.warning(
+            "Block-wise trimming does not support caching, profiles or memory reports."
+        )
+        sys.exit()
+
+    if split_blocks and not blocks:
+        logger.warning("--split_blocks only applies to block-wise trimming (--blocks).")
+        sys.exit()
+
+    if workers is not None and not blocks:
+        logger.warning("-w/--workers only applies to block-wise trimming (--blocks).")
+        sys.exit()
+
     return dict(
         input_file=input_file,
         output_file=output_file,
         input_file_format=args.input_file_format,
-        output_file_format=args.output_file_format,
+        output_file_format=output_file_format,
         codon=codon,
         sequence_type=sequence_type,
         complement=complement,
@@ -55,4 +124,18 @@ def process_args(args) -> dict:
         mode=mode,
         use_log=use_log,
         quiet=quiet,
+        cache_dir=cache_dir,
+        cache_max_size=cache_max_size,
+        state_file=state_file,
+        save_state=save_state,
+        profile=profile,
+        profile_json=args.profile_json,
+        memory_report=args.memory_report,
+        blocks=blocks,
+        split_blocks=split_blocks,
+        workers=workers,
+        protein_file=protein_file,
+        mask_file=mask_file,
+        save_mask=save_mask,
+        coordinate_map=coordinate_map,
     )
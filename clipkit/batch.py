@@ -0,0 +1,473 @@
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import TYPE_CHECKING, Iterable, Iterator, Union
+
+from .api import BatchSettings
+from .exceptions import DuplicateBatchOutput, InvalidShard
+from .logger import logger
+from .modes import TrimmingMode
+from .parser import create_batch_parser
+
+if TYPE_CHECKING:
+    from Bio.Align import MultipleSeqAlignment
+
+    from .clipkit import TrimRun
+    from .file_formats import FileFormat
+    from .msa import MSA
+    from .stats import TrimmingStats
+
+
+@dataclass(frozen=True)
+class Shard:
+    """
+    Selects one of count disjoint parts of a batch (index is 1-based)
+    """
+
+    index: int
+    count: int
+
+    @classmethod
+    def parse(cls, shard: str) -> "Shard":
+        try:
+            index, count = (int(part) for part in shard.split("/"))
+        except ValueError:
+            raise InvalidShard(f"Shard must look like i/N, got '{shard}'")
+        if count < 1 or not 1 <= index <= count:
+            raise InvalidShard(f"Shard index must be between 1 and N, got '{shard}'")
+        return cls(index, count)
+
+    def __contains__(self, input_file: str) -> bool:
+        # hash the path rather than use the position in the input list so that
+        # every process agrees on the split regardless of argument order
+        digest = hashlib.sha1(input_file.encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big") % self.count == self.index - 1
+
+
+class Manifest:
+    """
+    SQLite record of the inputs a batch run has completed.
+
+    An input is done once its output has been written; the row stores the
+    input hash, the trimming parameters and the resulting TrimmingStats.
+    Writing an output invalidates the rows of other parameters for it.
+    Inputs that could not be read, trimmed or written are kept in a table
+    of their own, with the error, until a later run completes them.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # several shards may share one manifest, so wait for their writes
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS completed (
+                input_file TEXT NOT NULL,
+                params TEXT NOT NULL,
+                input_hash TEXT NOT NULL,
+                output_file TEXT NOT NULL,
+                alignment_length INTEGER NOT NULL,
+                output_length INTEGER NOT NULL,
+                trimmed_length INTEGER NOT NULL,
+                trimmed_percentage REAL NOT NULL,
+                completed_at REAL NOT NULL,
+                PRIMARY KEY (input_file, params)
+            )
+            """
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS failed (
+                input_file TEXT NOT NULL,
+                params TEXT NOT NULL,
+                input_hash TEXT,
+                error TEXT NOT NULL,
+                failed_at REAL NOT NULL,
+                PRIMARY KEY (input_file, params)
+            )
+            """
+        )
+        self.connection.commit()
+
+    def completed_hash(self, input_file: str, params: str) -> Union[str, None]:
+        row = self.connection.execute(
+            "SELECT input_hash FROM completed WHERE input_file = ? AND params = ?",
+            (input_file, params),
+        ).fetchone()
+        return row[0] if row else None
+
+    def record(
+        self,
+        input_file: str,
+        params: str,
+        input_hash: str,
+        output_file: str,
+        summary: dict,
+    ) -> None:
+        self.connection.execute(
+            "INSERT OR REPLACE INTO completed VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                input_file,
+                params,
+                input_hash,
+                output_file,
+                summary["alignment_length"],
+                summary["output_length"],
+                summary["trimmed_length"],
+                summary["trimmed_percentage"],
+                time.time(),
+            ),
+        )
+        # outputs are named after the input only, so a run with other
+        # parameters overwrote the output recorded by any other row for it
+        self.connection.execute(
+            "DELETE FROM completed WHERE output_file = ? "
+            "AND NOT (input_file = ? AND params = ?)",
+            (output_file, input_file, params),
+        )
+        self.connection.execute(
+            "DELETE FROM failed WHERE input_file = ? AND params = ?",
+            (input_file, params),
+        )
+        # commit per input so that a pre-empted job loses at most the work in flight
+        self.connection.commit()
+
+    def record_failure(
+        self,
+        input_file: str,
+        params: str,
+        input_hash: Union[str, None],
+        error: str,
+    ) -> None:
+        self.connection.execute(
+            "INSERT OR REPLACE INTO failed VALUES (?, ?, ?, ?, ?)",
+            (input_file, params, input_hash, error, time.time()),
+        )
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+@dataclass(frozen=True)
+class BatchJob:
+    input_file: str
+    output_file: str
+    # hash recorded by a previous run with the same parameters, if any
+    completed_hash: Union[str, None] = None
+
+
+@dataclass(frozen=True)
+class BatchJobResult:
+    job: BatchJob
+    # None if the input could not be read
+    input_hash: Union[str, None]
+    summary: Union[dict, None]
+    # why the input could not be read, trimmed or written
+    error: Union[str, None] = None
+
+    @property
+    def skipped(self) -> bool:
+        return self.summary is None and self.error is None
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+
+@dataclass(frozen=True)
+class BatchJobInput:
+    job: BatchJob
+    input_hash: Union[str, None]
+    # None when the job was already completed and is skipped, or failed
+    alignment: Union["MSA", "MultipleSeqAlignment", None] = None
+    input_file_format: Union["FileFormat", None] = None
+    error: Union[str, None] = None
+
+    @property
+    def skipped(self) -> bool:
+        return self.alignment is None
+
+
+def describe_error(error: Exception) -> str:
+    return f"{type(error).__name__}: {error}"
+
+
+# every stage below turns an error into a failed result of its input, so
+# that one unreadable alignment does not stop the rest of the batch
+
+
+def read_batch_job(job: BatchJob, settings: BatchSettings) -> BatchJobInput:
+    from .files import read_alignment
+
+    try:
+        with open(job.input_file, "rb") as handle:
+            data = handle.read()
+    except OSError as e:
+        return BatchJobInput(job, None, error=describe_error(e))
+    input_hash = hashlib.sha256(data).hexdigest()
+
+    if input_hash == job.completed_hash and os.path.exists(job.output_file):
+        return BatchJobInput(job, input_hash)
+
+    try:
+        alignment, input_file_format = read_alignment(data, settings.input_file_format)
+    except Exception as e:
+        return BatchJobInput(job, input_hash, error=describe_error(e))
+    return BatchJobInput(job, input_hash, alignment, input_file_format)
+
+
+TrimmedBatchJob = tuple[
+    BatchJobInput, Union["TrimRun", None], Union["TrimmingStats", None]
+]
+
+
+def trim_batch_job(
+    job_input: BatchJobInput, settings: BatchSettings
+) -> TrimmedBatchJob:
+    if job_input.skipped:
+        return job_input, None, None
+    try:
+        trim_run, stats = settings.trim(
+            job_input.alignment, job_input.input_file_format
+        )
+    except Exception as e:
+        failed = BatchJobInput(
+            job_input.job, job_input.input_hash, error=describe_error(e)
+        )
+        return failed, None, None
+    return job_input, trim_run, stats
+
+
+def write_batch_job(trimmed: TrimmedBatchJob, complement: bool) -> BatchJobResult:
+    from .helpers import write_msa, write_complement
+
+    job_input, trim_run, stats = trimmed
+    job = job_input.job
+    if job_input.skipped:
+        return BatchJobResult(job, job_input.input_hash, None, job_input.error)
+
+    # write next to the final names and rename so an interrupted job never
+    # leaves a truncated output behind that looks complete; the output is
+    # renamed last, since a restart only checks that it exists
+    partial_output_file = f"{job.output_file}.partial"
+    renames = [(partial_output_file, job.output_file)]
+    if complement:
+        renames.insert(
+            0, (f"{partial_output_file}.complement", f"{job.output_file}.complement")
+        )
+    try:
+        if complement:
+            write_complement(
+                trim_run.msa, partial_output_file, trim_run.output_file_format
+            )
+        write_msa(trim_run.msa, partial_output_file, trim_run.output_file_format)
+        for partial_file, final_file in renames:
+            os.replace(partial_file, final_file)
+    except Exception as e:
+        for partial_file, _ in renames:
+            if os.path.exists(partial_file):
+                os.remove(partial_file)
+        return BatchJobResult(job, job_input.input_hash, None, describe_error(e))
+
+    return BatchJobResult(job, job_input.input_hash, stats.summary)
+
+
+def process_batch_job(
+    job: BatchJob, settings: BatchSettings, complement: bool
+) -> BatchJobResult:
+    return write_batch_job(
+        trim_batch_job(read_batch_job(job, settings), settings), complement
+    )
+
+
+def pipelined_batch_jobs(
+    jobs: Iterable[BatchJob],
+    settings: BatchSettings,
+    complement: bool,
+    max_pending: int = 2,
+) -> Iterator[BatchJobResult]:
+    """
+    Processes jobs in a single process with reading, trimming and writing
+    overlapped: a reader thread reads and parses up to max_pending inputs
+    ahead while the calling thread trims, and a writer thread writes up to
+    max_pending outputs behind it. Trimming stays in the calling thread, so
+    disk latency (e.g., on network file systems) is hidden behind the
+    computation rather than added to it.
+    """
+    from .parallel import background_map
+
+    inputs = background_map(
+        partial(read_batch_job, settings=settings), jobs, max_pending
+    )
+    trimmed = map(partial(trim_batch_job, settings=settings), inputs)
+    return background_map(
+        partial(write_batch_job, complement=complement), trimmed, max_pending
+    )
+
+
+def batch_output_file(input_file: str, output_dir: Union[str, None]) -> str:
+    if output_dir is None:
+        return f"{input_file}.clipkit"
+    return os.path.join(output_dir, f"{os.path.basename(input_file)}.clipkit")
+
+
+def check_batch_outputs(
+    input_files: Iterable[str], output_dir: Union[str, None]
+) -> None:
+    """
+    Raises DuplicateBatchOutput if two inputs would be written to the same
+    output, e.g. inputs with the same name in different directories written
+    to one output directory. Checked for all inputs, not only those of a
+    shard, so that every shard refuses the same batch.
+    """
+    input_of_output = {}
+    for idx, input_file in enumerate(input_files):
+        output_file = batch_output_file(input_file, output_dir)
+        other_idx, other_input = input_of_output.setdefault(
+            output_file, (idx, input_file)
+        )
+        if other_idx != idx:
+            raise DuplicateBatchOutput(
+                f"'{other_input}' and '{input_file}' would both be written to "
+                f"'{output_file}'; rename one of them or trim them in separate runs"
+            )
+
+
+def run_batch(
+    input_files: Iterable[str],
+    settings: BatchSettings,
+    manifest: Manifest,
+    output_dir: Union[str, None] = None,
+    shard: Union[Shard, None] = None,
+    complement: bool = False,
+    workers: Union[int, None] = None,
+) -> Iterator[BatchJobResult]:
+    """
+    Trims every input of this shard, skipping those the manifest shows were
+    already completed with the same input hash and parameters. Inputs that
+    fail are recorded in the manifest and yielded as failed results. Raises
+    DuplicateBatchOutput before trimming anything if two inputs would be
+    written to the same output.
+    """
+    from .parallel import bounded_map
+
+    input_files = list(input_files)
+    check_batch_outputs(input_files, output_dir)
+    params = settings.key(complement=complement)
+
+    def jobs():
+        for input_file in input_files:
+            if shard is not None and input_file not in shard:
+                continue
+            yield BatchJob(
+                input_file,
+                batch_output_file(input_file, output_dir),
+                manifest.completed_hash(input_file, params),
+            )
+
+    if workers is not None and workers <= 1:
+        results = pipelined_batch_jobs(jobs(), settings, complement)
+    else:
+        # every pool worker reads, trims and writes its own inputs, so I/O
+        # already overlaps with trimming across the processes
+        results = bounded_map(
+            partial(process_batch_job, settings=settings, complement=complement),
+            jobs(),
+            workers=workers,
+        )
+    for result in results:
+        if result.failed:
+            manifest.record_failure(
+                result.job.input_file, params, result.input_hash, result.error
+            )
+        elif not result.skipped:
+            manifest.record(
+                result.job.input_file,
+                params,
+                result.input_hash,
+                result.job.output_file,
+                result.summary,
+            )
+        yield result
+
+
+def main(argv=None):
+    """
+    Function that parses and collects arguments for batch runs
+    """
+    parser = create_batch_parser()
+    args = parser.parse_args(argv)
+
+    if args.quiet:
+        logger.disabled = True
+
+    try:
+        shard = Shard.parse(args.shard) if args.shard else None
+        check_batch_outputs(args.inputs, args.output_dir)
+    except (InvalidShard, DuplicateBatchOutput) as e:
+        logger.warning(str(e))
+        sys.exit()
+
+    if args.codon and args.mode == TrimmingMode.c3.value:
+        logger.warning(
+            "C3 and codon-based trimming are incompatible.\nCodon-based trimming removes whole codons while C3 removes every third codon position."
+        )
+        sys.exit()
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    manifest_path = args.manifest or os.path.join(
+        args.output_dir or ".", "clipkit_manifest.sqlite"
+    )
+
+    settings = BatchSettings.resolve(
+        mode=args.mode or "smart-gap",
+        gaps=args.gaps,
+        gap_characters=args.gap_characters,
+        input_file_format=args.input_file_format,
+        output_file_format=args.output_file_format,
+        sequence_type=args.sequence_type.lower() if args.sequence_type else None,
+        codon=args.codon,
+    )
+
+    manifest = Manifest(manifest_path)
+    start_time = time.time()
+    trimmed = skipped = failed = 0
+    try:
+        for result in run_batch(
+            args.inputs,
+            settings,
+            manifest,
+            output_dir=args.output_dir,
+            shard=shard,
+            complement=args.complementary,
+            workers=args.workers,
+        ):
+            if result.failed:
+                failed += 1
+                logger.warning(f"Failed: {result.job.input_file} ({result.error})")
+            elif result.skipped:
+                skipped += 1
+                logger.info(f"Skipped (already completed): {result.job.input_file}")
+            else:
+                trimmed += 1
+                logger.info(f"Trimmed: {result.job.input_file}")
+    finally:
+        manifest.close()
+
+    logger.info(
+        f"\nTrimmed {trimmed}, skipped {skipped} and failed {failed} alignments in {round(time.time() - start_time, 3)}s"
+        f"\nManifest: {manifest_path}"
+    )
+    if failed:
+        # inputs that failed are tried again when the job is restarted
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,237 @@
+"""
+Trimming of files that hold several alignments (blocks), such as Pfam
+Stockholm dumps, whole-genome MAF files and Mauve XMFA files.
+
+Blocks are read, trimmed and written one after the other, so only the
+blocks being trimmed are held in memory.
+"""
+from dataclasses import dataclass
+from functools import partial
+from typing import Iterable, Iterator, Union
+
+import numpy as np
+from Bio import AlignIO
+from Bio.Align import MultipleSeqAlignment
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+
+from .api import BatchSettings
+from .exceptions import InvalidInputFileFormat
+from .file_formats import FileFormat
+from .msa import MSA
+from .parallel import bounded_map
+from .stats import BlockTrimmingStats
+
+
+def biopython_format(file_format: FileFormat) -> str:
+    """
+    Name Biopython uses for file_format (e.g. phylip_relaxed -> phylip-relaxed)
+    """
+    return file_format.value.replace("_", "-")
+
+
+def detect_block_format(
+    input_file: str, file_format: Union[FileFormat, None]
+) -> FileFormat:
+    """
+    file_format, or the first format that the first block of input_file
+    can be read in
+    """
+    if file_format:
+        return FileFormat(file_format)
+    for candidate in FileFormat:
+        try:
+            with open(input_file) as handle:
+                next(AlignIO.parse(handle, biopython_format(candidate)))
+            return candidate
+        # the following exceptions refer to skipping over errors
+        # associated with reading the wrong input file
+        except (ValueError, AssertionError, StopIteration):
+            continue
+    raise InvalidInputFileFormat("File could not be read")
+
+
+def read_blocks(
+    input_file: str, file_format: FileFormat
+) -> Iterator[MultipleSeqAlignment]:
+    """
+    Lazily reads the alignments of input_file, one block at a time
+    """
+    with open(input_file) as handle:
+        yield from AlignIO.parse(handle, biopython_format(file_format))
+
+
+def take_sites(values, positions: np.ndarray):
+    """
+    The values of a per-site annotation (a string or a list) at positions
+    """
+    if isinstance(values, str):
+        return "".join(map(values.__getitem__, positions.tolist()))
+    return [values[position] for position in positions.tolist()]
+
+
+def has_maf_coordinates(block: MultipleSeqAlignment) -> bool:
+    return all(
+        "start" in record.annotations and "size" in record.annotations
+        for record in block
+    )
+
+
+def residue_offsets(matrix: np.ndarray) -> np.ndarray:
+    """
+    (n_sequences, length + 1) number of residues (non-gap characters, as
+    counted by the MAF size field) of each sequence before every column
+    """
+    offsets = np.zeros((matrix.shape[0], matrix.shape[1] + 1), dtype=np.int64)
+    np.cumsum(matrix != ord("-"), axis=1, out=offsets[:, 1:])
+    return offsets
+
+
+def site_runs(positions: np.ndarray) -> list[np.ndarray]:
+    """
+    Splits sorted positions into runs of consecutive positions
+    """
+    return np.split(positions, np.flatnonzero(np.diff(positions) != 1) + 1)
+
+
+def trimmed_block(
+    block: MultipleSeqAlignment,
+    matrix: np.ndarray,
+    positions: np.ndarray,
+    offsets: Union[np.ndarray, None] = None,
+) -> MultipleSeqAlignment:
+    """
+    The sites of block at positions, with the ids, names, descriptions and
+    annotations the block was read with. Per-site annotations are trimmed
+    along with the sites.
+
+    If the residue offsets of a MAF block are given, the start of each
+    sequence is moved to its first residue at positions and its size set
+    to the number of its residues there; sequences without residues at
+    positions are left out. Residues of trimmed sites between positions
+    are not counted, so start and size only describe a contiguous span of
+    the source when positions are consecutive. The score of a block is
+    dropped when any of its sites is trimmed, since it no longer applies.
+    """
+    length = block.get_alignment_length()
+    rows = matrix[:, positions]
+    if offsets is not None:
+        starts = offsets[:, positions[0]].tolist()
+        sizes = np.count_nonzero(rows != ord("-"), axis=1).tolist()
+    records = []
+    for idx, (record, row) in enumerate(zip(block, rows)):
+        annotations = dict(record.annotations)
+        if offsets is not None:
+            if sizes[idx] == 0:
+                continue
+            annotations["start"] = record.annotations["start"] + starts[idx]
+            annotations["size"] = sizes[idx]
+        trimmed = SeqRecord(
+            Seq(row.tobytes()),
+            id=record.id,
+            name=record.name,
+            description=record.description,
+            annotations=annotations,
+        )
+        for key, values in record.letter_annotations.items():
+            trimmed.letter_annotations[key] = take_sites(values, positions)
+        records.append(trimmed)
+
+    trimmed_alignment = MultipleSeqAlignment(
+        records,
+        annotations=dict(block.annotations),
+        column_annotations={
+            key: take_sites(values, positions)
+            for key, values in block.column_annotations.items()
+            if len(values) == length
+        },
+    )
+    # MAF block scores are kept here by Biopython's MAF parser and writer
+    if hasattr(block, "_annotations"):
+        trimmed_alignment._annotations = dict(block._annotations)
+        if len(positions) < length:
+            trimmed_alignment._annotations.pop("score", None)
+    return trimmed_alignment
+
+
+def trimmed_blocks(
+    block: MultipleSeqAlignment, msa: MSA, split_runs: bool = False
+) -> list[MultipleSeqAlignment]:
+    """
+    The kept sites of block as one block or, with split_runs, one block
+    per run of consecutive kept sites. Blocks read from MAF files get
+    updated coordinates (see trimmed_block) and are always split, so that
+    every sequence of the resulting blocks is contiguous in its source.
+    """
+    positions = msa.kept_positions
+    if not len(positions):
+        return []
+    matrix = msa.matrix
+    offsets = residue_offsets(matrix) if has_maf_coordinates(block) else None
+    split_runs = split_runs or offsets is not None
+    runs = site_runs(positions) if split_runs else [positions]
+    blocks = [trimmed_block(block, matrix, run, offsets) for run in runs]
+    return [trimmed for trimmed in blocks if len(trimmed)]
+
+
+@dataclass(frozen=True)
+class BlockResult:
+    # empty when every site of the block was trimmed
+    blocks: list[MultipleSeqAlignment]
+    summary: dict
+
+
+def trim_block(
+    block: MultipleSeqAlignment,
+    settings: BatchSettings,
+    input_file_format: FileFormat,
+    split_runs: bool = False,
+) -> BlockResult:
+    trim_run, stats = settings.trim(block, input_file_format)
+    return BlockResult(trimmed_blocks(block, trim_run.msa, split_runs), stats.summary)
+
+
+def trim_blocks(
+    blocks: Iterable[MultipleSeqAlignment],
+    settings: BatchSettings,
+    input_file_format: FileFormat,
+    workers: Union[int, None] = 1,
+    split_runs: bool = False,
+) -> Iterator[BlockResult]:
+    """
+    Lazily trims every block independently and yields the results in the
+    order of the blocks. With more than one worker, blocks are trimmed by
+    a pool of processes that reads no more than twice as many blocks ahead.
+    """
+    return bounded_map(
+        partial(
+            trim_block,
+            settings=settings,
+            input_file_format=input_file_format,
+            split_runs=split_runs,
+        ),
+        blocks,
+        workers=workers,
+    )
+
+
+def write_blocks(
+    results: Iterable[BlockResult], output_file: str, output_file_format: FileFormat
+) -> BlockTrimmingStats:
+    """
+    Writes the trimmed blocks to output_file in order, as they are trimmed.
+    Blocks in which every site was trimmed are left out.
+
+    Blocks are written through Biopython one at a time; a MAF file of any
+    size is trimmed in memory bounded by its largest block.
+    """
+    stats = BlockTrimmingStats()
+
+    def trimmed_blocks():
+        for result in results:
+            stats.add(result.summary, len(result.blocks))
+            yield from result.blocks
+
+    with open(output_file, "w") as handle:
+        AlignIO.write(trimmed_blocks(), handle, biopython_format(output_file_format))
+    return stats
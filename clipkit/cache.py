@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Union
+
+from .version import __version__ as current_version
+
+SIZE_SUFFIXES = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+# names of the cached files, relative to an entry directory
+CACHED_OUTPUT = "output"
+CACHED_COMPLEMENT = "output.complement"
+CACHED_LOG = "output.log"
+CACHED_STATS = "stats.json"
+
+
+def parse_size(size: Union[str, int]) -> int:
+    """
+    "500M" -> 524288000; plain numbers are bytes
+    """
+    size = str(size).strip().upper().rstrip("B")
+    if size and size[-1] in SIZE_SUFFIXES:
+        return int(float(size[:-1]) * SIZE_SUFFIXES[size[-1]])
+    return int(size)
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed store of trimmed outputs and their statistics.
+
+    Entries live under <directory>/<key[:2]>/<key>, where the key hashes the
+    input bytes together with every option that affects the outputs and the
+    clipkit version. Reading an entry marks it as recently used; once the
+    cache grows beyond max_size the least recently used entries are removed.
+    """
+
+    def __init__(self, directory: str, max_size: Union[int, None] = None) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(input_file: str, **params) -> str:
+        digest = hashlib.sha256()
+        digest.update(hash_file(input_file).encode())
+        digest.update(
+            json.dumps(
+                {**params, "version": current_version}, sort_keys=True, default=str
+            ).encode()
+        )
+        return digest.hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> Union[dict, None]:
+        """
+        Returns the stored stats and run information, or None on a miss
+        """
+        stats_path = os.path.join(self.entry_path(key), CACHED_STATS)
+        try:
+            with open(stats_path) as handle:
+                entry = json.load(handle)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        os.utime(stats_path)
+        return entry
+
+    def restore(
+        self, key: str, output_file: str, complement: bool, use_log: bool
+    ) -> None:
+        # outputs are copied rather than linked so that a later write to
+        # output_file can never change what is stored in the cache
+        entry_path = self.entry_path(key)
+        shutil.copyfile(os.path.join(entry_path, CACHED_OUTPUT), output_file)
+        if complement:
+            shutil.copyfile(
+                os.path.join(entry_path, CACHED_COMPLEMENT), f"{output_file}.complement"
+            )
+        if use_log:
+            shutil.copyfile(os.path.join(entry_path, CACHED_LOG), f"{output_file}.log")
+
+    def store(
+        self,
+        key: str,
+        output_file: str,
+        complement: bool,
+        use_log: bool,
+        entry: dict,
+    ) -> None:
+        entry_path = self.entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        # assemble the entry next to its final location and rename it into
+        # place, so concurrent runs never see a partially written entry
+        staging_path = tempfile.mkdtemp(
+            prefix=".staging-", dir=os.path.dirname(entry_path)
+        )
+        try:
+            shutil.copyfile(output_file, os.path.join(staging_path, CACHED_OUTPUT))
+            if complement:
+                shutil.copyfile(
+                    f"{output_file}.complement",
+                    os.path.join(staging_path, CACHED_COMPLEMENT),
+                )
+            if use_log:
+                shutil.copyfile(
+                    f"{output_file}.log", os.path.join(staging_path, CACHED_LOG)
+                )
+            with open(os.path.join(staging_path, CACHED_STATS), "w") as handle:
+                json.dump(entry, handle)
+            os.rename(staging_path, entry_path)
+        except OSError:
+            # another run stored the same entry first
+            shutil.rmtree(staging_path, ignore_errors=True)
+            if not os.path.isdir(entry_path):
+                raise
+
+        if self.max_size is not None:
+            self.evict(self.max_size)
+
+    def evict(self, max_size: int) -> None:
+        entries = []
+        total_size = 0
+        for prefix in os.scandir(self.directory):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if entry.name.startswith("."):
+                    # entry that is still being stored
+                    continue
+                stats_path = os.path.join(entry.path, CACHED_STATS)
+                if not os.path.exists(stats_path):
+                    continue
+                size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                entries.append((os.stat(stats_path).st_mtime, size, entry.path))
+                total_size += size
+
+        for _, size, path in sorted(entries):
+            if total_size <= max_size:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total_size -= size
@@ -1,28 +1,27 @@
 #!/usr/bin/env python
 
-import logging
+import os
 import sys
 import time
-from typing import Union
+import tracemalloc
+from typing import TYPE_CHECKING, Union
 
-from Bio.Align import MultipleSeqAlignment
 from .args_processing import process_args
-from .exceptions import InvalidInputFileFormat
-from .files import get_alignment_and_format, FileFormat, write_debug_log_file
-from .helpers import (
-    create_msa,
-    get_seq_type,
-    get_gap_chars,
-    write_msa,
-    write_complement,
-    SeqType,
+from .cache import ResultCache
+from .exceptions import (
+    InvalidCodonAlignment,
+    InvalidColumnState,
+    InvalidInputFileFormat,
+    InvalidTrimMask,
 )
-from .logger import logger, log_file_logger
+from .file_formats import FileFormat
+from .logger import logger
 from .modes import TrimmingMode
-from .msa import MSA
 from .parser import create_parser
+from .seq_types import SeqType
 from .settings import DEFAULT_AA_GAP_CHARS, DEFAULT_NT_GAP_CHARS
-from .smart_gap_helper import smart_gap_threshold_determination
+from .profiling import StageProfile
+from .stats import CachedTrimmingStats, TrimmingStats
 from .version import __version__ as current_version
 from .warnings import (
     warn_if_all_sites_were_trimmed,
@@ -32,15 +31,25 @@ from .write import (
     write_user_args,
     write_output_stats,
     write_output_files_message,
+    write_profile,
 )
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+# numpy, Biopython and the modules built on them are imported where they are
+# first needed, so that printing help or the version, or restoring a cached
+# run, does not pay for loading them
+if TYPE_CHECKING:
+    import numpy as np
+    from Bio.Align import MultipleSeqAlignment
+    from .column_state import ColumnState
+    from .msa import MSA
+    from .trim_mask import TrimMask
 
 
 @dataclass
 class TrimRun:
-    alignment: MultipleSeqAlignment
-    msa: MSA
+    msa: "MSA"
     gap_characters: list
     sequence_type: SeqType
     input_file_format: FileFormat
@@ -48,14 +57,67 @@ class TrimRun:
     gaps: float
     codon: bool
     version: str = current_version
+    # None when the input was read without Biopython (see files.read_alignment)
+    source_alignment: Union["MultipleSeqAlignment", None] = field(
+        default=None, repr=False
+    )
+
+    @property
+    def alignment(self) -> "MultipleSeqAlignment":
+        if self.source_alignment is None:
+            self.source_alignment = self.msa.original_to_bio_msa()
+        return self.source_alignment
+
+    # Biopython alignments are only built when first asked for
+    _complement: Union["MultipleSeqAlignment", None] = field(
+        default=None, init=False, repr=False
+    )
+    _trimmed: Union["MultipleSeqAlignment", None] = field(
+        default=None, init=False, repr=False
+    )
+
+    @property
+    def complement(self) -> "MultipleSeqAlignment":
+        if self._complement is None:
+            self._complement = self.msa.complement_to_bio_msa()
+        return self._complement
+
+    @property
+    def trimmed(self) -> "MultipleSeqAlignment":
+        if self._trimmed is None:
+            self._trimmed = self.msa.to_bio_msa()
+        return self._trimmed
 
     @property
-    def complement(self):
-        return self.msa.complement_to_bio_msa()
+    def keep_mask(self) -> "np.ndarray":
+        return self.msa.keep_mask
 
     @property
-    def trimmed(self):
-        return self.msa.to_bio_msa()
+    def kept_positions(self) -> "np.ndarray":
+        return self.msa.kept_positions
+
+    @property
+    def trimmed_matrix(self) -> "np.ndarray":
+        return self.msa.trimmed_matrix
+
+    @property
+    def site_gappyness(self) -> "np.ndarray":
+        return self.msa.site_gappyness
+
+    @property
+    def site_classification_types(self) -> "np.ndarray":
+        return self.msa.site_classification_types
+
+
+def import_trimming_modules() -> None:
+    """
+    Imports the modules that trimming loads where they are first needed,
+    and the parts of numpy that those load on first use, so that profiles
+    time them as one stage rather than as part of the first stage run
+    """
+    import numpy.ma  # noqa: F401 - loaded by the first call of np.unique
+
+    from . import files, helpers, msa, smart_gap_helper  # noqa: F401
 
 
 def run(
@@ -71,39 +133,158 @@ def run(
     mode: TrimmingMode,
     use_log: bool,
     quiet: bool,
+    column_state: Union["ColumnState", None] = None,
+    profile: Union[StageProfile, None] = None,
+    protein_file: Union[str, None] = None,
+    trim_mask: Union["TrimMask", None] = None,
 ):
+    profile = profile if profile is not None else StageProfile()
+    with profile.stage("import", unit="modules") as stage:
+        loaded = len(sys.modules)
+        import_trimming_modules()
+        stage.processed = len(sys.modules) - loaded
+    from .files import read_alignment
+
     try:
-        alignment, input_file_format = get_alignment_and_format(
-            input_file, input_file_format
-        )
+        with profile.stage("read", os.path.getsize(input_file), "bytes"):
+            alignment, input_file_format = read_alignment(
+                input_file, input_file_format
+            )
+        if protein_file is not None:
+            with profile.stage("read protein", os.path.getsize(protein_file), "bytes"):
+                protein_alignment, _ = read_alignment(protein_file, None)
     except InvalidInputFileFormat:
         return logger.error(
             f"""Format type could not be read.\nPlease check acceptable input file formats: {", ".join([file_format.value for file_format in FileFormat])}"""
         )
 
-    sequence_type = sequence_type or get_seq_type(alignment)
+    if protein_file is not None:
+        return trim_codons(
+            alignment,
+            protein_alignment,
+            input_file_format,
+            output_file_format,
+            gaps,
+            gap_characters,
+            mode,
+            profile=profile,
+        )
+
+    return trim_alignment(
+        alignment,
+        input_file_format,
+        output_file_format,
+        sequence_type,
+        gaps,
+        gap_characters,
+        codon,
+        mode,
+        column_state=column_state,
+        profile=profile,
+        trim_mask=trim_mask,
+    )
+
+
+def trim_alignment(
+    alignment: Union["MultipleSeqAlignment", "MSA"],
+    input_file_format: FileFormat,
+    output_file_format: Union[FileFormat, None],
+    sequence_type: Union[SeqType, None],
+    gaps: float,
+    gap_characters: Union[list, None],
+    codon: bool,
+    mode: TrimmingMode,
+    column_state: Union["ColumnState", None] = None,
+    profile: Union[StageProfile, None] = None,
+    trim_mask: Union["TrimMask", None] = None,
+):
+    """
+    Trims an alignment that has already been read into memory
+
+    column_state holds the column counts of the first rows of the
+    alignment, saved by an earlier run; only the remaining rows are counted.
+    If trim_mask is given, the sites it trims are trimmed and no column
+    statistics are computed. The time spent in each stage is added to
+    profile and returned with the stats.
+    """
+    from .helpers import create_msa, get_seq_type, get_gap_chars
+    from .msa import MSA
+    from .smart_gap_helper import smart_gap_threshold_determination
+
+    profile = profile if profile is not None else StageProfile()
+
+    if isinstance(alignment, MSA):
+        msa, alignment = alignment, None
+    else:
+        with profile.stage("build matrix"):
+            msa = create_msa(alignment)
+    sites = msa.original_length
+
+    if not sequence_type:
+        with profile.stage("sequence type", sites):
+            sequence_type = get_seq_type(msa)
 
     if not gap_characters:
         gap_characters = get_gap_chars(sequence_type)
+    msa.gap_chars = gap_characters
+
+    # nucleotides fit in half a byte; alignments with other characters
+    # (e.g. lower case residues) stay unpacked
+    if sequence_type == SeqType.nt:
+        with profile.stage("pack nucleotides", sites):
+            msa.pack_nucleotides()
 
     if not output_file_format:
         output_file_format = input_file_format
     else:
         output_file_format = FileFormat(output_file_format)
 
+    if trim_mask is not None:
+        with profile.stage("trim", sites):
+            msa.trim(site_positions_to_trim=trim_mask.trimmed_positions(msa))
+        trim_run = TrimRun(
+            msa,
+            gap_characters,
+            sequence_type,
+            input_file_format,
+            output_file_format,
+            gaps,
+            codon,
+            source_alignment=alignment,
+        )
+        return trim_run, TrimmingStats(msa, profile)
+
+    # modes other than these keep sites based on their classification
+    classify = mode not in {TrimmingMode.gappy, TrimmingMode.smart_gap, TrimmingMode.c3}
+
+    # the MSA computes its counts lazily; ask for the ones this mode uses
+    # here so that they are timed as their own stage
+    with profile.stage("column statistics", sites):
+        if column_state is not None:
+            msa.use_column_state(column_state.extend(msa))
+        # counted once per site pattern when many columns repeat
+        if classify:
+            msa.pattern_state_counts
+        if mode != TrimmingMode.c3:
+            msa.column_gap_counts()
+
     # determine smart_gap threshold
     if mode in {
         TrimmingMode.smart_gap,
         TrimmingMode.kpi_smart_gap,
         TrimmingMode.kpic_smart_gap,
     }:
-        gaps = smart_gap_threshold_determination(alignment, gap_characters)
+        with profile.stage("smart-gap threshold", sites):
+            gaps = smart_gap_threshold_determination(msa, gap_characters)
+
+    if classify:
+        with profile.stage("classification", sites):
+            msa.site_classification_types
 
-    msa = create_msa(alignment, gap_characters)
-    msa.trim(mode, gap_threshold=gaps, site_positions_to_trim=None, codon=codon)
+    with profile.stage("trim", sites):
+        msa.trim(mode, gap_threshold=gaps, site_positions_to_trim=None, codon=codon)
 
     trim_run = TrimRun(
-        alignment,
         msa,
         gap_characters,
         sequence_type,
@@ -111,9 +292,67 @@ def run(
         output_file_format,
         gaps,
         codon,
+        source_alignment=alignment,
+    )
+
+    return trim_run, TrimmingStats(msa, profile)
+
+
+def trim_codons(
+    alignment: Union["MultipleSeqAlignment", "MSA"],
+    protein_alignment: Union["MultipleSeqAlignment", "MSA"],
+    input_file_format: FileFormat,
+    output_file_format: Union[FileFormat, None],
+    gaps: float,
+    gap_characters: Union[list, None],
+    mode: TrimmingMode,
+    profile: Union[StageProfile, None] = None,
+):
+    """
+    Trims a codon alignment by the sites that mode trims from the protein
+    alignment it was threaded onto (see MSA.trim_codons_of)
+
+    gaps and gap_characters apply to the protein alignment. The returned
+    run and stats describe the codon alignment.
+    """
+    from .helpers import create_msa
+    from .msa import MSA
+
+    profile = profile if profile is not None else StageProfile()
+
+    protein_run, _ = trim_alignment(
+        protein_alignment,
+        input_file_format,
+        None,
+        SeqType.aa,
+        gaps,
+        gap_characters,
+        False,
+        mode,
+        profile=profile,
     )
 
-    return trim_run, msa.stats
+    if isinstance(alignment, MSA):
+        msa, alignment = alignment, None
+    else:
+        with profile.stage("build matrix"):
+            msa = create_msa(alignment)
+    msa.gap_chars = DEFAULT_NT_GAP_CHARS
+
+    with profile.stage("project protein trim", msa.original_length):
+        msa.trim_codons_of(protein_run.msa)
+
+    trim_run = TrimRun(
+        msa,
+        DEFAULT_NT_GAP_CHARS,
+        SeqType.nt,
+        input_file_format,
+        FileFormat(output_file_format or input_file_format),
+        protein_run.gaps,
+        True,
+        source_alignment=alignment,
+    )
+    return trim_run, TrimmingStats(msa, profile)
 
 
 def execute(
@@ -129,35 +368,126 @@ def execute(
     mode: TrimmingMode,
     use_log: bool,
     quiet: bool,
+    cache_dir: Union[str, None] = None,
+    cache_max_size: Union[int, None] = None,
+    state_file: Union[str, None] = None,
+    save_state: bool = False,
+    profile: bool = False,
+    profile_json: Union[str, None] = None,
+    memory_report: Union[str, None] = None,
+    blocks: bool = False,
+    split_blocks: bool = False,
+    workers: Union[int, None] = None,
+    protein_file: Union[str, None] = None,
+    mask_file: Union[str, None] = None,
+    save_mask: bool = False,
+    coordinate_map: bool = False,
     **kwargs,
 ) -> None:
-    if use_log:
-        log_file_logger.setLevel(logging.DEBUG)
-        log_file_logger.propagate = False
-        fh = logging.FileHandler(f"{output_file}.log", mode="w")
-        fh.setLevel(logging.DEBUG)
-        log_file_logger.addHandler(fh)
-
     if quiet:
         logger.disabled = True
 
     # for reporting runtime duration to user
     start_time = time.time()
 
-    trim_run, stats = run(
-        input_file,
-        input_file_format,
-        output_file,
-        output_file_format,
-        sequence_type,
-        gaps,
-        gap_characters,
-        complement,
-        codon,
-        mode,
-        use_log,
-        quiet,
-    )
+    # -of may name several formats: the first is written to output_file and
+    # every other one next to it, named with the format as suffix
+    if isinstance(output_file_format, (list, tuple)):
+        output_file_format, *other_output_file_formats = output_file_format
+    else:
+        other_output_file_formats = []
+    other_outputs = [
+        (f"{output_file}.{FileFormat(file_format).value}", FileFormat(file_format))
+        for file_format in other_output_file_formats
+    ]
+
+    if blocks:
+        return execute_blocks(
+            input_file,
+            input_file_format,
+            output_file,
+            output_file_format,
+            sequence_type,
+            gaps,
+            gap_characters,
+            codon,
+            mode,
+            workers,
+            split_blocks,
+            start_time,
+        )
+
+    cache = None
+    # the cache stores a single output and no column states, masks or
+    # coordinate maps, so runs writing more skip it; its key does not cover
+    # a protein alignment or mask either. A hit runs no stages, so runs that
+    # report on their stages (profiles, memory reports) skip it as well
+    if (
+        cache_dir
+        and not (save_state or save_mask or coordinate_map or other_outputs)
+        and not (profile or profile_json or memory_report)
+        and protein_file is None
+        and mask_file is None
+    ):
+        cache = ResultCache(cache_dir, cache_max_size)
+        cache_key = cache.key(
+            input_file,
+            input_file_format=input_file_format,
+            output_file_format=output_file_format,
+            sequence_type=getattr(sequence_type, "value", sequence_type),
+            gaps=gaps,
+            gap_characters=gap_characters,
+            complement=complement,
+            codon=codon,
+            mode=mode.value,
+            use_log=use_log,
+        )
+        if execute_from_cache(
+            cache,
+            cache_key,
+            input_file,
+            output_file,
+            mode,
+            complement,
+            codon,
+            use_log,
+            start_time,
+        ):
+            return
+
+    from .column_state import ColumnState
+    from .files import write_coordinate_map, write_debug_log_file
+    from .helpers import write_msa_formats, write_complement
+    from .trim_mask import TrimMask
+
+    try:
+        trim_run, stats = run(
+            input_file,
+            input_file_format,
+            output_file,
+            output_file_format,
+            sequence_type,
+            gaps,
+            gap_characters,
+            complement,
+            codon,
+            mode,
+            use_log,
+            quiet,
+            column_state=ColumnState.load(state_file) if state_file else None,
+            profile=StageProfile(trace_memory=bool(memory_report)),
+            protein_file=protein_file,
+            trim_mask=TrimMask.load(mask_file) if mask_file else None,
+        )
+    except InvalidColumnState as e:
+        logger.error(f"Column state could not be used: {e}")
+        sys.exit()
+    except InvalidTrimMask as e:
+        logger.error(f"Trim mask could not be used: {e}")
+        sys.exit()
+    except InvalidCodonAlignment as e:
+        logger.error(f"Protein trim could not be projected onto the codons: {e}")
+        sys.exit()
 
     # display to user what args are being used in stdout
     write_user_args(
@@ -174,21 +504,169 @@ def execute(
         use_log,
     )
 
-    write_output_files_message(output_file, complement, use_log)
+    write_output_files_message(
+        output_file,
+        complement,
+        use_log,
+        save_state,
+        save_mask,
+        coordinate_map,
+        [other_output_file for other_output_file, _ in other_outputs],
+    )
 
     if use_log:
         warn_if_all_sites_were_trimmed(trim_run.msa)
         warn_if_entry_contains_only_gaps(trim_run.msa)
-        write_debug_log_file(trim_run.msa)
+        with stats.profile.stage("write log", unit="bytes") as stage:
+            write_debug_log_file(trim_run.msa, f"{output_file}.log")
+            stage.processed = os.path.getsize(f"{output_file}.log")
 
-    write_msa(trim_run.msa, output_file, trim_run.output_file_format)
+    with stats.profile.stage("write output", unit="bytes") as stage:
+        outputs = [(output_file, trim_run.output_file_format)] + other_outputs
+        write_msa_formats(trim_run.msa, outputs)
+        stage.processed = sum(os.path.getsize(name) for name, _ in outputs)
 
     # if the -c/--complementary argument was used, create an alignment of the trimmed sequences
     if complement:
-        write_complement(trim_run.msa, output_file, trim_run.output_file_format)
+        with stats.profile.stage("write complement", unit="bytes") as stage:
+            write_complement(trim_run.msa, output_file, trim_run.output_file_format)
+            stage.processed = os.path.getsize(f"{output_file}.complement")
+
+    if coordinate_map:
+        with stats.profile.stage("write coordinate map", unit="bytes") as stage:
+            write_coordinate_map(trim_run.msa, f"{output_file}.map")
+            stage.processed = os.path.getsize(f"{output_file}.map")
+
+    if save_state:
+        ColumnState.from_msa(trim_run.msa).save(f"{output_file}.state.npz")
+    if save_mask:
+        TrimMask.from_msa(trim_run.msa).save(f"{output_file}.mask.npz")
+
+    if cache:
+        cache.store(
+            cache_key,
+            output_file,
+            complement,
+            use_log,
+            dict(
+                stats=stats.summary,
+                input_file_format=trim_run.input_file_format.value,
+                output_file_format=trim_run.output_file_format.value,
+                sequence_type=trim_run.sequence_type.value,
+                gaps=trim_run.gaps,
+                gap_characters=trim_run.gap_characters,
+            ),
+        )
 
     write_output_stats(stats, start_time)
 
+    if profile:
+        write_profile(stats.profile)
+    if profile_json:
+        stats.profile.save(profile_json)
+    if memory_report:
+        stats.profile.save(memory_report, memory=True)
+        tracemalloc.stop()
+
+
+def execute_blocks(
+    input_file: str,
+    input_file_format: Union[FileFormat, None],
+    output_file: str,
+    output_file_format: Union[FileFormat, None],
+    sequence_type: Union[SeqType, None],
+    gaps: float,
+    gap_characters: Union[list, None],
+    codon: bool,
+    mode: TrimmingMode,
+    workers: Union[int, None],
+    split_blocks: bool,
+    start_time: float,
+) -> None:
+    """
+    Trims every alignment of a file holding several (see clipkit.blocks)
+    """
+    from .api import BatchSettings
+    from .blocks import detect_block_format, read_blocks, trim_blocks, write_blocks
+
+    try:
+        input_file_format = detect_block_format(input_file, input_file_format)
+    except InvalidInputFileFormat:
+        return logger.error(
+            f"""Format type could not be read.\nPlease check acceptable input file formats: {", ".join([file_format.value for file_format in FileFormat])}"""
+        )
+    output_file_format = FileFormat(output_file_format or input_file_format)
+
+    settings = BatchSettings.resolve(
+        mode=mode,
+        gaps=gaps,
+        gap_characters=gap_characters,
+        input_file_format=input_file_format,
+        output_file_format=output_file_format,
+        sequence_type=sequence_type,
+        codon=codon,
+    )
+    results = trim_blocks(
+        read_blocks(input_file, input_file_format),
+        settings,
+        input_file_format,
+        workers=workers or 1,
+        split_runs=split_blocks,
+    )
+
+    write_output_files_message(output_file, False, False)
+    stats = write_blocks(results, output_file, output_file_format)
+
+    logger.info(
+        f"\nTrimmed {stats.n_blocks} blocks of {input_file} ({input_file_format.value}) "
+        f"into {stats.n_output_blocks}; "
+        f"{stats.n_empty_blocks} had every site trimmed and were left out"
+    )
+    write_output_stats(stats, start_time)
+
+
+def execute_from_cache(
+    cache: ResultCache,
+    cache_key: str,
+    input_file: str,
+    output_file: str,
+    mode: TrimmingMode,
+    complement: bool,
+    codon: bool,
+    use_log: bool,
+    start_time: float,
+) -> bool:
+    """
+    Copies the outputs of an identical earlier run from the cache.
+    Returns False on a cache miss.
+    """
+    entry = cache.get(cache_key)
+    if entry is None:
+        return False
+    try:
+        cache.restore(cache_key, output_file, complement, use_log)
+    except FileNotFoundError:
+        # evicted by a concurrent run since it was looked up
+        return False
+
+    write_user_args(
+        input_file,
+        FileFormat(entry["input_file_format"]),
+        output_file,
+        FileFormat(entry["output_file_format"]),
+        SeqType(entry["sequence_type"]),
+        entry["gaps"],
+        entry["gap_characters"],
+        mode,
+        complement,
+        codon,
+        use_log,
+    )
+    write_output_files_message(output_file, complement, use_log)
+    logger.info(f"Restored from cache: {cache.entry_path(cache_key)}")
+    write_output_stats(CachedTrimmingStats(**entry["stats"]), start_time)
+    return True
+
 
 def main(argv=None):
     """
@@ -0,0 +1,120 @@
+import hashlib
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .exceptions import InvalidColumnState
+from .headers import HeaderTable
+from .kernels import column_state_counts, packed_column_counts, packed_gap_mask
+
+if TYPE_CHECKING:
+    from .msa import MSA
+
+
+def header_digest(header_info: Sequence[dict]) -> str:
+    digest = hashlib.sha256()
+    if isinstance(header_info, HeaderTable):
+        # the titles are the encoded descriptions
+        for title in header_info.titles():
+            digest.update(title + b"\n")
+    else:
+        for info in header_info:
+            digest.update(str(info["description"]).encode("utf-8") + b"\n")
+    return digest.hexdigest()
+
+
+@dataclass
+class ColumnState:
+    """
+    Per-column counts of an alignment, saved next to an output so that
+    rows added to the alignment later can be counted on their own.
+
+    states and counts are the upper case non-gap states and their
+    (n_states, length) counts, as returned by kernels.column_state_counts.
+    """
+
+    n_rows: int
+    gap_chars: list[str]
+    gap_counts: np.ndarray
+    states: np.ndarray
+    counts: np.ndarray
+    rows_digest: str
+
+    @classmethod
+    def from_msa(cls, msa: "MSA") -> "ColumnState":
+        states, counts = msa.column_state_counts
+        return cls(
+            n_rows=msa.n_sequences,
+            gap_chars=list(msa.gap_chars),
+            gap_counts=msa.column_gap_counts(),
+            states=states,
+            counts=counts,
+            rows_digest=header_digest(msa.header_info),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "ColumnState":
+        with np.load(path, allow_pickle=False) as state:
+            return cls(
+                n_rows=int(state["n_rows"]),
+                gap_chars=state["gap_chars"].tolist(),
+                gap_counts=state["gap_counts"],
+                states=state["states"],
+                counts=state["counts"],
+                rows_digest=str(state["rows_digest"]),
+            )
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as handle:
+            np.savez_compressed(
+                handle,
+                n_rows=self.n_rows,
+                gap_chars=np.array(self.gap_chars),
+                gap_counts=self.gap_counts,
+                states=self.states,
+                counts=self.counts,
+                rows_digest=self.rows_digest,
+            )
+
+    def extend(self, msa: "MSA") -> "ColumnState":
+        """
+        State of msa, whose first n_rows rows are the rows this state was
+        computed from. Only the rows after those are counted.
+        """
+        n_rows, length = msa.n_sequences, msa.original_length
+        if length != len(self.gap_counts):
+            raise InvalidColumnState(
+                f"Alignment has {length} columns but the saved state has {len(self.gap_counts)}"
+            )
+        if list(msa.gap_chars) != self.gap_chars:
+            raise InvalidColumnState(
+                f"Gap characters {msa.gap_chars} differ from those of the saved state {self.gap_chars}"
+            )
+        if (
+            n_rows < self.n_rows
+            or header_digest(msa.header_info[: self.n_rows]) != self.rows_digest
+        ):
+            raise InvalidColumnState(
+                "The saved state does not match the first sequences of the alignment"
+            )
+
+        added_rows = msa.rows(self.n_rows)
+        added_states, added_counts = column_state_counts(added_rows, self.gap_chars)
+
+        # counts of the union of old and new states
+        states = np.union1d(self.states, added_states).astype(np.uint8)
+        counts = np.zeros((len(states), length), dtype=np.int32)
+        counts[np.searchsorted(states, self.states)] += self.counts
+        counts[np.searchsorted(states, added_states)] += added_counts
+
+        return ColumnState(
+            n_rows=n_rows,
+            gap_chars=self.gap_chars,
+            gap_counts=self.gap_counts
+            + packed_column_counts(packed_gap_mask(added_rows, self.gap_chars)),
+            states=states,
+            counts=counts,
+            rows_digest=header_digest(msa.header_info),
+        )
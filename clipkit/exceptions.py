@@ -4,3 +4,23 @@ class ClipKITException(Exception):
 
 class InvalidInputFileFormat(ClipKITException):
     pass
+
+
+class InvalidShard(ClipKITException):
+    pass
+
+
+class DuplicateBatchOutput(ClipKITException):
+    pass
+
+
+class InvalidColumnState(ClipKITException):
+    pass
+
+
+class InvalidCodonAlignment(ClipKITException):
+    pass
+
+
+class InvalidTrimMask(ClipKITException):
+    pass
@@ -0,0 +1,12 @@
+from enum import Enum
+
+
+class FileFormat(Enum):
+    fasta = "fasta"
+    clustal = "clustal"
+    maf = "maf"
+    mauve = "mauve"
+    phylip = "phylip"
+    phylip_sequential = "phylip_sequential"
+    phylip_relaxed = "phylip_relaxed"
+    stockholm = "stockholm"
@@ -1,40 +1,50 @@
-from enum import Enum
-from .logger import log_file_logger
+import io
+from typing import TextIO, Union
 
+import numpy as np
 from Bio import AlignIO
 from Bio.Align import MultipleSeqAlignment
 
 from .exceptions import InvalidInputFileFormat
+from .file_formats import FileFormat
+from .msa import MSA
 
 
-class FileFormat(Enum):
-    fasta = "fasta"
-    clustal = "clustal"
-    maf = "maf"
-    mauve = "mauve"
-    phylip = "phylip"
-    phylip_sequential = "phylip_sequential"
-    phylip_relaxed = "phylip_relaxed"
-    stockholm = "stockholm"
+def open_alignment_source(source: Union[str, TextIO]) -> TextIO:
+    """
+    Returns a handle positioned at the start of the alignment. Text handles
+    (e.g. io.StringIO) are rewound so that format auto-detection can read
+    them more than once; anything else is treated as a file path
+    """
+    if hasattr(source, "read"):
+        source.seek(0)
+        return source
+    return open(source)
 
 
 def get_alignment_and_format(
-    input_file_name: str, file_format: FileFormat
+    input_file_name: Union[str, TextIO], file_format: FileFormat
 ) -> tuple[MultipleSeqAlignment, FileFormat]:
     """
     Automatically determines what type of input file was used
     and reads in the alignment file
+
+    input_file_name may also be a seekable text handle
     """
 
     if file_format:
         file_format = FileFormat(file_format)
-        alignment = AlignIO.read(open(input_file_name), file_format.value)
+        alignment = AlignIO.read(
+            open_alignment_source(input_file_name), file_format.value
+        )
         return alignment, file_format
     else:
         # attempt to auto-detect file format
         for fileFormat in FileFormat:
             try:
-                alignment = AlignIO.read(open(input_file_name), fileFormat.value)
+                alignment = AlignIO.read(
+                    open_alignment_source(input_file_name), fileFormat.value
+                )
                 return alignment, fileFormat
             # the following exceptions refer to skipping over errors
             # associated with reading the wrong input file
@@ -46,6 +56,92 @@ def get_alignment_and_format(
         raise InvalidInputFileFormat("File could not be read")
 
 
-def write_debug_log_file(msa):
-    for info in msa.generate_debug_log_info():
-        log_file_logger.debug(f"{str(info[0] + 1)} {info[1]} {info[2].value} {info[3]}")
+def read_alignment(
+    source: Union[str, bytes, TextIO], file_format: Union[FileFormat, None]
+) -> tuple[Union[MSA, MultipleSeqAlignment], FileFormat]:
+    """
+    Reads FASTA input straight into an MSA; other formats (and anything the
+    FASTA reader rejects) go through Biopython via get_alignment_and_format
+
+    source may be a file path, the contents of a file as bytes, or a
+    seekable text handle
+    """
+    if file_format is None or FileFormat(file_format) == FileFormat.fasta:
+        if isinstance(source, bytes):
+            data = source
+        elif hasattr(source, "read"):
+            data = open_alignment_source(source).read().encode("utf-8")
+        else:
+            with open(source, "rb") as handle:
+                data = handle.read()
+        try:
+            return MSA.from_fasta_bytes(data), FileFormat.fasta
+        except ValueError:
+            # let Biopython detect the format or report what is wrong
+            source = data
+
+    if isinstance(source, bytes):
+        source = io.StringIO(source.decode("utf-8"))
+    return get_alignment_and_format(source, file_format)
+
+
+def write_debug_log_file(msa: MSA, log_file: str, chunk_size: int = 1 << 16) -> None:
+    """
+    Writes one line per site: position, keep or trim, site classification
+    type and gappyness. Columns are formatted in bulk and written in chunks
+    of chunk_size sites.
+    """
+    keep_or_trim = np.where(msa.keep_mask, "keep", "trim")
+    # gappyness takes few distinct values (one per number of gaps in a
+    # column), so each is formatted once
+    gappyness_values, gappyness_index = np.unique(
+        msa.site_gappyness, return_inverse=True
+    )
+    gappyness = np.array([str(value) for value in gappyness_values.tolist()])
+    gappyness = gappyness[gappyness_index.ravel()]
+    site_classification_types = [
+        site_type.value for site_type in msa.site_classification_types
+    ]
+
+    with open(log_file, "w") as handle:
+        for start in range(0, msa.original_length, chunk_size):
+            stop = min(start + chunk_size, msa.original_length)
+            lines = zip(
+                map(str, range(start + 1, stop + 1)),
+                keep_or_trim[start:stop].tolist(),
+                site_classification_types[start:stop],
+                gappyness[start:stop].tolist(),
+            )
+            handle.write("\n".join(map(" ".join, lines)) + "\n")
+
+
+def write_coordinate_map(msa: MSA, map_file: str) -> None:
+    """
+    Writes a tab-separated file with a header line of column names and one
+    line per run of consecutive kept sites: the first and last original
+    position of the run and the positions they were given in the trimmed
+    alignment. Positions start at 1, as in the log file, and both ends of
+    a run are included.
+    """
+    positions = msa.kept_positions
+    # indices into positions where runs start and stop
+    breaks = np.flatnonzero(np.diff(positions) != 1) + 1
+    run_starts = np.concatenate(([0], breaks))[: len(positions)]
+    run_stops = np.append(breaks, len(positions))[: len(positions)]
+    intervals = np.column_stack(
+        (
+            positions[run_starts] + 1,
+            positions[run_stops - 1] + 1,
+            run_starts + 1,
+            run_stops,
+        )
+    )
+    np.savetxt(
+        map_file,
+        intervals,
+        fmt="%d",
+        delimiter="\t",
+        header="original_start\toriginal_end\ttrimmed_start\ttrimmed_end",
+        # a plain header line, so that TSV readers take it for column names
+        comments="",
+    )
@@ -0,0 +1,75 @@
+from collections.abc import Sequence
+from typing import Iterable, Iterator, Union
+
+import numpy as np
+
+
+class HeaderTable(Sequence):
+    """
+    FASTA titles of an alignment kept as one UTF-8 buffer plus offsets,
+    instead of a dict of strings per sequence.
+
+    Items are the {"id", "name", "description"} dicts of MSA.header_info,
+    decoded when accessed. Like Biopython, the id and name are the first
+    word of the title and the description is the whole title.
+    """
+
+    def __init__(self, buffer: bytes, offsets: np.ndarray) -> None:
+        self.buffer = buffer
+        # title i is buffer[offsets[i] : offsets[i + 1]]
+        self.offsets = offsets
+
+    @classmethod
+    def from_titles(cls, titles: Iterable[bytes]) -> "HeaderTable":
+        titles = list(titles)
+        offsets = np.zeros(len(titles) + 1, dtype=np.int64)
+        np.cumsum([len(title) for title in titles], out=offsets[1:])
+        return cls(b"".join(titles), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def title(self, idx: int) -> bytes:
+        return self.buffer[self.offsets[idx] : self.offsets[idx + 1]]
+
+    def titles(self) -> list[bytes]:
+        offsets = self.offsets.tolist()
+        return [
+            self.buffer[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])
+        ]
+
+    @staticmethod
+    def _info(title: bytes) -> dict:
+        description = title.decode("utf-8")
+        words = description.split(None, 1)
+        identifier = words[0] if words else ""
+        return {"id": identifier, "name": identifier, "description": description}
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[dict, "HeaderTable"]:
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            stop = max(start, stop)
+            offsets = self.offsets[start : stop + 1]
+            return HeaderTable(
+                self.buffer[offsets[0] : offsets[-1]], offsets - offsets[0]
+            )
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("header index out of range")
+        return self._info(self.title(idx))
+
+    def __iter__(self) -> Iterator[dict]:
+        for title in self.titles():
+            yield self._info(title)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, HeaderTable):
+            return self.buffer == other.buffer and np.array_equal(
+                self.offsets, other.offsets
+            )
+        if isinstance(other, Sequence):
+            return list(self) == list(other)
+        return NotImplemented
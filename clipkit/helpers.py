@@ -1,28 +1,29 @@
 import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union
 
 from Bio import SeqIO
 from Bio.Align import MultipleSeqAlignment
+import numpy as np
 
+from .kernels import UPPER_CASE_TABLE, byte_table
 from .msa import MSA
 from .modes import TrimmingMode
 from .settings import DEFAULT_AA_GAP_CHARS, DEFAULT_NT_GAP_CHARS
 from .files import FileFormat
+from .seq_types import SeqType
 from .stats import TrimmingStats
 
-from enum import Enum
-
-
-class SeqType(Enum):
-    aa = "aa"
-    nt = "nt"
-
 
 def remove_gaps(seq: str, gap_chars: list[str] = DEFAULT_AA_GAP_CHARS) -> str:
     pattern = "|".join([re.escape(char) for char in gap_chars])
     return re.sub(pattern, "", seq)
 
 
-def get_seq_type(alignment: MultipleSeqAlignment) -> SeqType:
+def get_seq_type(alignment: Union[MultipleSeqAlignment, MSA]) -> SeqType:
+    if isinstance(alignment, MSA):
+        return get_msa_seq_type(alignment)
+
     seq = str(alignment[0].seq)
     seq = remove_gaps(seq)
     if len(seq) < 200:
@@ -37,6 +38,29 @@ def get_seq_type(alignment: MultipleSeqAlignment) -> SeqType:
     return sequence_type
 
 
+def get_msa_seq_type(msa: MSA) -> SeqType:
+    """
+    get_seq_type working on the byte matrix of an MSA
+    """
+    is_gap = byte_table(DEFAULT_AA_GAP_CHARS)
+    first_row = msa.rows(0, 1)[0]
+    residues = first_row[~is_gap[first_row]]
+    present = np.bincount(residues, minlength=256) > 0
+    if len(residues) < 200:
+        # a block of rows at a time, so packed or sparse rows are never all
+        # expanded at once
+        for start in range(0, msa.n_sequences, 1024):
+            rows = msa.rows(start, start + 1024)
+            present |= np.bincount(rows[~is_gap[rows]], minlength=256) > 0
+
+    if len(np.unique(UPPER_CASE_TABLE[present])) > 5:
+        sequence_type = SeqType.aa
+    else:
+        sequence_type = SeqType.nt
+
+    return sequence_type
+
+
 def get_gap_chars(seq_type: SeqType) -> list[str]:
     if seq_type == SeqType.nt:
         return DEFAULT_NT_GAP_CHARS
@@ -51,11 +75,24 @@ def create_msa(alignment: MultipleSeqAlignment, gap_chars: list[str] = None) ->
     return MSA.from_bio_msa(alignment, gap_chars)
 
 
-def write_msa(msa: MSA, out_file_name: str, out_file_format: FileFormat) -> None:
+def write_msa(
+    msa: MSA,
+    out_file_name: str,
+    out_file_format: FileFormat,
+    output_msa: Union[MultipleSeqAlignment, None] = None,
+) -> None:
     """
     msa is populated with sites that are kept after trimming is finished
+
+    output_msa is msa.to_bio_msa(), if already built
     """
-    output_msa = msa.to_bio_msa()
+    if out_file_format == FileFormat.fasta:
+        with open(out_file_name, "wb") as handle:
+            msa.write_fasta(handle)
+        return
+
+    if output_msa is None:
+        output_msa = msa.to_bio_msa()
     if out_file_format.value == "phylip_relaxed":
         SeqIO.write(output_msa, out_file_name, "phylip-relaxed")
     elif out_file_format.value == "phylip_sequential":
@@ -64,12 +101,39 @@ def write_msa(msa: MSA, out_file_name: str, out_file_format: FileFormat) -> None
         SeqIO.write(output_msa, out_file_name, out_file_format.value)
 
 
+def write_msa_formats(msa: MSA, outputs: list[tuple[str, FileFormat]]) -> None:
+    """
+    Writes the kept sites of msa to each (file name, format) of outputs,
+    one thread per output. Formats other than FASTA share one Biopython
+    alignment, built once.
+    """
+    if len(outputs) == 1:
+        return write_msa(msa, *outputs[0])
+
+    output_msa = None
+    if any(out_file_format != FileFormat.fasta for _, out_file_format in outputs):
+        output_msa = msa.to_bio_msa()
+
+    with ThreadPoolExecutor(max_workers=len(outputs)) as executor:
+        futures = [
+            executor.submit(write_msa, msa, out_file_name, out_file_format, output_msa)
+            for out_file_name, out_file_format in outputs
+        ]
+        for future in futures:
+            future.result()
+
+
 def write_complement(msa: MSA, out_file: str, out_file_format: FileFormat) -> None:
     """
     msa is populated with sites that are trimmed after trimming is finished
     """
-    output_msa = msa.complement_to_bio_msa()
     completmentOut = str(out_file) + ".complement"
+    if out_file_format == FileFormat.fasta:
+        with open(completmentOut, "wb") as handle:
+            msa.write_fasta(handle, complement=True)
+        return
+
+    output_msa = msa.complement_to_bio_msa()
     if out_file_format.value == "phylip_relaxed":
         SeqIO.write(output_msa, out_file, "phylip-relaxed")
     elif out_file_format.value == "phylip_sequential":
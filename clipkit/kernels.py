@@ -0,0 +1,372 @@
+"""
+Hot loops over the MSA byte matrix.
+
+Each kernel has a pure numpy implementation here. When the optional
+compiled extension (clipkit/_kernels.pyx) has been built, it is used
+instead; both give identical results.
+"""
+import hashlib
+from typing import BinaryIO, Callable, Iterable, Iterator, Union
+
+import numpy as np
+
+try:
+    from . import _kernels
+except ImportError:
+    _kernels = None
+
+FASTA_LINE_WIDTH = 60
+
+# grouping identical columns only pays off for long alignments in which
+# many columns repeat, as in alignments of closely related genomes
+MIN_SITES_FOR_PATTERNS = 1 << 14
+MAX_PATTERN_FRACTION = 0.5
+PATTERN_SAMPLE_SIZE = 1 << 14
+
+# likewise for rows: grouping identical sequences pays off when at most
+# this fraction of them are distinct, which a few columns can rule out
+MAX_UNIQUE_ROW_FRACTION = 0.5
+ROW_SAMPLE_SIZE = 256
+
+# maps every byte to its upper case byte, e.g. b"a" -> b"A"
+UPPER_CASE_TABLE = np.frombuffer(bytes(range(256)).upper(), dtype=np.uint8)
+
+# number of set bits in every byte
+POPCOUNT_TABLE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(
+    axis=1, dtype=np.uint8
+)
+
+
+def byte_table(chars: list[str]) -> np.ndarray:
+    """
+    Boolean lookup table of the bytes of chars, indexed by byte value
+    """
+    table = np.zeros(256, dtype=bool)
+    for char in chars:
+        table[list(char.encode("ascii"))] = True
+    return table
+
+
+def packed_gap_mask(matrix: np.ndarray, gap_chars: list[str]) -> np.ndarray:
+    """
+    Gap cells of matrix packed 8 rows to a byte, laid out like
+    np.packbits(is_gap, axis=0): an (ceil(n_rows / 8), n_columns) array in
+    which the first row of each group of 8 is the most significant bit.
+    """
+    is_gap = byte_table(gap_chars).astype(np.uint8)
+    packed = np.zeros(((matrix.shape[0] + 7) // 8, matrix.shape[1]), dtype=np.uint8)
+    # one bit plane at a time, so that no temporary is larger than the result
+    for bit in range(8):
+        rows = matrix[bit::8]
+        packed[: len(rows)] |= is_gap[rows] << (7 - bit)
+    return packed
+
+
+def packed_column_counts(packed: np.ndarray) -> np.ndarray:
+    """
+    Number of set bits in each column of a packed mask
+    """
+    return POPCOUNT_TABLE[packed].sum(axis=0, dtype=np.intp)
+
+
+def fasta_records(data: bytes) -> Iterator[tuple[bytes, bytes]]:
+    """
+    Title and sequence, without whitespace, of every record of FASTA bytes.
+    Raises ValueError if data is not FASTA.
+    """
+    if not data.startswith(b">"):
+        raise ValueError("Not a FASTA file")
+
+    start = 1
+    while start <= len(data):
+        end = data.find(b"\n>", start)
+        if end == -1:
+            end = len(data)
+        title, _, sequence = data[start:end].partition(b"\n")
+        yield title.rstrip(), sequence.translate(None, b" \t\r\n")
+        start = end + 2
+
+
+def numpy_fasta_to_byte_matrix(data: bytes) -> tuple[list[bytes], np.ndarray]:
+    titles = []
+    sequences = []
+    for title, sequence in fasta_records(data):
+        titles.append(title)
+        sequences.append(sequence)
+
+    length = len(sequences[0])
+    if any(len(sequence) != length for sequence in sequences):
+        raise ValueError("Sequences must all be the same length")
+
+    matrix = np.frombuffer(b"".join(sequences), dtype=np.uint8)
+    return titles, matrix.reshape(len(sequences), length)
+
+
+def numpy_count_states(
+    matrix: np.ndarray, state_index: np.ndarray, n_states: int
+) -> np.ndarray:
+    counts = np.zeros((n_states, matrix.shape[1]), dtype=np.int32)
+    indexed = state_index[matrix]
+    for state in range(n_states):
+        counts[state] = np.count_nonzero(indexed == state, axis=0)
+    return counts
+
+
+def numpy_count_weighted_states(
+    matrix: np.ndarray, weights: np.ndarray, state_index: np.ndarray, n_states: int
+) -> np.ndarray:
+    counts = np.zeros((n_states, matrix.shape[1]), dtype=np.int32)
+    indexed = state_index[matrix]
+    for state in range(n_states):
+        counts[state] = weights @ (indexed == state)
+    return counts
+
+
+def numpy_unpack_nibbles(
+    packed: np.ndarray, high_bytes: np.ndarray, low_bytes: np.ndarray, n_rows: int
+) -> np.ndarray:
+    matrix = np.empty((2 * len(packed), packed.shape[1]), dtype=np.uint8)
+    np.take(high_bytes, packed, out=matrix[0::2], mode="clip")
+    np.take(low_bytes, packed, out=matrix[1::2], mode="clip")
+    return matrix[:n_rows]
+
+
+def numpy_write_fasta(
+    handle: BinaryIO,
+    titles: list[bytes],
+    matrix: np.ndarray,
+    positions: np.ndarray,
+    wrap: int,
+) -> None:
+    n_positions = len(positions)
+    line_ends = np.arange(wrap, n_positions, wrap)
+    # one line feed after every full line and one at the end of the sequence
+    newlines = np.append(line_ends, n_positions) if n_positions else line_ends
+
+    # format rows in chunks of about 16 MB to bound the size of the copy
+    chunk_size = max(1, (1 << 24) // max(n_positions, 1))
+    for start in range(0, matrix.shape[0], chunk_size):
+        rows = np.take(matrix[start : start + chunk_size], positions, axis=1)
+        rows = np.insert(rows, newlines, ord("\n"), axis=1)
+        for title, row in zip(titles[start : start + chunk_size], rows):
+            handle.write(b">" + title + b"\n")
+            handle.write(row.tobytes())
+
+
+def fasta_to_byte_matrix(data: bytes) -> tuple[list[bytes], np.ndarray]:
+    """
+    Parses FASTA bytes into record titles and an (n_records, length) uint8
+    matrix, the way Biopython's FASTA parser reads titles and sequences.
+    Raises ValueError if data is not FASTA or the sequences differ in length.
+    """
+    if _kernels is not None:
+        return _kernels.fasta_to_byte_matrix(data)
+    return numpy_fasta_to_byte_matrix(data)
+
+
+def column_state_counts(
+    matrix: np.ndarray, gap_chars: list[str], weights: Union[np.ndarray, None] = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Counts the characters in each column, ignoring case and gaps.
+
+    Returns the upper case state bytes and an (n_states, n_columns) array
+    of counts. Like the original per-column implementation, characters
+    are upper cased before gap characters are removed. If weights are
+    given, each row counts as many times as its weight.
+    """
+    present = np.bincount(matrix.ravel(), minlength=256) > 0
+    states, state_index = state_table(present, gap_chars)
+
+    if weights is not None:
+        weights = np.ascontiguousarray(weights, dtype=np.int32)
+        if _kernels is not None:
+            counts = _kernels.count_weighted_states(
+                matrix, weights, state_index, len(states)
+            )
+        else:
+            counts = numpy_count_weighted_states(
+                matrix, weights, state_index, len(states)
+            )
+    else:
+        counts = count_states(matrix, state_index, len(states))
+    return states, counts
+
+
+def unpack_nibbles(
+    packed: np.ndarray, high_bytes: np.ndarray, low_bytes: np.ndarray, n_rows: int
+) -> np.ndarray:
+    """
+    Unpacks a matrix holding two rows per byte: row 2i is high_bytes and
+    row 2i + 1 low_bytes indexed by the bytes of packed row i
+    """
+    if _kernels is not None:
+        return _kernels.unpack_nibbles(packed, high_bytes, low_bytes, n_rows)
+    return numpy_unpack_nibbles(packed, high_bytes, low_bytes, n_rows)
+
+
+def state_table(
+    present: np.ndarray, gap_chars: list[str]
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    States of column_state_counts for the bytes marked in present, and the
+    index of the state of every byte (-1 for gaps)
+    """
+    folded_present = np.zeros(256, dtype=bool)
+    folded_present[UPPER_CASE_TABLE[present]] = True
+    states = np.flatnonzero(folded_present & ~byte_table(gap_chars)).astype(np.uint8)
+
+    state_index = np.full(256, -1, dtype=np.intp)
+    for idx, state in enumerate(states):
+        state_index[UPPER_CASE_TABLE == state] = idx
+    return states, state_index
+
+
+def count_states(
+    matrix: np.ndarray, state_index: np.ndarray, n_states: int
+) -> np.ndarray:
+    """
+    (n_states, n_columns) counts of the cells of matrix whose byte maps to
+    each state index; bytes mapped to -1 are not counted
+    """
+    if _kernels is not None:
+        return _kernels.count_states(matrix, state_index, n_states)
+    return numpy_count_states(matrix, state_index, n_states)
+
+
+def row_sample_positions(n_columns: int) -> np.ndarray:
+    """
+    Evenly spaced columns in which to compare rows before unique_rows
+    reads them in full
+    """
+    return np.unique(
+        np.linspace(0, n_columns - 1, min(n_columns, ROW_SAMPLE_SIZE), dtype=np.intp)
+    )
+
+
+def row_digests(rows: Iterable[np.ndarray]) -> np.ndarray:
+    """
+    (n_rows, 2) 128-bit BLAKE2 digest of every row
+    """
+    return np.frombuffer(
+        b"".join(
+            hashlib.blake2b(np.ascontiguousarray(row), digest_size=16).digest()
+            for row in rows
+        ),
+        dtype=np.uint64,
+    ).reshape(-1, 2)
+
+
+def unique_rows(
+    sample: np.ndarray,
+    row_blocks: Callable[[], Iterable[tuple[int, np.ndarray]]],
+    row: Callable[[int], np.ndarray],
+) -> Union[tuple[np.ndarray, np.ndarray], None]:
+    """
+    Groups identical rows (sequences).
+
+    sample holds some columns of every row (see row_sample_positions),
+    row_blocks gives all rows as consecutive (first row, block) pairs and
+    row a single row. Returns the position of the first row of each group
+    and the number of rows in it, or None when too few rows are identical
+    for grouping to pay off. Column counts of the grouped rows, weighted
+    by these numbers, equal those of all rows.
+
+    Rows are keyed by fixed-size digests, so no row is copied; rows that
+    differ in the sample are never read in full.
+    """
+    n_rows = len(sample)
+    _, sample_groups, sample_sizes = np.unique(
+        sample, axis=0, return_inverse=True, return_counts=True
+    )
+    if len(sample_sizes) > MAX_UNIQUE_ROW_FRACTION * n_rows:
+        return None
+    sample_groups = sample_groups.ravel()
+
+    # rows that differ in the sample differ, so only rows whose sample
+    # repeats need a digest; the sample group tells the others apart
+    keys = np.zeros((n_rows, 3), dtype=np.uint64)
+    keys[:, 0] = sample_groups
+    candidates = sample_sizes[sample_groups] > 1
+    for first, block in row_blocks():
+        in_block = np.flatnonzero(candidates[first : first + len(block)])
+        if len(in_block):
+            # one row at a time, since fancy indexing would copy the block
+            rows = map(block.__getitem__, in_block.tolist())
+            keys[first + in_block, 1:] = row_digests(rows)
+
+    _, first_rows, groups, sizes = np.unique(
+        keys, axis=0, return_index=True, return_inverse=True, return_counts=True
+    )
+    if len(sizes) > MAX_UNIQUE_ROW_FRACTION * n_rows:
+        return None
+
+    # rows that share a digest must also equal the first row of their group;
+    # otherwise two different rows collided and are not grouped at all
+    representatives = first_rows[groups.ravel()]
+    for idx in np.flatnonzero(representatives != np.arange(n_rows)).tolist():
+        if not np.array_equal(row(idx), row(int(representatives[idx]))):
+            return None
+
+    order = np.argsort(first_rows)
+    return first_rows[order].astype(np.intp), sizes[order].astype(np.int32)
+
+
+def write_fasta(
+    handle: BinaryIO,
+    titles: list[bytes],
+    matrix: np.ndarray,
+    positions: np.ndarray,
+    wrap: int = FASTA_LINE_WIDTH,
+) -> None:
+    """
+    Writes the given columns of every row as FASTA, wrapped like Biopython
+    """
+    positions = np.ascontiguousarray(positions, dtype=np.intp)
+    if _kernels is not None:
+        _kernels.write_fasta(handle, titles, matrix, positions, wrap)
+    else:
+        numpy_write_fasta(handle, titles, matrix, positions, wrap)
+
+
+def hash_columns(matrix: np.ndarray, offset: int, multiplier: int) -> np.ndarray:
+    """
+    64-bit FNV-1a style hash of every column of matrix
+    """
+    hashes = np.full(matrix.shape[1], offset, dtype=np.uint64)
+    multiplier = np.uint64(multiplier)
+    for row in matrix:
+        hashes ^= row
+        hashes *= multiplier
+    return hashes
+
+
+def site_patterns(matrix: np.ndarray) -> Union[tuple[np.ndarray, np.ndarray], None]:
+    """
+    Groups identical columns into site patterns, as tree-building programs do.
+
+    Returns the position of the first column of each pattern and, for every
+    column, the index of its pattern; statistics computed once per pattern
+    are mapped back to columns by indexing with the latter. Returns None
+    when too few columns repeat for grouping to pay off.
+    """
+    n_sites = matrix.shape[1]
+    if n_sites < MIN_SITES_FOR_PATTERNS:
+        return None
+
+    # estimate how many columns repeat from evenly spaced columns
+    sample = matrix[:, :: max(1, n_sites // PATTERN_SAMPLE_SIZE)]
+    sample_hashes = hash_columns(sample, 0xCBF29CE484222325, 0x100000001B3)
+    if len(np.unique(sample_hashes)) > MAX_PATTERN_FRACTION * sample.shape[1]:
+        return None
+
+    hashes = hash_columns(matrix, 0xCBF29CE484222325, 0x100000001B3)
+    _, positions, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+
+    # columns that share a hash must also share a second, independent one;
+    # otherwise two different columns collided and are not grouped at all
+    check = hash_columns(matrix, 0x84222325CBF29CE4, 0x1000193)
+    if not np.array_equal(check[positions][inverse], check):
+        return None
+    return positions, inverse
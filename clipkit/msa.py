@@ -2,16 +2,40 @@ from Bio.Align import MultipleSeqAlignment
 from Bio.Seq import Seq
 from Bio.SeqRecord import SeqRecord
 import numpy as np
-from itertools import chain
-from typing import Union
-
+from typing import TYPE_CHECKING, BinaryIO, Iterator, Union
+
+from .exceptions import InvalidCodonAlignment
+from .headers import HeaderTable
+from .kernels import (
+    byte_table,
+    column_state_counts,
+    fasta_to_byte_matrix,
+    row_sample_positions,
+    site_patterns,
+    unique_rows,
+    write_fasta,
+)
 from .modes import TrimmingMode
 from .site_classification import (
     SiteClassificationType,
-    determine_site_classification_type,
+    classify_sites,
 )
 from .settings import DEFAULT_AA_GAP_CHARS
 from .stats import TrimmingStats
+from .storage import SPARSE_GAP_FRACTION, ByteMatrix, NibbleMatrix, SparseRows
+
+if TYPE_CHECKING:
+    from .column_state import ColumnState
+
+
+def to_byte_matrix(seq_records: np.ndarray) -> np.ndarray:
+    """
+    Character arrays (e.g. dtype '<U1') -> uint8 matrix; byte matrices are used as is
+    """
+    seq_records = np.asarray(seq_records)
+    if seq_records.dtype == np.uint8:
+        return seq_records
+    return seq_records.astype("S1").view(np.uint8)
 
 
 class MSA:
@@ -19,12 +43,26 @@ class MSA:
         self, header_info, seq_records, gap_chars=DEFAULT_AA_GAP_CHARS
     ) -> None:
         self.header_info = header_info
-        self.seq_records = seq_records
-        self._original_length = len(self.seq_records[0])
+        # residues are stored as one byte per cell, unless packed later or
+        # given in another storage
+        if isinstance(seq_records, (ByteMatrix, NibbleMatrix, SparseRows)):
+            self._storage = seq_records
+        else:
+            self._storage = ByteMatrix(to_byte_matrix(seq_records))
+        self._original_length = self._storage.shape[1]
         self._site_positions_to_keep = np.arange(self._original_length)
-        self._site_positions_to_trim = np.array([])
+        self._site_positions_to_trim = np.array([], dtype=int)
         self._site_classification_types = None
         self._column_character_frequencies = None
+        self._column_state_counts = None
+        self._column_gap_counts = None
+        self._site_patterns = None
+        self._site_patterns_checked = False
+        self._pattern_state_counts = None
+        self._unique_rows = None
+        self._unique_rows_checked = False
+        self._site_gappyness = None
+        self._trimmed_matrix = None
         self._gap_chars = gap_chars
         self._codon_size = 3
 
@@ -34,39 +72,199 @@ class MSA:
             {"id": rec.id, "name": rec.name, "description": rec.description}
             for rec in alignment
         ]
-        seq_records = np.array([list(rec) for rec in alignment])
-        return MSA(header_info, seq_records, gap_chars)
+        matrix = np.frombuffer(
+            b"".join(bytes(rec.seq) for rec in alignment), dtype=np.uint8
+        ).reshape(len(alignment), alignment.get_alignment_length())
+        return MSA(header_info, matrix, gap_chars)
+
+    @staticmethod
+    def from_fasta_bytes(data: bytes, gap_chars=None) -> "MSA":
+        """
+        Builds the MSA straight from the bytes of a FASTA file, without Biopython.
+        Files that are mostly gaps are read into sparse storage.
+        Raises ValueError if data is not an aligned FASTA file.
+        """
+        if data.count(b"-") >= SPARSE_GAP_FRACTION * len(data):
+            titles, matrix = SparseRows.from_fasta(data)
+        else:
+            titles, matrix = fasta_to_byte_matrix(data)
+        return MSA(HeaderTable.from_titles(titles), matrix, gap_chars)
+
+    @staticmethod
+    def from_matrix(matrix: np.ndarray, ids=None, gap_chars=None) -> "MSA":
+        """
+        Builds the MSA from an (n_sequences, length) character or byte matrix.
+        Sequences are named 1, 2, ... unless ids are given.
+        """
+        matrix = to_byte_matrix(matrix)
+        if matrix.ndim != 2:
+            raise ValueError("Alignment matrix must have two dimensions")
+        if ids is None:
+            ids = [str(row + 1) for row in range(matrix.shape[0])]
+        elif len(ids) != matrix.shape[0]:
+            raise ValueError("Number of ids must match the number of sequences")
+        header_info = [
+            {"id": str(id), "name": str(id), "description": str(id)} for id in ids
+        ]
+        return MSA(header_info, matrix, gap_chars)
 
     def to_bio_msa(self) -> MultipleSeqAlignment:
-        return self._to_bio_msa(self.sites_kept)
+        return self._to_bio_msa(self._site_positions_to_keep)
 
     def complement_to_bio_msa(self) -> MultipleSeqAlignment:
-        return self._to_bio_msa(self.sites_trimmed)
+        return self._to_bio_msa(self._site_positions_to_trim)
 
-    def _to_bio_msa(self, sites) -> MultipleSeqAlignment:
+    def _to_bio_msa(self, site_positions) -> MultipleSeqAlignment:
         # NOTE: we use the description as the id to preserve the full sequence description - see issue #20
+        return MultipleSeqAlignment(
+            [
+                SeqRecord(Seq(row), id=str(info["description"]), description="")
+                for row, info in zip(self._row_bytes(site_positions), self.header_info)
+            ]
+        )
+
+    def _row_bytes(self, site_positions=slice(None)) -> Iterator[bytes]:
+        """
+        Bytes of the sites at site_positions of every row, built one block of
+        rows at a time so that sparse alignments are never made dense whole
+        """
+        for _, block, block_positions in self._storage.row_blocks(site_positions):
+            for row in block[:, block_positions]:
+                yield row.tobytes()
+
+    def original_to_bio_msa(self) -> MultipleSeqAlignment:
+        """
+        The untrimmed alignment with the ids, names and descriptions it was read with
+        """
         return MultipleSeqAlignment(
             [
                 SeqRecord(
-                    Seq("".join(rec)), id=str(info["description"]), description=""
+                    Seq(row),
+                    id=info["id"],
+                    name=info["name"],
+                    description=info["description"],
                 )
-                for rec, info in zip(sites.tolist(), self.header_info)
+                for row, info in zip(self._row_bytes(), self.header_info)
+            ]
+        )
+
+    def write_fasta(self, handle: BinaryIO, complement: bool = False) -> None:
+        """
+        Writes the kept (or, with complement, the trimmed) sites as FASTA.
+        Output is identical to writing to_bio_msa() with Bio.SeqIO.
+        """
+        if isinstance(self.header_info, HeaderTable):
+            # FASTA titles already hold no line feeds
+            titles = [
+                title.replace(b"\r", b" ") for title in self.header_info.titles()
             ]
+        else:
+            titles = [
+                str(info["description"])
+                .replace("\n", " ")
+                .replace("\r", " ")
+                .encode("utf-8")
+                for info in self.header_info
+            ]
+        site_positions = (
+            self._site_positions_to_trim if complement else self._site_positions_to_keep
         )
+        for start, rows, positions in self._storage.row_blocks(site_positions):
+            write_fasta(handle, titles[start : start + len(rows)], rows, positions)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """
+        The untrimmed alignment as an (n_sequences, length) uint8 matrix.
+        Packed alignments are unpacked on every access.
+        """
+        return self._storage.take()
+
+    def rows(self, start: int = 0, stop: Union[int, None] = None) -> np.ndarray:
+        """
+        Rows start to stop of matrix, unpacking only those
+        """
+        return self._storage.rows(start, stop)
+
+    @property
+    def n_sequences(self) -> int:
+        return self._storage.shape[0]
+
+    @property
+    def is_packed(self) -> bool:
+        return isinstance(self._storage, NibbleMatrix)
+
+    def pack_nucleotides(self) -> bool:
+        """
+        Stores the residues as 4-bit codes, halving their memory (see
+        storage.NibbleMatrix). Only alignments of upper case nucleotides,
+        IUPAC codes and "-" can be packed; returns whether this one was.
+        """
+        if isinstance(self._storage, ByteMatrix):
+            packed = NibbleMatrix.pack(self._storage.matrix)
+            if packed is not None:
+                self._storage = packed
+                self._trimmed_matrix = None
+        return self.is_packed
+
+    @property
+    def keep_mask(self) -> np.ndarray:
+        """
+        Boolean mask over the original sites, True where a site is kept
+        """
+        keep_mask = np.zeros(self._original_length, dtype=bool)
+        keep_mask[self._site_positions_to_keep] = True
+        return keep_mask
+
+    @property
+    def kept_positions(self) -> np.ndarray:
+        return self._site_positions_to_keep
+
+    @property
+    def trimmed_positions(self) -> np.ndarray:
+        return self._site_positions_to_trim
+
+    @property
+    def trimmed_matrix(self) -> np.ndarray:
+        """
+        The kept sites as a read-only (n_sequences, length) uint8 matrix.
+        This is a view of matrix when the kept sites are one contiguous run
+        and the alignment is not packed; otherwise they are copied once on
+        first access.
+        """
+        if self._trimmed_matrix is None:
+            positions = self._site_positions_to_keep
+            if len(positions) and positions[-1] - positions[0] == len(positions) - 1:
+                trimmed_matrix = self._storage.take(
+                    slice(positions[0], positions[-1] + 1)
+                )
+            else:
+                trimmed_matrix = self._storage.take(positions)
+            trimmed_matrix.flags.writeable = False
+            self._trimmed_matrix = trimmed_matrix
+        return self._trimmed_matrix
+
+    @property
+    def seq_records(self):
+        return self._decode(self.matrix)
 
     @property
     def trimmed(self):
         if len(self._site_positions_to_trim) == 0:
             return self.seq_records
-        return np.delete(self.seq_records, self._site_positions_to_trim, axis=1)
+        return self._decode(self._storage.take(self._site_positions_to_keep))
 
     @property
     def sites_kept(self):
-        return np.take(self.seq_records, self._site_positions_to_keep, axis=1)
+        return self._decode(self._storage.take(self._site_positions_to_keep))
 
     @property
     def sites_trimmed(self):
-        return np.take(self.seq_records, self._site_positions_to_trim, axis=1)
+        return self._decode(self._storage.take(self._site_positions_to_trim))
+
+    @staticmethod
+    def _decode(matrix: np.ndarray) -> np.ndarray:
+        return matrix.view("S1").astype("U1")
 
     @property
     def length(self) -> int:
@@ -80,14 +278,71 @@ class MSA:
     def gap_chars(self):
         return self._gap_chars
 
+    @gap_chars.setter
+    def gap_chars(self, gap_chars):
+        self._gap_chars = gap_chars
+        self._site_gappyness = None
+        self._column_gap_counts = None
+        self._column_state_counts = None
+        self._pattern_state_counts = None
+        self._column_character_frequencies = None
+        self._site_classification_types = None
+
+    def column_gap_counts(self, gap_chars=None) -> np.ndarray:
+        """
+        Number of gap characters in each column (case sensitive)
+        """
+        if gap_chars is not None and gap_chars != self._gap_chars:
+            return self._storage.gap_counts(gap_chars)
+        if self._column_gap_counts is None:
+            # only worth grouping columns and rows for if they were grouped
+            # already, since counting gaps is cheap
+            positions, inverse = self._site_patterns or (slice(None), None)
+            if self._unique_rows is None:
+                gap_counts = self._storage.gap_counts(self._gap_chars, positions)
+            else:
+                rows, weights = self._unique_rows
+                cells = self._storage.take(positions, rows)
+                gap_counts = weights @ byte_table(self._gap_chars)[cells]
+            self._column_gap_counts = (
+                gap_counts if inverse is None else gap_counts[inverse]
+            )
+        return self._column_gap_counts
+
+    def _count_states(
+        self, positions: Union[slice, np.ndarray] = slice(None)
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        column_state_counts of the columns at positions. Identical rows are
+        counted once, weighted by the number of rows like them.
+        """
+        if self.unique_rows is None:
+            return self._storage.state_counts(self.gap_chars, positions)
+        rows, weights = self.unique_rows
+        return column_state_counts(
+            self._storage.take(positions, rows), self.gap_chars, weights
+        )
+
+    def use_column_state(self, column_state: "ColumnState") -> None:
+        """
+        Takes the column counts from a saved state instead of counting them
+        """
+        self.gap_chars = column_state.gap_chars
+        self._column_gap_counts = column_state.gap_counts
+        self._column_state_counts = (column_state.states, column_state.counts)
+
     @property
     def site_gappyness(self) -> np.floating:
-        site_gappyness = (np.isin(self.seq_records, self._gap_chars)).mean(axis=0)
-        return np.around(site_gappyness, decimals=4)
+        if self._site_gappyness is None:
+            site_gappyness = self.column_gap_counts() / self.n_sequences
+            self._site_gappyness = np.around(site_gappyness, decimals=4)
+        return self._site_gappyness
 
     @property
     def is_empty(self) -> bool:
-        all_zeros = np.all(self.sites_kept[0] == "")
+        all_zeros = np.all(
+            self._storage.take(self._site_positions_to_keep, rows=[0]) == 0
+        )
         return all_zeros
 
     @property
@@ -95,11 +350,18 @@ class MSA:
         return TrimmingStats(self)
 
     def is_any_entry_sequence_only_gaps(self) -> tuple[bool, Union[str, None]]:
-        for idx, row in enumerate(self.trimmed):
-            if np.all(row == row[0]) and (  # all values the same
-                row[0] in self.gap_chars
-            ):
-                return True, self.header_info[idx].get("id")
+        if len(self._site_positions_to_keep) == 0:
+            return False, None
+        is_gap = byte_table(self.gap_chars)
+        for start, rows, positions in self._storage.row_blocks(
+            self._site_positions_to_keep
+        ):
+            kept = rows[:, positions]
+            only_gaps = np.all(kept == kept[:, :1], axis=1) & (  # all values the same
+                is_gap[kept[:, 0]]
+            )
+            if np.any(only_gaps):
+                return True, self.header_info[start + np.argmax(only_gaps)].get("id")
         return False, None
 
     def trim(
@@ -111,7 +373,7 @@ class MSA:
     ) -> np.array:
         if site_positions_to_trim is not None:
             if isinstance(site_positions_to_trim, list):
-                site_positions_to_trim = np.array(site_positions_to_trim)
+                site_positions_to_trim = np.array(site_positions_to_trim, dtype=int)
             if not isinstance(site_positions_to_trim, np.ndarray):
                 raise ValueError("site_positions_to_trim must be a list or np array")
 
@@ -129,24 +391,100 @@ class MSA:
         self._site_positions_to_keep = np.delete(
             np.arange(self._original_length), self._site_positions_to_trim
         )
+        self._trimmed_matrix = None
+
+    def trim_codons_of(self, protein: "MSA") -> None:
+        """
+        Trims this codon alignment by the sites trimmed from protein, the
+        trimmed protein alignment it was threaded onto: amino acid site i
+        is codon sites 3i to 3i + 2. Sequences are matched by id and may be
+        in any order. No statistics of the codon alignment are computed.
+        """
+        ids = sorted(info["id"] for info in self.header_info)
+        if ids != sorted(info["id"] for info in protein.header_info):
+            raise InvalidCodonAlignment(
+                "Codon and protein alignments must hold the same sequence ids"
+            )
+        if self._original_length != self._codon_size * protein.original_length:
+            raise InvalidCodonAlignment(
+                f"Codon alignment has {self._original_length} sites, expected "
+                f"{self._codon_size} per protein site ({protein.original_length})"
+            )
+        self.trim(
+            site_positions_to_trim=self._codon_size * protein.trimmed_positions,
+            codon=True,
+        )
+
+    @property
+    def column_state_counts(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Upper case non-gap states and their (n_states, length) counts per column
+        """
+        if self._column_state_counts is None:
+            if self.site_patterns is None:
+                self._column_state_counts = self._count_states()
+            else:
+                _, inverse = self.site_patterns
+                states, counts = self.pattern_state_counts
+                self._column_state_counts = (states, counts[:, inverse])
+        return self._column_state_counts
+
+    @property
+    def site_patterns(self) -> Union[tuple[np.ndarray, np.ndarray], None]:
+        """
+        Position of the first column of each site pattern and the pattern of
+        every column, or None if too few columns repeat (see
+        kernels.site_patterns)
+        """
+        if not self._site_patterns_checked:
+            column_keys = self._storage.column_keys
+            if column_keys is not None:
+                self._site_patterns = site_patterns(column_keys)
+            self._site_patterns_checked = True
+        return self._site_patterns
+
+    @property
+    def unique_rows(self) -> Union[tuple[np.ndarray, np.ndarray], None]:
+        """
+        Position of the first row of each group of identical sequences and
+        the number of sequences in it, or None if all sequences differ (see
+        kernels.unique_rows). Sparse rows are never grouped, since counting
+        the groups would make them dense.
+        """
+        if not self._unique_rows_checked:
+            storage = self._storage
+            if not isinstance(storage, SparseRows):
+                self._unique_rows = unique_rows(
+                    storage.take(row_sample_positions(storage.shape[1])),
+                    lambda: ((first, rows) for first, rows, _ in storage.row_blocks()),
+                    lambda idx: storage.rows(idx, idx + 1)[0],
+                )
+            self._unique_rows_checked = True
+        return self._unique_rows
+
+    @property
+    def pattern_state_counts(self):
+        """
+        Like column_state_counts, with one column of counts per site pattern
+        """
+        if self._pattern_state_counts is None:
+            if self._column_state_counts is not None or self.site_patterns is None:
+                return self.column_state_counts
+            positions, _ = self.site_patterns
+            self._pattern_state_counts = self._count_states(positions)
+        return self._pattern_state_counts
 
     @property
     def column_character_frequencies(self):
         if self._column_character_frequencies is not None:
             return self._column_character_frequencies
 
-        column_character_frequencies = []
-        for column in self.seq_records.T:
-            col_sorted_unique_values_for, col_counts_per_char = np.unique(
-                [char.upper() for char in column], return_counts=True
-            )
-            freqs = dict(zip(col_sorted_unique_values_for, col_counts_per_char))
-            for gap_char in self.gap_chars:
-                try:
-                    del freqs[gap_char]
-                except KeyError:
-                    continue
-            column_character_frequencies.append(freqs)
+        states, counts = self.column_state_counts
+        chars = [chr(state) for state in states]
+        column_character_frequencies = [
+            {chars[idx]: column[idx] for idx in np.flatnonzero(column)}
+            for column in counts.T
+        ]
         self._column_character_frequencies = column_character_frequencies
         return self._column_character_frequencies
 
@@ -155,12 +493,11 @@ class MSA:
         if self._site_classification_types is not None:
             return self._site_classification_types
 
-        site_classification_types = np.array(
-            [
-                determine_site_classification_type(col_char_freq)
-                for col_char_freq in self.column_character_frequencies
-            ]
-        )
+        _, counts = self.pattern_state_counts
+        site_classification_types = classify_sites(counts)
+        if self._pattern_state_counts is not None:
+            _, inverse = self.site_patterns
+            site_classification_types = site_classification_types[inverse]
         self._site_classification_types = site_classification_types
         return self._site_classification_types
 
@@ -248,12 +585,11 @@ class MSA:
         Sites to trim -> all codon sites to trim
         [2, 8] -> [0, 1, 2, 6, 7, 8]
         """
-        sites_to_trim_codon = [
-            self.determine_codon_triplet_positions(site_pos)
-            for site_pos in sites_to_trim
-        ]
-        flattened_unique_sites = list(set(chain(*sites_to_trim_codon)))
-        return np.array(flattened_unique_sites)
+        # dtype keeps an empty result usable as indices
+        sites_to_trim = np.asarray(sites_to_trim, dtype=int)
+        codon_starts = sites_to_trim // self._codon_size * self._codon_size
+        sites = (codon_starts[:, None] + np.arange(self._codon_size)).ravel()
+        return np.unique(sites[sites <= self._original_length - 1])
 
     def determine_codon_triplet_positions(self, alignment_position):
         """
@@ -0,0 +1,62 @@
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Union
+
+
+def bounded_map(
+    func: Callable,
+    items: Iterable,
+    workers: Union[int, None] = None,
+    max_pending: Union[int, None] = None,
+    executor_class: type[Executor] = ProcessPoolExecutor,
+) -> Iterator:
+    """
+    Lazily applies func to each item and yields the results in input order.
+
+    At most max_pending items are submitted to the pool at any time. The
+    next item is only pulled from the iterable once the oldest result has
+    been handed to the caller, so memory use does not grow with the
+    number of inputs.
+
+    With a single worker the items are processed in the calling process.
+    """
+    if workers is not None and workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    yield from pooled_map(
+        func, items, executor_class(max_workers=workers), max_pending or 2 * workers
+    )
+
+
+def background_map(func: Callable, items: Iterable, max_pending: int = 2) -> Iterator:
+    """
+    Like bounded_map, but func runs on a single background thread. The
+    caller keeps working on earlier results (e.g., trimming them) while
+    func waits for the disk.
+    """
+    return pooled_map(func, items, ThreadPoolExecutor(max_workers=1), max_pending)
+
+
+def pooled_map(
+    func: Callable, items: Iterable, executor: Executor, max_pending: int
+) -> Iterator:
+    """
+    Submits func(item) to executor for each item, with at most max_pending
+    submitted and not yet handed to the caller, and yields the results in
+    input order. The executor is shut down once the caller is done.
+    """
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # if the caller stops early there is no need to finish queued work
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -7,8 +7,8 @@ from argparse import (
     RawDescriptionHelpFormatter,
 )
 
-from .helpers import SeqType
-from .files import FileFormat
+from .file_formats import FileFormat
+from .seq_types import SeqType
 from .modes import TrimmingMode
 from .version import __version__
 
@@ -89,7 +89,9 @@ def create_parser() -> ArgumentParser:
         -s, --sequence_type <nt, aa>                specifies sequence type of input file
                                                     (default: auto-detect)
 
-        -of, --output_file_format <file_format>     specifies output file format
+        -of, --output_file_format <file_format>     specifies output file format; repeat the option
+                                                    to write several formats, each after the first
+                                                    to the output file name with the format as suffix
                                                     (default: same as input file format)
 
         -l, --log                                   creates a log file
@@ -98,8 +100,52 @@ def create_parser() -> ArgumentParser:
         -c, --complementary                         creates complementary alignment of trimmed sequences
                                                     (input file named with '.log' suffix)
 
+        --coordinate_map                            creates a tab-separated map of kept sites to their
+                                                    original positions
+                                                    (output file named with '.map' suffix)
+
         -co, --codon                                conduct trimming of codons
 
+        --protein_alignment <file>                  trim the input codon alignment by the
+                                                    sites trimmed from this protein alignment
+
+        --blocks                                    trim every alignment (block) of a file
+                                                    holding several, e.g. Stockholm or MAF
+
+        --split_blocks                              with --blocks, split each block at its
+                                                    trimmed sites (always done for MAF)
+
+        -w, --workers <n>                           number of processes trimming blocks
+                                                    in parallel (default: 1)
+
+        --cache_dir <directory>                     reuse outputs of identical earlier runs
+                                                    stored in this directory
+                                                    (default: no caching)
+
+        --cache_max_size <size>                     size limit of the cache directory,
+                                                    e.g. 500M or 10G (default: 10G)
+
+        --save_state                                save the column counts of the input
+                                                    next to the output (<output>.state.npz)
+
+        --state <file>                              column counts saved by an earlier run;
+                                                    only sequences added after those are counted
+
+        --save_mask                                 save the kept sites next to the output
+                                                    (<output>.mask.npz)
+
+        --apply_mask <file>                         trim the sites trimmed by an earlier run
+                                                    that saved this mask, without computing
+                                                    any statistics
+
+        --profile                                   print the time spent in each stage
+
+        --profile_json <file>                       write the time spent in each stage
+                                                    to a JSON file
+
+        --memory_report <file>                      write the memory used by each stage
+                                                    to a JSON file
+
         -q, --quiet                                 disables all logging to stdout
 
         -h, --help                                  help message
@@ -155,10 +201,86 @@ def create_parser() -> ArgumentParser:
 
         Complementary
             Creates an alignment file of only the trimmed sequences
+
+        Coordinate map
+            Maps positions of the trimmed alignment back to the input
+            alignment as a tab-separated file. The first line holds the
+            column names original_start, original_end, trimmed_start and
+            trimmed_end. Every further line is a run of consecutive kept
+            sites: its first and last position in the input alignment and
+            its first and last position in the trimmed alignment. Positions
+            start at 1 and both ends of a run are included, so a single
+            kept site has equal start and end.
         
         Codon
             Trims codon-based alignments. If one position in a codon should be trimmed, the whole
             codon will be trimmed.
+
+        Protein alignment
+            For codon alignments threaded onto a protein alignment (e.g.,
+            with pal2nal), --protein_alignment trims the protein alignment
+            with the chosen mode and removes the three codon sites of every
+            trimmed protein site from the input. Sequences are matched by id.
+            The gaps threshold and gap characters apply to the protein
+            alignment. Not available with c3, log files or column states.
+
+        Blocks
+            Stockholm, MAF, Clustal and Mauve files may hold several
+            alignments, such as the families of a Pfam dump or the blocks of a
+            whole-genome alignment. With --blocks, each alignment is trimmed
+            independently and written to the output in the order it was read.
+            Only the blocks being trimmed are held in memory. Blocks in which
+            every site is trimmed are left out of the output. Not available
+            with complementary output, log files, column states, caching,
+            profiles or memory reports. -w/--workers sets the number of
+            processes trimming blocks and only applies to --blocks.
+
+            The start and size fields of MAF blocks are updated to the kept
+            residues of each sequence, and sequences left without residues
+            are removed from the block. MAF blocks are split at their trimmed
+            sites, so that every run of kept sites is written as its own
+            block, which then matches its source coordinates exactly; the
+            scores of trimmed MAF blocks are dropped. --split_blocks splits
+            the blocks of the other formats in the same way.
+
+        Cache
+            Outputs and statistics are stored under a hash of the input file
+            contents, the trimming options, and the ClipKIT version. When the
+            same input is trimmed again with the same options, the stored
+            outputs are copied instead of being recomputed. The least recently
+            used results are removed once the cache exceeds its size limit.
+
+        Incremental trimming
+            --save_state stores the per-column character counts of the
+            alignment. When sequences are later appended to the end of that
+            alignment without changing its columns (e.g., mafft --add
+            --keeplength), passing the saved file with --state counts only the
+            appended sequences. The trimmed output is identical to trimming
+            the whole alignment from scratch.
+
+        Trim masks
+            --save_mask stores which sites were kept, one bit per site. Passing
+            the saved file with --apply_mask trims another alignment of the
+            same length (e.g., a re-aligned subset of the sequences or another
+            encoding of them) at exactly those sites. No statistics are
+            computed, so the mode, gaps threshold and gap characters do not
+            affect which sites are trimmed. Not available with --state,
+            --protein_alignment or --blocks.
+
+        Profile
+            Reports the wall time, CPU time, and amount of data processed
+            (modules for imports, bytes for reading and writing, sites
+            otherwise) by each stage of a run: imports, reading, sequence
+            type detection, column statistics, smart-gap threshold, site
+            classification, trimming, and each output written. Runs with a profile or memory report always trim
+            the alignment and do not use the cache.
+
+        Memory report
+            For each stage, records the peak resident set size of the process
+            once the stage finished and the memory allocated during the stage,
+            as traced by tracemalloc (allocated_peak: most memory held at
+            once; allocated_net: memory still held when the stage ended). All
+            values are in bytes. Tracing allocations slows the run down.
         """  # noqa
         ),
     )
@@ -241,6 +363,7 @@ def create_parser() -> ArgumentParser:
         "-of",
         "--output_file_format",
         type=str,
+        action="append",
         required=False,
         choices=file_format_choices,
         help=SUPPRESS,
@@ -263,6 +386,13 @@ def create_parser() -> ArgumentParser:
         help=SUPPRESS,
     )
 
+    optional.add_argument(
+        "--coordinate_map",
+        action="store_true",
+        required=False,
+        help=SUPPRESS,
+    )
+
     optional.add_argument(
         "-co",
         "--codon",
@@ -271,4 +401,248 @@ def create_parser() -> ArgumentParser:
         help=SUPPRESS,
     )
 
+    optional.add_argument(
+        "--protein_alignment",
+        type=str,
+        required=False,
+        help=SUPPRESS,
+        metavar="protein alignment",
+    )
+
+    optional.add_argument(
+        "--blocks",
+        action="store_true",
+        required=False,
+        help=SUPPRESS,
+    )
+
+    optional.add_argument(
+        "--split_blocks",
+        action="store_true",
+        required=False,
+        help=SUPPRESS,
+    )
+
+    optional.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        required=False,
+        help=SUPPRESS,
+        metavar="workers",
+    )
+
+    optional.add_argument(
+        "--cache_dir",
+        type=str,
+        required=False,
+        help=SUPPRESS,
+        metavar="cache directory",
+    )
+
+    optional.add_argument(
+        "--cache_max_size",
+        type=str,
+        required=False,
+        default="10G",
+        help=SUPPRESS,
+        metavar="cache size",
+    )
+
+    optional.add_argument(
+        "--save_state",
+        help=SUPPRESS,
+        action="store_true",
+        required=False,
+    )
+
+    optional.add_argument(
+        "--state",
+        type=str,
+        required=False,
+        help=SUPPRESS,
+        metavar="state file",
+    )
+
+    optional.add_argument(
+        "--save_mask",
+        help=SUPPRESS,
+        action="store_true",
+        required=False,
+    )
+
+    optional.add_argument(
+        "--apply_mask",
+        type=str,
+        required=False,
+        help=SUPPRESS,
+        metavar="mask file",
+    )
+
+    optional.add_argument(
+        "--profile",
+        help=SUPPRESS,
+        action="store_true",
+        required=False,
+    )
+
+    optional.add_argument(
+        "--profile_json",
+        type=str,
+        required=False,
+        help=SUPPRESS,
+        metavar="profile file",
+    )
+
+    optional.add_argument(
+        "--memory_report",
+        type=str,
+        required=False,
+        help=SUPPRESS,
+        metavar="memory report file",
+    )
+
+    return parser
+
+
+def create_batch_parser() -> ArgumentParser:
+    parser = ArgumentParser(
+        add_help=False,
+        formatter_class=RawDescriptionHelpFormatter,
+        usage=SUPPRESS,
+        fromfile_prefix_chars="@",
+        description=textwrap.dedent(
+            f"""\
+        Version: {__version__}
+
+        clipkit-batch trims many alignments with the same settings. Completed
+        inputs are recorded in a manifest so that a restarted job skips them.
+
+        Usage: clipkit-batch <input> [<input> ...] [optional arguments]
+               clipkit-batch @<file_listing_inputs> [optional arguments]
+        """  # noqa
+        ),
+    )
+
+    # if no arguments are given, print help and exit
+    if len(sys.argv) == 1:
+        parser.print_help(sys.stderr)
+        sys.exit()
+
+    required = parser.add_argument_group(
+        "required arguments",
+        description=textwrap.dedent(
+            """\
+        <input>                                     input files, or @file with one
+                                                    input file per line
+        """
+        ),
+    )
+
+    required.add_argument("inputs", type=str, nargs="+", help=SUPPRESS)
+
+    optional = parser.add_argument_group(
+        "optional arguments",
+        description=textwrap.dedent(
+            """\
+        -d, --output_dir <directory>                directory for trimmed alignments
+                                                    (default: next to each input file,
+                                                     named with '.clipkit' suffix)
+
+        --manifest <manifest_file>                  SQLite manifest of completed inputs
+                                                    (default: clipkit_manifest.sqlite
+                                                     in the output directory)
+
+        --shard <i/N>                               only process the i-th of N parts of
+                                                    the inputs (e.g. 1/4 ... 4/4)
+
+        -w, --workers <number_of_workers>           number of alignments trimmed in parallel
+                                                    (default: number of CPUs)
+
+        -m, --mode, -g, --gaps, -gc, --gap_characters, -if, --input_file_format,
+        -s, --sequence_type, -of, --output_file_format, -c, --complementary,
+        -co, --codon, -q, --quiet                   same as for clipkit
+
+        -h, --help                                  help message
+        -v, --version                               print version
+
+        -------------------------------------
+        | Detailed explanation of arguments | 
+        -------------------------------------
+        Manifest
+            Every completed input is recorded with a hash of its contents,
+            the trimming parameters and the output statistics. Inputs that
+            were completed with the same contents and parameters are skipped
+            when the job is restarted. Inputs that cannot be read, trimmed or
+            written are logged and recorded as failed, and the rest of the
+            batch goes on; the run then exits with status 1, and the failed
+            inputs are tried again when the job is restarted.
+
+        Shard
+            Splits the inputs into N parts by a hash of each input path so
+            that N independent processes given the same inputs each trim a
+            different part. Shards may share one manifest.
+
+        Workers
+            With more than one worker, every worker process reads, trims and
+            writes its own alignments. With one worker, the next alignments
+            are read on a background thread and finished outputs are written
+            on another while the current alignment is trimmed, which keeps
+            slow (e.g., network) storage from stalling the run.
+        """  # noqa
+        ),
+    )
+
+    optional.add_argument("-d", "--output_dir", help=SUPPRESS, metavar="output_dir")
+    optional.add_argument("--manifest", help=SUPPRESS, metavar="manifest")
+    optional.add_argument("--shard", help=SUPPRESS, metavar="i/N")
+    optional.add_argument("-w", "--workers", type=int, help=SUPPRESS)
+
+    optional.add_argument(
+        "-m",
+        "--mode",
+        help=SUPPRESS,
+        nargs="?",
+        choices=[mode.value for mode in TrimmingMode],
+    )
+    optional.add_argument("-g", "--gaps", type=float, help=SUPPRESS)
+    optional.add_argument("-gc", "--gap_characters", type=str, help=SUPPRESS)
+
+    file_format_choices = [file_format.value.lower() for file_format in FileFormat]
+    optional.add_argument(
+        "-if",
+        "--input_file_format",
+        type=str,
+        choices=file_format_choices,
+        help=SUPPRESS,
+        metavar="",
+    )
+    optional.add_argument(
+        "-of",
+        "--output_file_format",
+        type=str,
+        choices=file_format_choices,
+        help=SUPPRESS,
+        metavar="",
+    )
+    optional.add_argument(
+        "-s",
+        "--sequence_type",
+        help=SUPPRESS,
+        nargs="?",
+        choices=[seq.value.upper() for seq in SeqType]
+        + [seq.value.lower() for seq in SeqType],
+    )
+    optional.add_argument("-c", "--complementary", action="store_true", help=SUPPRESS)
+    optional.add_argument("-co", "--codon", action="store_true", help=SUPPRESS)
+    optional.add_argument("-q", "--quiet", action="store_true", help=SUPPRESS)
+    optional.add_argument("-h", "--help", action="help", help=SUPPRESS)
+    optional.add_argument(
+        "-v",
+        "--version",
+        action="version",
+        version=f"clipkit {__version__}",
+        help=SUPPRESS,
+    )
+
     return parser
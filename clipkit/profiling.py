@@ -0,0 +1,126 @@
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, Union
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+
+def peak_rss() -> Union[int, None]:
+    """
+    Largest resident set size of this process so far, in bytes
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class StageTiming:
+    name: str
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    # amount of data the stage went through, in units (bytes or sites)
+    processed: int = 0
+    unit: str = "sites"
+    # memory, recorded only when the profile traces memory: the process peak
+    # RSS once the stage finished, and the most memory allocated (peak) and
+    # still held (net) by the stage beyond what was allocated before it
+    peak_rss: Union[int, None] = None
+    allocated_peak: Union[int, None] = None
+    allocated_net: Union[int, None] = None
+
+    @property
+    def throughput(self) -> float:
+        """
+        Units processed per second of wall time
+        """
+        if self.wall_time <= 0:
+            return 0.0
+        return self.processed / self.wall_time
+
+
+@dataclass
+class StageProfile:
+    """
+    Wall time, CPU time and amount of data processed by each stage of a run,
+    in the order the stages ran.
+
+    With trace_memory, stages also record memory use. Allocations are
+    attributed with tracemalloc, which is started if it is not running
+    already and slows the run down noticeably.
+    """
+
+    stages: list[StageTiming] = field(default_factory=list)
+    trace_memory: bool = False
+
+    @contextmanager
+    def stage(
+        self, name: str, processed: int = 0, unit: str = "sites"
+    ) -> Iterator[StageTiming]:
+        """
+        Times the body of the with block. The yielded StageTiming may be
+        updated inside the block, e.g. with the number of bytes written.
+        """
+        timing = StageTiming(name, processed=processed, unit=unit)
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            allocated_start, _ = tracemalloc.get_traced_memory()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield timing
+        finally:
+            timing.wall_time = time.perf_counter() - wall_start
+            timing.cpu_time = time.process_time() - cpu_start
+            if self.trace_memory:
+                allocated, allocated_peak = tracemalloc.get_traced_memory()
+                timing.allocated_peak = allocated_peak - allocated_start
+                timing.allocated_net = allocated - allocated_start
+                timing.peak_rss = peak_rss()
+            self.stages.append(timing)
+
+    @property
+    def summary(self) -> list[dict]:
+        return [
+            {
+                "name": stage.name,
+                "wall_time": stage.wall_time,
+                "cpu_time": stage.cpu_time,
+                "processed": stage.processed,
+                "unit": stage.unit,
+                "throughput": stage.throughput,
+            }
+            for stage in self.stages
+        ]
+
+    @property
+    def memory_summary(self) -> list[dict]:
+        return [
+            {
+                "name": stage.name,
+                "peak_rss": stage.peak_rss,
+                "allocated_peak": stage.allocated_peak,
+                "allocated_net": stage.allocated_net,
+            }
+            for stage in self.stages
+        ]
+
+    def save(self, path: str, memory: bool = False) -> None:
+        """
+        Writes the timings, or with memory the memory use, as JSON
+        """
+        with open(path, "w") as handle:
+            summary = self.memory_summary if memory else self.summary
+            json.dump(summary, handle, indent=2)
@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class SeqType(Enum):
+    aa = "aa"
+    nt = "nt"
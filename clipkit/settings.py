@@ -1,2 +1,3 @@
 DEFAULT_AA_GAP_CHARS = ["-", "?", "*"]
 DEFAULT_NT_GAP_CHARS = ["-", "?", "*", "X", "x"]
+DEFAULT_GAPS = 0.9
@@ -1,5 +1,7 @@
 from enum import Enum
 
+import numpy as np
+
 
 class SiteClassificationType(Enum):
     parsimony_informative = "parsimony-informative"
@@ -38,3 +40,28 @@ def determine_site_classification_type(
         return SiteClassificationType.singleton
 
     return SiteClassificationType.other
+
+
+def classify_sites(counts: np.ndarray) -> np.ndarray:
+    """
+    Vectorized determine_site_classification_type for every column of an
+    (n_states, n_columns) array of character counts. Returns an array of
+    SiteClassificationType.
+    """
+    states_gte_threshold = np.count_nonzero(counts >= 2, axis=0)
+    states_present = np.count_nonzero(counts >= 1, axis=0)
+
+    classification = np.full(
+        counts.shape[1], SiteClassificationType.other, dtype=object
+    )
+    single_state_gte_threshold = states_gte_threshold == 1
+    classification[single_state_gte_threshold & (states_present == 1)] = (
+        SiteClassificationType.constant
+    )
+    classification[single_state_gte_threshold & (states_present > 1)] = (
+        SiteClassificationType.singleton
+    )
+    classification[states_gte_threshold >= 2] = (
+        SiteClassificationType.parsimony_informative
+    )
+    return classification
@@ -1,15 +1,22 @@
 from collections import Counter
+from typing import TYPE_CHECKING, Union
 
 from Bio.Align import MultipleSeqAlignment
 import numpy as np
 
 from .logger import logger
 
+if TYPE_CHECKING:
+    from .msa import MSA
+
 
 def smart_gap_threshold_determination(
-    alignment: MultipleSeqAlignment, gap_chars: list
+    alignment: Union[MultipleSeqAlignment, "MSA"], gap_chars: list
 ) -> float:
-    alignment_length = alignment.get_alignment_length()
+    if isinstance(alignment, MultipleSeqAlignment):
+        alignment_length = alignment.get_alignment_length()
+    else:
+        alignment_length = alignment.original_length
 
     # get distribution of gaps rounded to the fourth decimal place
     gaps_dist = get_gaps_distribution(alignment, gap_chars)
@@ -55,10 +62,16 @@ def gap_to_gap_slope(gaps_arr: np.array, alignment_length: int) -> list[float]:
 
 
 def get_gaps_distribution(
-    alignment: MultipleSeqAlignment, gap_chars: list
+    alignment: Union[MultipleSeqAlignment, "MSA"], gap_chars: list
 ) -> list[float]:
-    msa_array = np.array([list(rec) for rec in alignment])
-    gaps_dist = (np.isin(msa_array, gap_chars)).mean(axis=0)
+    if isinstance(alignment, MultipleSeqAlignment):
+        msa_array = np.array([list(rec) for rec in alignment])
+        gaps_dist = (np.isin(msa_array, gap_chars)).mean(axis=0)
+    elif gap_chars == alignment.gap_chars:
+        # already computed (and rounded) for trimming
+        return alignment.site_gappyness.tolist()
+    else:
+        gaps_dist = alignment.column_gap_counts(gap_chars) / alignment.n_sequences
 
     return np.round(gaps_dist, decimals=4).tolist()
 
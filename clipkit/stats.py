@@ -1,15 +1,16 @@
-from dataclasses import dataclass
-from typing import TYPE_CHECKING
-
-from Bio.Align import MultipleSeqAlignment
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Union
 
 if TYPE_CHECKING:
     from .msa import MSA
+    from .profiling import StageProfile
 
 
 @dataclass
 class TrimmingStats:
     msa: "MSA"
+    # time spent in each stage of the run that produced msa, if recorded
+    profile: Union["StageProfile", None] = field(default=None, repr=False)
 
     @property
     def alignment_length(self) -> int:
@@ -35,3 +36,63 @@ class TrimmingStats:
             "trimmed_length": self.trimmed_length,
             "trimmed_percentage": self.trimmed_percentage,
         }
+
+
+@dataclass
+class CachedTrimmingStats:
+    """
+    Statistics of a run restored from the result cache, where no MSA is built
+    """
+
+    alignment_length: int
+    output_length: int
+    trimmed_length: int
+    trimmed_percentage: float
+
+    @property
+    def summary(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class BlockTrimmingStats:
+    """
+    Statistics summed over the blocks of a multi-alignment file
+    """
+
+    alignment_length: int = 0
+    output_length: int = 0
+    n_blocks: int = 0
+    # blocks left out of the output because every site was trimmed
+    n_empty_blocks: int = 0
+    # more than n_blocks - n_empty_blocks when blocks are split
+    n_output_blocks: int = 0
+
+    def add(self, summary: dict, n_output_blocks: int = 1) -> None:
+        self.alignment_length += summary["alignment_length"]
+        self.output_length += summary["output_length"]
+        self.n_blocks += 1
+        self.n_empty_blocks += n_output_blocks == 0
+        self.n_output_blocks += n_output_blocks
+
+    @property
+    def trimmed_length(self) -> int:
+        return self.alignment_length - self.output_length
+
+    @property
+    def trimmed_percentage(self) -> float:
+        if not self.alignment_length:
+            return 0.0
+        return round((self.trimmed_length / self.alignment_length) * 100, 3)
+
+    @property
+    def summary(self) -> dict:
+        return {
+            "alignment_length": self.alignment_length,
+            "output_length": self.output_length,
+            "trimmed_length": self.trimmed_length,
+            "trimmed_percentage": self.trimmed_percentage,
+            "n_blocks": self.n_blocks,
+            "n_empty_blocks": self.n_empty_blocks,
+            "n_output_blocks": self.n_output_blocks,
+        }
@@ -0,0 +1,462 @@
+"""
+How an MSA stores its residues.
+
+ByteMatrix keeps one byte per cell. NibbleMatrix keeps nucleotide
+alignments in half that, as 4-bit codes. SparseRows keeps only the cells
+that are not gaps, for alignments that are mostly gaps. All of them hand
+out rows and columns as uint8 byte matrices and count the states and
+gaps of their columns.
+"""
+from typing import Iterable, Iterator, Union
+
+import numpy as np
+
+from .kernels import (
+    byte_table,
+    column_state_counts,
+    count_states,
+    fasta_records,
+    packed_column_counts,
+    packed_gap_mask,
+    state_table,
+    unpack_nibbles,
+)
+
+# number of cells converted at once when going through the rows in chunks
+CHUNK_CELLS = 1 << 24
+
+# FASTA files in which at least this fraction of bytes are "-" are read
+# into SparseRows
+SPARSE_GAP_FRACTION = 0.8
+
+# the 4-bit codes: gap, nucleotides and IUPAC ambiguity codes
+NIBBLE_CODES = np.frombuffer(b"-ACGTRYSWKMBDHVN", dtype=np.uint8)
+# maps every byte to its code, or to 255 if it has none
+NIBBLE_CODE_TABLE = np.full(256, 255, dtype=np.uint8)
+NIBBLE_CODE_TABLE[NIBBLE_CODES] = np.arange(len(NIBBLE_CODES))
+# bytes of the rows held in the high and in the low nibble of a packed byte
+HIGH_NIBBLE_BYTES = NIBBLE_CODES[np.arange(256) >> 4]
+LOW_NIBBLE_BYTES = NIBBLE_CODES[np.arange(256) & 15]
+
+
+def chunk_rows(n_columns: int) -> int:
+    """
+    Even number of rows holding about CHUNK_CELLS cells
+    """
+    return max(2, CHUNK_CELLS // max(n_columns, 1) // 2 * 2)
+
+
+class ByteMatrix:
+    """
+    One byte per cell, as read
+    """
+
+    def __init__(self, matrix: np.ndarray) -> None:
+        self.matrix = matrix
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.matrix.shape
+
+    @property
+    def column_keys(self) -> np.ndarray:
+        """
+        Matrix whose columns are equal exactly where the alignment's are
+        """
+        return self.matrix
+
+    def rows(self, start: int = 0, stop: Union[int, None] = None) -> np.ndarray:
+        return self.matrix[start:stop]
+
+    def row_blocks(
+        self, positions: Union[slice, np.ndarray] = slice(None)
+    ) -> Iterator[tuple[int, np.ndarray, Union[slice, np.ndarray]]]:
+        """
+        (first row, block, block_positions) of consecutive blocks of rows,
+        where block[:, block_positions] are the columns at positions of
+        the rows in the block
+        """
+        yield 0, self.matrix, positions
+
+    def take(
+        self,
+        positions: Union[slice, np.ndarray] = slice(None),
+        rows: Union[np.ndarray, None] = None,
+    ) -> np.ndarray:
+        """
+        Columns at positions of the given rows (all rows if None). A slice
+        of columns of all rows is a view.
+        """
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        if isinstance(positions, slice):
+            return matrix[:, positions]
+        return np.take(matrix, positions, axis=1)
+
+    def state_counts(
+        self, gap_chars: list[str], positions: Union[slice, np.ndarray] = slice(None)
+    ) -> tuple[np.ndarray, np.ndarray]:
+        return column_state_counts(self.take(positions), gap_chars)
+
+    def gap_counts(
+        self, gap_chars: list[str], positions: Union[slice, np.ndarray] = slice(None)
+    ) -> np.ndarray:
+        return packed_column_counts(packed_gap_mask(self.take(positions), gap_chars))
+
+
+class NibbleMatrix:
+    """
+    Nucleotide alignment stored as 4-bit codes (NIBBLE_CODES), two rows per
+    byte: rows 2i and 2i + 1 are the high and the low nibble of packed row
+    i. An odd last row shares its bytes with a row of gaps that is never
+    counted.
+    """
+
+    def __init__(self, packed: np.ndarray, n_rows: int) -> None:
+        self.packed = packed
+        self.n_rows = n_rows
+
+    @classmethod
+    def pack(cls, matrix: np.ndarray) -> Union["NibbleMatrix", None]:
+        """
+        Packs a byte matrix, or returns None if it holds bytes without a
+        code (e.g. lower case residues or gap characters other than "-")
+        """
+        n_rows, n_columns = matrix.shape
+        packed = np.empty(((n_rows + 1) // 2, n_columns), dtype=np.uint8)
+        step = chunk_rows(n_columns)
+        for start in range(0, n_rows, step):
+            codes = NIBBLE_CODE_TABLE[matrix[start : start + step]]
+            if np.any(codes == 255):
+                return None
+            high, low = codes[0::2], codes[1::2]
+            block = packed[start // 2 : start // 2 + len(high)]
+            np.left_shift(high, 4, out=block)
+            block[: len(low)] |= low
+        return cls(packed, n_rows)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.n_rows, self.packed.shape[1]
+
+    @property
+    def column_keys(self) -> np.ndarray:
+        return self.packed
+
+    def _unpack(self, packed: np.ndarray, n_rows: int) -> np.ndarray:
+        return unpack_nibbles(packed, HIGH_NIBBLE_BYTES, LOW_NIBBLE_BYTES, n_rows)
+
+    def _columns(self, positions: Union[slice, np.ndarray]) -> np.ndarray:
+        if isinstance(positions, slice):
+            return self.packed[:, positions]
+        return np.take(self.packed, positions, axis=1)
+
+    def rows(self, start: int = 0, stop: Union[int, None] = None) -> np.ndarray:
+        start, stop, _ = slice(start, stop).indices(self.n_rows)
+        if start >= stop:
+            return np.empty((0, self.packed.shape[1]), dtype=np.uint8)
+        # packed rows start at an even row
+        first = start - start % 2
+        unpacked = self._unpack(self.packed[first // 2 : (stop + 1) // 2], stop - first)
+        return unpacked[start - first :]
+
+    def row_blocks(
+        self, positions: Union[slice, np.ndarray] = slice(None)
+    ) -> Iterator[tuple[int, np.ndarray, Union[slice, np.ndarray]]]:
+        # only the columns at positions are unpacked
+        block_positions = np.arange(len(np.arange(self.packed.shape[1])[positions]))
+        step = chunk_rows(len(block_positions))
+        for start in range(0, self.n_rows, step):
+            stop = min(start + step, self.n_rows)
+            packed = self.packed[start // 2 : (stop + 1) // 2]
+            if isinstance(positions, slice):
+                packed = packed[:, positions]
+            else:
+                packed = np.take(packed, positions, axis=1)
+            yield start, self._unpack(packed, stop - start), block_positions
+
+    def take(
+        self,
+        positions: Union[slice, np.ndarray] = slice(None),
+        rows: Union[np.ndarray, None] = None,
+    ) -> np.ndarray:
+        if rows is None:
+            return self._unpack(self._columns(positions), self.n_rows)
+        rows = np.asarray(rows, dtype=np.intp)
+        pairs = self.packed[rows // 2]
+        if isinstance(positions, slice):
+            pairs = pairs[:, positions]
+        else:
+            pairs = np.take(pairs, positions, axis=1)
+        return np.where(
+            (rows % 2 == 0)[:, None], HIGH_NIBBLE_BYTES[pairs], LOW_NIBBLE_BYTES[pairs]
+        )
+
+    def _count_codes(
+        self, packed: np.ndarray, state_of_code: np.ndarray, n_states: int
+    ) -> np.ndarray:
+        """
+        Counts of the states given to each code, counted from both rows of
+        every byte of packed but the padding of an odd last row
+        """
+        high_index = state_of_code[np.arange(256) >> 4]
+        low_index = state_of_code[np.arange(256) & 15]
+        pairs = self.n_rows // 2
+        counts = count_states(packed[:pairs], high_index, n_states)
+        counts += count_states(packed[:pairs], low_index, n_states)
+        if self.n_rows % 2:
+            counts += count_states(packed[pairs:], high_index, n_states)
+        return counts
+
+    def state_counts(
+        self, gap_chars: list[str], positions: Union[slice, np.ndarray] = slice(None)
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Same states and counts as column_state_counts of the byte matrix
+        """
+        is_state = ~byte_table(gap_chars)[NIBBLE_CODES]
+        # states are ordered by byte, as in column_state_counts
+        order = np.argsort(NIBBLE_CODES)
+        codes = order[is_state[order]]
+        state_of_code = np.full(len(NIBBLE_CODES), -1, dtype=np.intp)
+        state_of_code[codes] = np.arange(len(codes))
+
+        counts = self._count_codes(self._columns(positions), state_of_code, len(codes))
+        present = counts.any(axis=1)
+        return NIBBLE_CODES[codes][present], counts[present]
+
+    def gap_counts(
+        self, gap_chars: list[str], positions: Union[slice, np.ndarray] = slice(None)
+    ) -> np.ndarray:
+        state_of_code = np.where(byte_table(gap_chars)[NIBBLE_CODES], 0, -1).astype(
+            np.intp
+        )
+        counts = self._count_codes(self._columns(positions), state_of_code, 1)
+        return counts[0].astype(np.intp)
+
+
+class SparseRows:
+    """
+    Alignment stored as the runs of cells of each row that are not the
+    fill byte (the gap "-"), and the bytes of those cells. Memory is
+    proportional to the number of residues rather than of cells.
+
+    The runs of row r are run_starts[row_offsets[r] : row_offsets[r + 1]]
+    (inclusive) to run_stops (exclusive); their bytes are concatenated in
+    residues, run i starting at run_offsets[i].
+    """
+
+    def __init__(
+        self,
+        n_columns: int,
+        row_offsets: np.ndarray,
+        run_starts: np.ndarray,
+        run_stops: np.ndarray,
+        residues: np.ndarray,
+        fill: int = ord("-"),
+    ) -> None:
+        self.n_columns = n_columns
+        self.row_offsets = row_offsets
+        self.run_starts = run_starts
+        self.run_stops = run_stops
+        self.residues = residues
+        self.fill = fill
+        self.run_offsets = np.concatenate(([0], np.cumsum(run_stops - run_starts)))
+        self._coverage = None
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[bytes], fill: int = ord("-")) -> "SparseRows":
+        """
+        Raises ValueError if the rows differ in length
+        """
+        n_columns = None
+        row_offsets = [0]
+        run_starts, run_stops, residues = [], [], []
+        for row in rows:
+            cells = np.frombuffer(row, dtype=np.uint8)
+            if n_columns is None:
+                n_columns = len(cells)
+            elif len(cells) != n_columns:
+                raise ValueError("Sequences must all be the same length")
+            is_fill = cells == fill
+            # runs start and stop where the padded fill mask changes
+            edges = np.flatnonzero(np.diff(np.concatenate(([True], is_fill, [True]))))
+            run_starts.append(edges[0::2])
+            run_stops.append(edges[1::2])
+            residues.append(cells[~is_fill])
+            row_offsets.append(row_offsets[-1] + len(edges) // 2)
+        if n_columns is None:
+            raise ValueError("No sequences")
+
+        return cls(
+            n_columns,
+            np.array(row_offsets, dtype=np.intp),
+            np.concatenate(run_starts).astype(np.intp),
+            np.concatenate(run_stops).astype(np.intp),
+            np.concatenate(residues),
+            fill,
+        )
+
+    @classmethod
+    def from_fasta(cls, data: bytes) -> tuple[list[bytes], "SparseRows"]:
+        """
+        Record titles and rows of FASTA bytes, read one sequence at a time.
+        Raises ValueError if data is not an aligned FASTA file.
+        """
+        titles = []
+
+        def sequences():
+            for title, sequence in fasta_records(data):
+                titles.append(title)
+                yield sequence
+
+        rows = cls.from_rows(sequences())
+        return titles, rows
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.row_offsets) - 1, self.n_columns
+
+    @property
+    def column_keys(self) -> None:
+        # telling columns apart would need them all, so they are not grouped
+        return None
+
+    @property
+    def coverage(self) -> np.ndarray:
+        """
+        Number of rows in which each column is not the fill byte, summed
+        from the difference array of run starts and stops
+        """
+        if self._coverage is None:
+            difference = np.bincount(self.run_starts, minlength=self.n_columns + 1)
+            difference -= np.bincount(self.run_stops, minlength=self.n_columns + 1)
+            self._coverage = np.cumsum(difference[: self.n_columns])
+        return self._coverage
+
+    def _blocks(
+        self,
+        start: int = 0,
+        stop: Union[int, None] = None,
+        max_rows: Union[int, None] = None,
+    ) -> Iterator[tuple[int, int, np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        (first row, stop row, row, column, byte) of the residues of
+        consecutive blocks of rows, with row relative to the first row.
+        Blocks hold about CHUNK_CELLS residues (at least one row) and no
+        more than max_rows rows.
+        """
+        start, stop, _ = slice(start, stop).indices(self.shape[0])
+        row_residues = self.run_offsets[self.row_offsets]
+        while start < stop:
+            block_stop = np.searchsorted(
+                row_residues, row_residues[start] + CHUNK_CELLS, side="right"
+            )
+            block_stop = max(int(block_stop) - 1, start + 1)
+            if max_rows is not None:
+                block_stop = min(block_stop, start + max_rows)
+            block_stop = min(block_stop, stop)
+
+            first_run, stop_run = self.row_offsets[[start, block_stop]]
+            run_starts = self.run_starts[first_run:stop_run]
+            lengths = self.run_stops[first_run:stop_run] - run_starts
+            first, last = self.run_offsets[[first_run, stop_run]]
+            # column of every residue: its offset in the residues, shifted by
+            # the difference between its run's offset and the run's start
+            shift = self.run_offsets[first_run:stop_run] - first - run_starts
+            columns = np.arange(last - first) - np.repeat(shift, lengths)
+            rows = np.repeat(
+                np.repeat(
+                    np.arange(block_stop - start),
+                    np.diff(self.row_offsets[start : block_stop + 1]),
+                ),
+                lengths,
+            )
+            yield start, block_stop, rows, columns, self.residues[first:last]
+            start = block_stop
+
+    def _column_map(self, positions: Union[slice, np.ndarray]) -> np.ndarray:
+        """
+        Index among positions of every column, -1 if it is not one of them
+        """
+        column_map = np.full(self.n_columns, -1, dtype=np.intp)
+        selected = np.arange(self.n_columns)[positions]
+        column_map[selected] = np.arange(len(selected))
+        return column_map
+
+    def rows(self, start: int = 0, stop: Union[int, None] = None) -> np.ndarray:
+        start, stop, _ = slice(start, stop).indices(self.shape[0])
+        matrix = np.full((max(stop - start, 0), self.n_columns), self.fill, np.uint8)
+        for first, _, rows, columns, residues in self._blocks(start, stop):
+            matrix[first - start + rows, columns] = residues
+        return matrix
+
+    def row_blocks(
+        self, positions: Union[slice, np.ndarray] = slice(None)
+    ) -> Iterator[tuple[int, np.ndarray, Union[slice, np.ndarray]]]:
+        column_map = self._column_map(positions)
+        n_positions = int(np.count_nonzero(column_map >= 0))
+        for first, stop, rows, columns, residues in self._blocks(
+            max_rows=chunk_rows(n_positions)
+        ):
+            block = np.full((stop - first, n_positions), self.fill, np.uint8)
+            mapped = column_map[columns]
+            kept = mapped >= 0
+            block[rows[kept], mapped[kept]] = residues[kept]
+            yield first, block, np.arange(n_positions)
+
+    def take(
+        self,
+        positions: Union[slice, np.ndarray] = slice(None),
+        rows: Union[np.ndarray, None] = None,
+    ) -> np.ndarray:
+        if rows is not None:
+            selected = [self.rows(row, row + 1)[0] for row in rows]
+            matrix = np.array(selected, dtype=np.uint8).reshape(-1, self.n_columns)
+            if isinstance(positions, slice):
+                return matrix[:, positions]
+            return np.take(matrix, positions, axis=1)
+
+        n_positions = len(np.arange(self.n_columns)[positions])
+        matrix = np.empty((self.shape[0], n_positions), dtype=np.uint8)
+        for first, block, _ in self.row_blocks(positions):
+            matrix[first : first + len(block)] = block
+        return matrix
+
+    def state_counts(
+        self, gap_chars: list[str], positions: Union[slice, np.ndarray] = slice(None)
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Same states and counts as column_state_counts of the byte matrix
+        """
+        column_map = self._column_map(positions)
+        n_positions = int(np.count_nonzero(column_map >= 0))
+        fill_counts = (self.shape[0] - self.coverage)[positions]
+
+        present = np.zeros(256, dtype=bool)
+        present[self.fill] = np.any(fill_counts)
+        for *_, columns, residues in self._blocks():
+            present[residues[column_map[columns] >= 0]] = True
+        states, state_index = state_table(present, gap_chars)
+
+        counts = np.zeros((len(states), n_positions), dtype=np.int32)
+        for *_, columns, residues in self._blocks():
+            mapped = column_map[columns]
+            state = state_index[residues]
+            counted = (mapped >= 0) & (state >= 0)
+            np.add.at(counts, (state[counted], mapped[counted]), 1)
+        if state_index[self.fill] >= 0:
+            counts[state_index[self.fill]] += fill_counts.astype(np.int32)
+        return states, counts
+
+    def gap_counts(
+        self, gap_chars: list[str], positions: Union[slice, np.ndarray] = slice(None)
+    ) -> np.ndarray:
+        is_gap = byte_table(gap_chars)
+        gap_counts = np.zeros(self.n_columns, dtype=np.intp)
+        if is_gap[self.fill]:
+            gap_counts += self.shape[0] - self.coverage
+        for *_, columns, residues in self._blocks():
+            gap_counts += np.bincount(
+                columns[is_gap[residues]], minlength=self.n_columns
+            )
+        return gap_counts[positions]
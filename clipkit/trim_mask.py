@@ -0,0 +1,50 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .exceptions import InvalidTrimMask
+
+if TYPE_CHECKING:
+    from .msa import MSA
+
+
+@dataclass
+class TrimMask:
+    """
+    Sites kept by a trimming run, saved next to its output so that other
+    alignments of the same sites (e.g., re-aligned subsets or other
+    encodings of the sequences) can be trimmed the same way without
+    computing any statistics.
+
+    The mask is stored as packed bits, one per site.
+    """
+
+    keep_mask: np.ndarray
+
+    @classmethod
+    def from_msa(cls, msa: "MSA") -> "TrimMask":
+        return cls(msa.keep_mask)
+
+    @classmethod
+    def load(cls, path: str) -> "TrimMask":
+        with np.load(path, allow_pickle=False) as mask:
+            length = int(mask["length"])
+            keep_mask = np.unpackbits(mask["kept"], count=length).astype(bool)
+        return cls(keep_mask)
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as handle:
+            np.savez_compressed(
+                handle, length=len(self.keep_mask), kept=np.packbits(self.keep_mask)
+            )
+
+    def trimmed_positions(self, msa: "MSA") -> np.ndarray:
+        """
+        Positions of the sites to trim from msa
+        """
+        if msa.original_length != len(self.keep_mask):
+            raise InvalidTrimMask(
+                f"Alignment has {msa.original_length} sites but the mask has {len(self.keep_mask)}"
+            )
+        return np.flatnonzero(~self.keep_mask)
@@ -1,6 +1,6 @@
 import logging
 
-from .helpers import SeqType
+from .seq_types import SeqType
 from .settings import DEFAULT_AA_GAP_CHARS, DEFAULT_NT_GAP_CHARS
 
 from typing import TYPE_CHECKING
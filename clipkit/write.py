@@ -9,6 +9,7 @@ if TYPE_CHECKING:
     from .files import FileFormat
     from .helpers import SeqType
     from .modes import TrimmingMode
+    from .profiling import StageProfile
 
 
 def write_user_args(
@@ -53,7 +54,13 @@ def write_user_args(
 
 
 def write_output_files_message(
-    out_file_name: str, complement: bool, use_log: bool
+    out_file_name: str,
+    complement: bool,
+    use_log: bool,
+    save_state: bool = False,
+    save_mask: bool = False,
+    coordinate_map: bool = False,
+    other_output_files: list[str] = (),
 ) -> None:
     """
     Function to print out that the output files are being written
@@ -66,8 +73,12 @@ def write_output_files_message(
         | Writing output files |
         ------------------------
         Trimmed alignment: {out_file_name}
+        Other output formats: {', '.join(other_output_files) or False}
         Complement file: {out_file_name + '.complement' if complement else False}
         Log file: {out_file_name + '.log' if use_log else False}
+        Column state: {out_file_name + '.state.npz' if save_state else False}
+        Trim mask: {out_file_name + '.mask.npz' if save_mask else False}
+        Coordinate map: {out_file_name + '.map' if coordinate_map else False}
     """
         )
     )
@@ -93,3 +104,28 @@ def write_output_stats(stats: "TrimmingStats", start_time: float) -> None:
     """
         )
     )
+
+
+def write_profile(profile: "StageProfile") -> None:
+    """
+    Function to print out the time spent in each stage
+    """
+    header = f"{'Stage':<22}{'Wall (s)':>10}{'CPU (s)':>10}{'Processed':>14}{'':7}{'Throughput':>14}"
+    rows = "\n".join(
+        f"{stage.name:<22}{stage.wall_time:>10.4f}{stage.cpu_time:>10.4f}"
+        f"{stage.processed:>14} {stage.unit:<6}{stage.throughput:>14.0f} {stage.unit}/s"
+        for stage in profile.stages
+    )
+    logger.info(
+        textwrap.dedent(
+            """\
+
+        -----------------
+        | Stage Profile |
+        -----------------
+    """
+        )
+        + header
+        + "\n"
+        + rows
+    )
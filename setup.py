@@ -1,5 +1,5 @@
 from os import path
-from setuptools import setup
+from setuptools import Extension, setup
 
 from clipkit.version import __version__
 
@@ -19,6 +19,18 @@ CLASSIFIERS = [
 
 REQUIRES = ["biopython>=1.81", "numpy>=1.24.0", "cython"]
 
+# the compiled kernels are optional: clipkit/kernels.py falls back to numpy
+# when Cython or a C compiler is not available
+try:
+    from Cython.Build import cythonize
+
+    EXT_MODULES = cythonize(
+        [Extension("clipkit._kernels", ["clipkit/_kernels.pyx"], optional=True)],
+        language_level=3,
+    )
+except ImportError:
+    EXT_MODULES = []
+
 setup(
     name="clipkit",
     description="Alignment trimming software for phylogenetics.",
@@ -29,10 +41,16 @@ setup(
     url="https://github.com/jlsteenwyk/clipkit",
     packages=["clipkit"],
     classifiers=CLASSIFIERS,
-    entry_points={"console_scripts": ["clipkit = clipkit.clipkit:main"]},
+    entry_points={
+        "console_scripts": [
+            "clipkit = clipkit.clipkit:main",
+            "clipkit-batch = clipkit.batch:main",
+        ]
+    },
     version=__version__,
     include_package_data=True,
     install_requires=REQUIRES,
+    ext_modules=EXT_MODULES,
 )
 
 ## push new version to pypi
@@ -1,7 +1,38 @@
 # global fixtures can go here
 import pytest
 
+from clipkit.clipkit import execute
+from clipkit.modes import TrimmingMode
+
 
 def pytest_configure(config):
     config.addinivalue_line("markers", "integration: mark as integration test")
     config.addinivalue_line("markers", "slow: mark as slow test")
+
+
+@pytest.fixture
+def execute_clipkit():
+    """
+    Calls clipkit.clipkit.execute with the arguments of a plain FASTA run,
+    any of which may be overridden
+    """
+
+    def execute_clipkit(input_file, output_file, **overrides):
+        kwargs = dict(
+            input_file=str(input_file),
+            output_file=str(output_file),
+            input_file_format="fasta",
+            output_file_format="fasta",
+            sequence_type=None,
+            complement=True,
+            codon=False,
+            gaps=0.9,
+            mode=TrimmingMode.smart_gap,
+            use_log=False,
+            gap_characters=None,
+            quiet=True,
+        )
+        kwargs.update(overrides)
+        execute(**kwargs)
+
+    return execute_clipkit
@@ -1,7 +1,11 @@
+import io
+
+import numpy as np
 import pytest
 
+from Bio import AlignIO
 from Bio.Align import MultipleSeqAlignment
-from clipkit import clipkit
+from clipkit import clipkit, clipkit_batch
 from clipkit.files import FileFormat
 from clipkit.modes import TrimmingMode
 from clipkit.msa import MSA
@@ -41,6 +45,81 @@ class TestApiInvocation(object):
         }
         assert isinstance(trim_run.version, str)
         
+    @pytest.mark.parametrize(
+        "raw_alignment",
+        [
+            b">1\nA-GTAT\n>2\nA-G-AT\n>3\nA-G-TA\n>4\nAGA-TA\n>5\nACa-T-\n",
+            io.StringIO(
+                ">1\nA-GTAT\n>2\nA-G-AT\n>3\nA-G-TA\n>4\nAGA-TA\n>5\nACa-T-\n"
+            ),
+            io.BytesIO(
+                b">1\nA-GTAT\n>2\nA-G-AT\n>3\nA-G-TA\n>4\nAGA-TA\n>5\nACa-T-\n"
+            ),
+            AlignIO.read("tests/integration/samples/simple.fa", "fasta"),
+            np.array(
+                [list(row) for row in ["A-GTAT", "A-G-AT", "A-G-TA", "AGA-TA", "ACa-T-"]]
+            ),
+        ],
+    )
+    def test_in_memory_inputs(self, raw_alignment, mocker):
+        mocked_open = mocker.patch("builtins.open")
+
+        trim_run, stats = clipkit(
+            raw_alignment=raw_alignment,
+            mode=TrimmingMode.smart_gap,
+            sequence_type="nt",
+        )
+
+        mocked_open.assert_not_called()
+        assert stats.summary == {
+            "alignment_length": 6,
+            "output_length": 5,
+            "trimmed_length": 1,
+            "trimmed_percentage": 16.667,
+        }
+        assert [rec.id for rec in trim_run.trimmed] == ["1", "2", "3", "4", "5"]
+
+    def test_matrix_sequence_ids(self):
+        trim_run, _ = clipkit(
+            raw_alignment=np.array([list("A-GT"), list("A-G-")]),
+            sequence_ids=["human", "mouse"],
+            sequence_type="nt",
+        )
+        assert [rec.id for rec in trim_run.trimmed] == ["human", "mouse"]
+
+    def test_numpy_results(self):
+        trim_run, _ = clipkit(
+            input_file_path="tests/integration/samples/simple.fa",
+            mode=TrimmingMode.gappy,
+            gaps=0.3,
+            sequence_type="nt",
+        )
+
+        assert trim_run.keep_mask.tolist() == [True, False, True, False, True, True]
+        assert trim_run.kept_positions.tolist() == [0, 2, 4, 5]
+        assert trim_run.trimmed_matrix.shape == (5, 4)
+        assert trim_run.site_gappyness.shape == (6,)
+        assert trim_run.site_classification_types.shape == (6,)
+        assert trim_run._trimmed is None
+        assert trim_run.trimmed is trim_run.trimmed
+
+    def test_stage_profile(self):
+        _, stats = clipkit(
+            input_file_path="tests/integration/samples/simple.fa",
+            mode=TrimmingMode.kpic_smart_gap,
+            sequence_type=None,
+        )
+
+        assert [stage.name for stage in stats.profile.stages] == [
+            "read",
+            "sequence type",
+            "pack nucleotides",
+            "column statistics",
+            "smart-gap threshold",
+            "classification",
+            "trim",
+        ]
+
     def test_codon_setting(self):
         trim_run, stats = clipkit(
             raw_alignment=">1\nA-GTAT\n>2\nA-G-AT\n>3\nA-G-TA\n>4\nAGA-TA\n>5\nACa-T-\n",
@@ -56,3 +135,51 @@ class TestApiInvocation(object):
             "trimmed_percentage": 50.0,
         }
         assert isinstance(trim_run.version, str)
+
+
+@pytest.mark.integration
+class TestBatchApiInvocation(object):
+    def test_mixed_inputs(self):
+        raw_alignment = ">1\nA-GTAT\n>2\nA-G-AT\n>3\nA-G-TA\n>4\nAGA-TA\n>5\nACa-T-\n"
+        bio_msa = AlignIO.read("tests/integration/samples/simple.fa", "fasta")
+        inputs = ["tests/integration/samples/simple.fa", raw_alignment, bio_msa]
+
+        results = list(
+            clipkit_batch(
+                inputs,
+                mode=TrimmingMode.gappy,
+                gaps=0.3,
+                sequence_type="nt",
+                workers=1,
+            )
+        )
+
+        assert [batch_input for batch_input, _, _ in results] == inputs
+        for _, trim_run, stats in results:
+            assert stats.summary == {
+                "alignment_length": 6,
+                "output_length": 4,
+                "trimmed_length": 2,
+                "trimmed_percentage": 33.333,
+            }
+            assert isinstance(trim_run.trimmed, MultipleSeqAlignment)
+
+    def test_worker_pool_matches_single_alignment_api(self):
+        inputs = [
+            "tests/integration/samples/simple.fa",
+            "tests/integration/samples/EOG091N44M8_aa.fa",
+            "tests/integration/samples/12_YIL115C_Anc_2.253_codon_aln.fasta",
+        ] * 2
+
+        results = clipkit_batch(
+            iter(inputs), mode=TrimmingMode.kpic_smart_gap, workers=2, max_pending=2
+        )
+
+        for input_file_path, (batch_input, _, stats) in zip(inputs, results):
+            _, expected_stats = clipkit(
+                input_file_path=input_file_path,
+                mode=TrimmingMode.kpic_smart_gap,
+                input_file_format=None,
+            )
+            assert batch_input == input_file_path
+            assert stats.summary == expected_stats.summary
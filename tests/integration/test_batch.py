@@ -0,0 +1,175 @@
+import shutil
+import sqlite3
+import pytest
+from pathlib import Path
+
+from clipkit.api import BatchSettings
+from clipkit.batch import main
+
+here = Path(__file__)
+
+SAMPLES = [
+    "simple.fa",
+    "EOG091N44M8_aa.fa",
+    "EOG091N44M8_nt.fa",
+    "12_YIL115C_Anc_2.253_codon_aln.fasta",
+]
+
+
+@pytest.fixture
+def input_files(tmp_path):
+    input_dir = tmp_path / "inputs"
+    input_dir.mkdir()
+    for sample in SAMPLES:
+        shutil.copy(f"{here.parent}/samples/{sample}", input_dir / sample)
+    return [str(input_dir / sample) for sample in SAMPLES]
+
+
+def completed_inputs(manifest_path):
+    with sqlite3.connect(manifest_path) as connection:
+        return sorted(row[0] for row in connection.execute("SELECT input_file FROM completed"))
+
+
+@pytest.mark.integration
+class TestBatchRunner(object):
+    def test_outputs_match_clipkit(self, tmp_path, input_files):
+        output_dir = tmp_path / "trimmed"
+        main(input_files + ["-d", str(output_dir), "-q", "-w", "1"])
+
+        for sample in SAMPLES:
+            with open(f"{here.parent}/samples/{sample}.clipkit") as expected:
+                with open(output_dir / f"{sample}.clipkit") as out_file:
+                    assert out_file.read() == expected.read()
+        assert completed_inputs(output_dir / "clipkit_manifest.sqlite") == sorted(
+            input_files
+        )
+
+    def test_restart_skips_completed_inputs(self, tmp_path, input_files, mocker):
+        output_dir = tmp_path / "trimmed"
+        main(input_files[:2] + ["-d", str(output_dir), "-q", "-w", "1"])
+
+        completed_outputs = [output_dir / f"{sample}.clipkit" for sample in SAMPLES[:2]]
+        before = [
+            (path.stat().st_mtime_ns, path.read_text()) for path in completed_outputs
+        ]
+
+        trim = mocker.spy(BatchSettings, "trim")
+        main(input_files + ["-d", str(output_dir), "-q", "-w", "1"])
+
+        # only the inputs that were not completed reach the trimming step
+        assert trim.call_count == len(SAMPLES) - 2
+        assert [
+            (path.stat().st_mtime_ns, path.read_text()) for path in completed_outputs
+        ] == before
+        assert completed_inputs(output_dir / "clipkit_manifest.sqlite") == sorted(
+            input_files
+        )
+
+    def test_output_overwritten_with_other_parameters_is_trimmed_again(
+        self, tmp_path, input_files
+    ):
+        output_dir = tmp_path / "trimmed"
+        output_file = output_dir / f"{SAMPLES[0]}.clipkit"
+        main(input_files[:1] + ["-d", str(output_dir), "-q", "-w", "1"])
+        default_output = output_file.read_text()
+
+        main(input_files[:1] + ["-d", str(output_dir), "-q", "-w", "1", "-m", "kpi"])
+        assert output_file.read_text() != default_output
+
+        main(input_files[:1] + ["-d", str(output_dir), "-q", "-w", "1"])
+        assert output_file.read_text() == default_output
+
+    def test_changed_input_is_trimmed_again(self, tmp_path, input_files, mocker):
+        output_dir = tmp_path / "trimmed"
+        main(input_files[:1] + ["-d", str(output_dir), "-q", "-w", "1"])
+
+        with open(input_files[0], "a") as handle:
+            handle.write(">6\nACGTAC\n")
+        main(input_files[:1] + ["-d", str(output_dir), "-q", "-w", "1"])
+
+        with open(output_dir / "simple.fa.clipkit") as out_file:
+            assert ">6" in out_file.read()
+
+    def test_shards_split_inputs_without_overlap(self, tmp_path, input_files):
+        manifest_path = tmp_path / "manifest.sqlite"
+        for shard in ("1/2", "2/2"):
+            main(
+                input_files
+                + ["--shard", shard, "--manifest", str(manifest_path), "-q", "-w", "1"]
+            )
+
+        assert completed_inputs(manifest_path) == sorted(input_files)
+        for input_file in input_files:
+            assert Path(f"{input_file}.clipkit").exists()
+
+    def test_inputs_from_file(self, tmp_path, input_files):
+        list_file = tmp_path / "inputs.txt"
+        list_file.write_text("\n".join(input_files) + "\n")
+        output_dir = tmp_path / "trimmed"
+
+        main([f"@{list_file}", "-d", str(output_dir), "-q", "-w", "2"])
+
+        assert completed_inputs(output_dir / "clipkit_manifest.sqlite") == sorted(
+            input_files
+        )
+
+    def test_inputs_with_the_same_name_are_rejected(self, tmp_path, input_files):
+        other_dir = tmp_path / "other"
+        other_dir.mkdir()
+        shutil.copy(input_files[0], other_dir / SAMPLES[0])
+        output_dir = tmp_path / "trimmed"
+
+        with pytest.raises(SystemExit):
+            main(
+                input_files
+                + [str(other_dir / SAMPLES[0]), "-d", str(output_dir), "-q"]
+            )
+
+        assert not (output_dir / f"{SAMPLES[0]}.clipkit").exists()
+
+    @pytest.mark.parametrize("workers", ["1", "2"])
+    def test_failed_input_does_not_stop_the_batch(
+        self, tmp_path, input_files, workers
+    ):
+        broken = tmp_path / "inputs" / "broken.fa"
+        broken.write_text(">1\nACGT\n>2\nAC\n")
+        inputs = input_files[:2] + [str(broken)] + input_files[2:]
+        output_dir = tmp_path / "trimmed"
+        manifest_path = output_dir / "clipkit_manifest.sqlite"
+
+        with pytest.raises(SystemExit) as exit_info:
+            main(inputs + ["-d", str(output_dir), "-q", "-w", workers])
+
+        assert exit_info.value.code == 1
+        assert completed_inputs(manifest_path) == sorted(input_files)
+        assert not (output_dir / "broken.fa.clipkit").exists()
+        with sqlite3.connect(manifest_path) as connection:
+            assert [
+                row[0] for row in connection.execute("SELECT input_file FROM failed")
+            ] == [str(broken)]
+
+        # the input is tried again once fixed
+        broken.write_text(">1\nACGT\n>2\nAC-T\n")
+        main(inputs + ["-d", str(output_dir), "-q", "-w", workers])
+
+        assert completed_inputs(manifest_path) == sorted(inputs)
+        with sqlite3.connect(manifest_path) as connection:
+            assert not connection.execute("SELECT * FROM failed").fetchall()
+
+    def test_interrupted_write_leaves_no_complement(
+        self, tmp_path, input_files, mocker
+    ):
+        output_dir = tmp_path / "trimmed"
+        args = input_files[:1] + ["-d", str(output_dir), "-q", "-w", "1", "-c"]
+
+        mocker.patch("clipkit.helpers.write_msa", side_effect=OSError("disk full"))
+        with pytest.raises(SystemExit):
+            main(args)
+        assert list(output_dir.glob(f"{SAMPLES[0]}*")) == []
+
+        mocker.stopall()
+        main(args)
+        assert sorted(path.name for path in output_dir.glob(f"{SAMPLES[0]}*")) == [
+            f"{SAMPLES[0]}.clipkit",
+            f"{SAMPLES[0]}.clipkit.complement",
+        ]
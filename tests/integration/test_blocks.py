@@ -0,0 +1,89 @@
+import pytest
+from pathlib import Path
+
+from Bio import AlignIO
+
+from clipkit.api import clipkit
+from clipkit.clipkit import execute
+from clipkit.modes import TrimmingMode
+
+here = Path(__file__)
+
+
+def trim_each_block(input_file, mode):
+    """
+    Sequences of every block of input_file trimmed on its own
+    """
+    trimmed = []
+    for block in AlignIO.parse(input_file, "stockholm"):
+        trim_run, _ = clipkit(
+            raw_alignment=block, mode=mode, sequence_type=None, input_file_format=None
+        )
+        trimmed.append([str(record.seq) for record in trim_run.trimmed])
+    return trimmed
+
+
+@pytest.mark.integration
+class TestBlocks(object):
+    @pytest.mark.parametrize("workers", [1, 2])
+    @pytest.mark.parametrize("mode", [TrimmingMode.smart_gap, TrimmingMode.kpic])
+    def test_every_block_is_trimmed_independently(self, tmp_path, mode, workers):
+        """
+        usage: clipkit blocks.sto --blocks
+        """
+        input_file = f"{here.parent}/samples/blocks.sto"
+        output_file = str(tmp_path / "blocks.sto.clipkit")
+
+        execute(
+            input_file=input_file,
+            output_file=output_file,
+            input_file_format=None,
+            output_file_format=None,
+            sequence_type=None,
+            complement=False,
+            codon=False,
+            gaps=0.9,
+            mode=mode,
+            use_log=False,
+            gap_characters=None,
+            quiet=True,
+            blocks=True,
+            workers=workers,
+        )
+
+        output_blocks = list(AlignIO.parse(output_file, "stockholm"))
+        input_blocks = list(AlignIO.parse(input_file, "stockholm"))
+        assert [
+            [str(record.seq) for record in block] for block in output_blocks
+        ] == trim_each_block(input_file, mode)
+        for output_block, input_block in zip(output_blocks, input_blocks):
+            assert [record.id for record in output_block] == [
+                record.id for record in input_block
+            ]
+
+    def test_output_file_format(self, tmp_path):
+        """
+        usage: clipkit blocks.sto --blocks -of fasta
+        """
+        input_file = f"{here.parent}/samples/blocks.sto"
+        output_file = str(tmp_path / "blocks.fa")
+
+        execute(
+            input_file=input_file,
+            output_file=output_file,
+            input_file_format="stockholm",
+            output_file_format="fasta",
+            sequence_type=None,
+            complement=False,
+            codon=False,
+            gaps=0.9,
+            mode=TrimmingMode.smart_gap,
+            use_log=False,
+            gap_characters=None,
+            quiet=True,
+            blocks=True,
+        )
+
+        with open(output_file) as handle:
+            titles = [line for line in handle if line.startswith(">")]
+        assert len(titles) == 5 + 8 + 6
@@ -0,0 +1,74 @@
+import pytest
+from pathlib import Path
+
+from clipkit.clipkit import run
+from clipkit.modes import TrimmingMode
+
+here = Path(__file__)
+
+
+@pytest.fixture
+def execute_cached(execute_clipkit):
+    """
+    Trims the same input with the cache in cache_dir
+    """
+
+    def execute_cached(output_file, cache_dir, **overrides):
+        kwargs = dict(
+            mode=TrimmingMode.kpic_smart_gap,
+            use_log=True,
+            cache_dir=str(cache_dir),
+            cache_max_size=None,
+        )
+        kwargs.update(overrides)
+        execute_clipkit(
+            f"{here.parent}/samples/EOG091N44M8_aa.fa", output_file, **kwargs
+        )
+
+    return execute_cached
+
+
+@pytest.mark.integration
+class TestResultCache(object):
+    def test_cache_hit_restores_identical_outputs(
+        self, execute_cached, tmp_path, mocker
+    ):
+        cache_dir = tmp_path / "cache"
+        first_output = tmp_path / "first.clipkit"
+        execute_cached(first_output, cache_dir)
+
+        mocked_run = mocker.patch("clipkit.clipkit.run")
+        second_output = tmp_path / "second.clipkit"
+        execute_cached(second_output, cache_dir)
+
+        mocked_run.assert_not_called()
+        for suffix in ("", ".complement", ".log"):
+            assert (
+                Path(f"{second_output}{suffix}").read_text()
+                == Path(f"{first_output}{suffix}").read_text()
+            )
+
+    @pytest.mark.parametrize("report", ["profile_json", "memory_report"])
+    def test_reports_are_written_for_cached_inputs(
+        self, execute_cached, tmp_path, mocker, report
+    ):
+        cache_dir = tmp_path / "cache"
+        execute_cached(tmp_path / "first.clipkit", cache_dir)
+
+        spy = mocker.patch("clipkit.clipkit.run", wraps=run)
+        report_file = tmp_path / "report.json"
+        execute_cached(
+            tmp_path / "second.clipkit", cache_dir, **{report: str(report_file)}
+        )
+
+        assert spy.call_count == 1
+        assert report_file.exists()
+
+    def test_cache_miss_when_parameters_change(self, execute_cached, tmp_path, mocker):
+        cache_dir = tmp_path / "cache"
+        execute_cached(tmp_path / "first.clipkit", cache_dir)
+
+        spy = mocker.patch("clipkit.clipkit.run", wraps=run)
+        execute_cached(tmp_path / "second.clipkit", cache_dir, mode=TrimmingMode.kpi)
+
+        assert spy.call_count == 1
@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 from pathlib import Path
 
@@ -72,3 +73,49 @@ class TestCodonOut(object):
             output_content = out_file.read()
 
         assert expected_content == output_content
+
+
+@pytest.mark.integration
+class TestProteinAlignment(object):
+    @pytest.mark.parametrize("mode", [TrimmingMode.smart_gap, TrimmingMode.kpic])
+    def test_codons_follow_protein_trim(self, mode):
+        """
+        usage: clipkit codon_aln.fasta --protein_alignment aa_aln.fasta
+        """
+        from Bio import AlignIO
+        from clipkit.api import clipkit
+
+        protein_file = f"{here.parent}/samples/12_YIL115C_Anc_2.253_aa_aln.fasta"
+        input_file = f"{here.parent}/samples/12_YIL115C_Anc_2.253_codon_aln.fasta"
+        output_file = f"output/12_YIL115C_Anc_2.253_codon_aln.fasta_protein_{mode.value}"
+
+        execute(
+            input_file=input_file,
+            output_file=output_file,
+            input_file_format="fasta",
+            output_file_format="fasta",
+            sequence_type=None,
+            complement=False,
+            codon=False,
+            gaps=0.9,
+            mode=mode,
+            use_log=False,
+            gap_characters=None,
+            quiet=True,
+            protein_file=protein_file,
+        )
+
+        protein_run, _ = clipkit(
+            input_file_path=protein_file, mode=mode, sequence_type=None
+        )
+        codon_sites = (
+            3 * protein_run.kept_positions[:, None] + np.arange(3)
+        ).ravel()
+        expected = {
+            record.id: "".join(np.array(list(str(record.seq)))[codon_sites])
+            for record in AlignIO.read(input_file, "fasta")
+        }
+        output = {
+            record.id: str(record.seq) for record in AlignIO.read(output_file, "fasta")
+        }
+        assert output == expected
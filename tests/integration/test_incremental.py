@@ -0,0 +1,50 @@
+import pytest
+from pathlib import Path
+
+from Bio import AlignIO
+from clipkit.modes import TrimmingMode
+
+here = Path(__file__)
+
+
+@pytest.mark.integration
+class TestIncrementalTrimming(object):
+    @pytest.mark.parametrize(
+        "mode", [TrimmingMode.smart_gap, TrimmingMode.kpic_smart_gap, TrimmingMode.kpi]
+    )
+    def test_added_sequences_match_full_run(self, execute_clipkit, tmp_path, mode):
+        full_input = f"{here.parent}/samples/EOG091N44M8_aa.fa"
+        alignment = AlignIO.read(full_input, "fasta")
+        first_input = tmp_path / "first.fa"
+        AlignIO.write(alignment[:80], first_input, "fasta")
+
+        first_output = tmp_path / "first.clipkit"
+        execute_clipkit(first_input, first_output, mode=mode, save_state=True)
+
+        incremental_output = tmp_path / "incremental.clipkit"
+        execute_clipkit(
+            full_input,
+            incremental_output,
+            mode=mode,
+            state_file=f"{first_output}.state.npz",
+        )
+        expected_output = tmp_path / "expected.clipkit"
+        execute_clipkit(full_input, expected_output, mode=mode)
+
+        for suffix in ("", ".complement"):
+            assert (
+                Path(f"{incremental_output}{suffix}").read_text()
+                == Path(f"{expected_output}{suffix}").read_text()
+            )
+
+    def test_state_of_other_alignment_exits(self, execute_clipkit, tmp_path):
+        first_input = f"{here.parent}/samples/simple.fa"
+        first_output = tmp_path / "first.clipkit"
+        execute_clipkit(first_input, first_output, save_state=True)
+
+        with pytest.raises(SystemExit):
+            execute_clipkit(
+                f"{here.parent}/samples/EOG091N44M8_aa.fa",
+                tmp_path / "second.clipkit",
+                state_file=f"{first_output}.state.npz",
+            )
@@ -0,0 +1,50 @@
+import pytest
+from pathlib import Path
+
+from Bio import AlignIO
+from clipkit.modes import TrimmingMode
+
+here = Path(__file__)
+
+
+@pytest.mark.integration
+class TestTrimMask(object):
+    @pytest.mark.parametrize(
+        "mode", [TrimmingMode.smart_gap, TrimmingMode.kpic_smart_gap, TrimmingMode.kpi]
+    )
+    def test_applied_mask_matches_run(self, execute_clipkit, tmp_path, mode):
+        full_input = f"{here.parent}/samples/EOG091N44M8_aa.fa"
+        full_output = tmp_path / "full.clipkit"
+        execute_clipkit(full_input, full_output, mode=mode, save_mask=True)
+
+        # a subset of the sequences is trimmed at the same sites
+        alignment = AlignIO.read(full_input, "fasta")
+        subset_input = tmp_path / "subset.fa"
+        AlignIO.write(alignment[:20], subset_input, "fasta")
+        subset_output = tmp_path / "subset.clipkit"
+        execute_clipkit(
+            subset_input,
+            subset_output,
+            mask_file=f"{full_output}.mask.npz",
+            # ignored when a mask is applied
+            mode=TrimmingMode.gappy,
+        )
+
+        for suffix in ("", ".complement"):
+            full = AlignIO.read(f"{full_output}{suffix}", "fasta")
+            subset = AlignIO.read(f"{subset_output}{suffix}", "fasta")
+            assert [str(record.seq) for record in subset] == [
+                str(record.seq) for record in full[:20]
+            ]
+
+    def test_mask_of_other_alignment_exits(self, execute_clipkit, tmp_path):
+        first_input = f"{here.parent}/samples/simple.fa"
+        first_output = tmp_path / "first.clipkit"
+        execute_clipkit(first_input, first_output, save_mask=True)
+
+        with pytest.raises(SystemExit):
+            execute_clipkit(
+                f"{here.parent}/samples/EOG091N44M8_aa.fa",
+                tmp_path / "second.clipkit",
+                mask_file=f"{first_output}.mask.npz",
+            )
@@ -0,0 +1,75 @@
+import json
+import pytest
+import tracemalloc
+from pathlib import Path
+
+from clipkit.clipkit import execute
+from clipkit.modes import TrimmingMode
+
+here = Path(__file__)
+
+
+@pytest.mark.integration
+class TestProfile(object):
+    def test_profile_json(self, tmp_path):
+        output_file = tmp_path / "simple.fa.clipkit"
+        profile_json = tmp_path / "profile.json"
+
+        execute(
+            input_file=f"{here.parent}/samples/simple.fa",
+            output_file=str(output_file),
+            input_file_format="fasta",
+            output_file_format="fasta",
+            sequence_type=None,
+            complement=True,
+            codon=False,
+            gaps=0.9,
+            mode=TrimmingMode.gappy,
+            use_log=True,
+            gap_characters=None,
+            quiet=True,
+            profile_json=str(profile_json),
+        )
+
+        stages = {stage["name"]: stage for stage in json.loads(profile_json.read_text())}
+        assert list(stages) == [
+            "import",
+            "read",
+            "sequence type",
+            "pack nucleotides",
+            "column statistics",
+            "trim",
+            "write log",
+            "write output",
+            "write complement",
+        ]
+        assert stages["read"]["processed"] == Path(
+            f"{here.parent}/samples/simple.fa"
+        ).stat().st_size
+        assert stages["write output"]["processed"] == output_file.stat().st_size
+
+    def test_memory_report(self, tmp_path):
+        memory_report = tmp_path / "memory.json"
+
+        execute(
+            input_file=f"{here.parent}/samples/EOG091N44M8_aa.fa",
+            output_file=str(tmp_path / "EOG091N44M8_aa.fa.clipkit"),
+            input_file_format="fasta",
+            output_file_format="fasta",
+            sequence_type=None,
+            complement=False,
+            codon=False,
+            gaps=0.9,
+            mode=TrimmingMode.kpic_smart_gap,
+            use_log=False,
+            gap_characters=None,
+            quiet=True,
+            memory_report=str(memory_report),
+        )
+
+        stages = json.loads(memory_report.read_text())
+        assert [stage["name"] for stage in stages][:2] == ["import", "read"]
+        for stage in stages:
+            assert stage["peak_rss"] > 0
+            assert stage["allocated_peak"] >= 0
+        assert not tracemalloc.is_tracing()
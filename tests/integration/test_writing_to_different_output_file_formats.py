@@ -438,3 +438,37 @@ class TestOutFormats(object):
             output_content = out_file.read()
 
         assert expected_content == output_content
+
+    def test_several_formats(self, tmp_path):
+        """
+        test output in several formats at once
+        usage: clipkit simple.fa -of stockholm -of phylip_relaxed -of fasta -of clustal
+        """
+        input_file = f"{here.parent}/samples/simple.fa"
+        output_file = str(tmp_path / "simple.clipkit")
+
+        kwargs = dict(
+            input_file=input_file,
+            output_file=output_file,
+            input_file_format="fasta",
+            output_file_format=["stockholm", "phylip_relaxed", "fasta", "clustal"],
+            sequence_type=None,
+            complement=False,
+            codon=False,
+            gaps=0.9,
+            mode=TrimmingMode.gappy,
+            use_log=False,
+            gap_characters=DEFAULT_NT_GAP_CHARS,
+            quiet=True,
+        )
+        execute(**kwargs)
+
+        expected_files = {
+            output_file: "simple.stockholm",
+            f"{output_file}.phylip_relaxed": "simple.phylip-relaxed",
+            f"{output_file}.fasta": "simple.fa_gappy",
+            f"{output_file}.clustal": "simple.clustal",
+        }
+        for output, expected_file in expected_files.items():
+            with open(f"{here.parent}/expected/{expected_file}") as expected:
+                assert Path(output).read_text() == expected.read()
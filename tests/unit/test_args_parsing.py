@@ -22,6 +22,20 @@ def args():
         output_file_format=None,
         gap_characters=DEFAULT_NT_GAP_CHARS,
         quiet=True,
+        cache_dir=None,
+        cache_max_size="10G",
+        state=None,
+        save_state=False,
+        profile=False,
+        profile_json=None,
+        memory_report=None,
+        blocks=False,
+        split_blocks=False,
+        workers=None,
+        protein_alignment=None,
+        apply_mask=None,
+        save_mask=False,
+        coordinate_map=False,
     )
     return Namespace(**kwargs)
 
@@ -108,11 +122,99 @@ class TestArgsProcessing(object):
             "use_log",
             "gap_characters",
             "quiet",
+            "cache_dir",
+            "cache_max_size",
+            "state_file",
+            "save_state",
+            "profile",
+            "profile_json",
+            "memory_report",
+            "blocks",
+            "split_blocks",
+            "workers",
+            "protein_file",
+            "mask_file",
+            "save_mask",
+            "coordinate_map",
         ]
         assert sorted(res.keys()) == sorted(expected_keys)
 
+    def test_process_args_default_cache(self, args):
+        res = process_args(args)
+        assert res["cache_dir"] is None
+        assert res["cache_max_size"] is None
+
+    def test_process_args_cache_max_size(self, args):
+        args.cache_dir = "cache"
+        args.cache_max_size = "2M"
+        res = process_args(args)
+        assert res["cache_max_size"] == 2 * 1024 * 1024
+
+    def test_process_args_missing_state_file(self, args):
+        args.state = "does_not_exist.npz"
+        with pytest.raises(SystemExit):
+            process_args(args)
+
     def test_incompatible_codon_args(self, args):
         args.codon = True
         args.mode = TrimmingMode.c3
         with pytest.raises(SystemExit):
             process_args(args)
+
+    @pytest.mark.parametrize("option", ["complementary", "log", "save_state"])
+    def test_blocks_incompatible_args(self, args, option):
+        args.blocks = True
+        setattr(args, option, True)
+        with pytest.raises(SystemExit):
+            process_args(args)
+
+    @pytest.mark.parametrize(
+        "option, value",
+        [
+            ("cache_dir", "cache"),
+            ("profile", True),
+            ("profile_json", "profile.json"),
+            ("memory_report", "memory.json"),
+        ],
+    )
+    def test_blocks_do_not_report_or_cache(self, args, option, value):
+        args.blocks = True
+        setattr(args, option, value)
+        with pytest.raises(SystemExit):
+            process_args(args)
+
+    def test_workers_require_blocks(self, args):
+        args.workers = 4
+        with pytest.raises(SystemExit):
+            process_args(args)
+
+        args.blocks = True
+        assert process_args(args)["workers"] == 4
+
+    def test_split_blocks_requires_blocks(self, args):
+        args.split_blocks = True
+        with pytest.raises(SystemExit):
+            process_args(args)
+
+    def test_missing_protein_alignment(self, args):
+        args.protein_alignment = "does_not_exist.fa"
+        with pytest.raises(SystemExit):
+            process_args(args)
+
+    def test_protein_alignment_incompatible_with_c3(self, args):
+        args.protein_alignment = args.input
+        args.mode = TrimmingMode.c3
+        with pytest.raises(SystemExit):
+            process_args(args)
+
+    def test_missing_mask_file(self, args):
+        args.apply_mask = "does_not_exist.npz"
+        with pytest.raises(SystemExit):
+            process_args(args)
+
+    def test_process_args_output_file_formats(self, args):
+        args.output_file_format = ["fasta"]
+        assert process_args(args)["output_file_format"] == "fasta"
+
+        args.output_file_format = ["fasta", "phylip"]
+        assert process_args(args)["output_file_format"] == ["fasta", "phylip"]
@@ -0,0 +1,71 @@
+import pytest
+
+from clipkit.batch import Manifest, Shard, check_batch_outputs
+from clipkit.exceptions import DuplicateBatchOutput, InvalidShard
+
+
+class TestShard(object):
+    @pytest.mark.parametrize("shard", ["0/2", "3/2", "1", "a/b", "1/0"])
+    def test_parse_rejects_invalid_shards(self, shard):
+        with pytest.raises(InvalidShard):
+            Shard.parse(shard)
+
+    def test_shards_partition_inputs(self):
+        input_files = [f"alignments/OG{idx}.fa" for idx in range(200)]
+        shards = [Shard.parse(f"{idx}/3") for idx in range(1, 4)]
+
+        parts = [[f for f in input_files if f in shard] for shard in shards]
+
+        assert sorted(sum(parts, [])) == sorted(input_files)
+        assert all(parts)
+
+
+class TestCheckBatchOutputs(object):
+    def test_same_name_in_output_dir(self):
+        check_batch_outputs(["a/aln.fa", "b/aln.fa"], None)
+        with pytest.raises(DuplicateBatchOutput):
+            check_batch_outputs(["a/aln.fa", "b/aln.fa"], "trimmed")
+
+    def test_same_input_twice(self):
+        with pytest.raises(DuplicateBatchOutput):
+            check_batch_outputs(["a/aln.fa", "a/aln.fa"], None)
+
+
+class TestManifest(object):
+    def test_record_and_lookup(self, tmp_path):
+        manifest = Manifest(str(tmp_path / "manifest.sqlite"))
+        summary = {
+            "alignment_length": 6,
+            "output_length": 4,
+            "trimmed_length": 2,
+            "trimmed_percentage": 33.333,
+        }
+
+        assert manifest.completed_hash("in.fa", "params") is None
+        manifest.record("in.fa", "params", "abc", "in.fa.clipkit", summary)
+        manifest.close()
+
+        manifest = Manifest(str(tmp_path / "manifest.sqlite"))
+        assert manifest.completed_hash("in.fa", "params") == "abc"
+        assert manifest.completed_hash("in.fa", "other params") is None
+
+    def test_completing_a_failed_input_clears_its_failure(self, tmp_path):
+        manifest = Manifest(str(tmp_path / "manifest.sqlite"))
+        summary = {
+            "alignment_length": 6,
+            "output_length": 4,
+            "trimmed_length": 2,
+            "trimmed_percentage": 33.333,
+        }
+
+        failed_query = "SELECT input_file, error FROM failed WHERE params = ?"
+
+        manifest.record_failure("in.fa", "params", None, "OSError: unreadable")
+        assert manifest.connection.execute(failed_query, ("params",)).fetchall() == [
+            ("in.fa", "OSError: unreadable")
+        ]
+        assert manifest.completed_hash("in.fa", "params") is None
+
+        manifest.record("in.fa", "params", "abc", "in.fa.clipkit", summary)
+        assert manifest.connection.execute(failed_query, ("params",)).fetchall() == []
+        manifest.close()
@@ -0,0 +1,111 @@
+import io
+import pytest
+
+from Bio import AlignIO
+from Bio.Align import MultipleSeqAlignment
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+
+from clipkit.api import BatchSettings
+from clipkit.blocks import trim_blocks, trimmed_block, trimmed_blocks, write_blocks
+from clipkit.file_formats import FileFormat
+from clipkit.modes import TrimmingMode
+from clipkit.msa import MSA
+
+
+def block(*sequences):
+    return MultipleSeqAlignment(
+        [
+            SeqRecord(Seq(sequence), id=f"seq{idx}", annotations={"start": idx})
+            for idx, sequence in enumerate(sequences)
+        ],
+        column_annotations={"secondary_structure": "HHE-C"},
+    )
+
+
+class TestTrimmedBlock(object):
+    def test_annotations_are_kept_and_trimmed(self):
+        alignment = block("AC-GT", "A--GA", "AC-GT")
+        msa = MSA.from_bio_msa(alignment)
+        msa.trim(site_positions_to_trim=[1, 2])
+
+        trimmed = trimmed_block(alignment, msa.matrix, msa.kept_positions)
+
+        assert [str(record.seq) for record in trimmed] == ["AGT", "AGA", "AGT"]
+        assert [record.annotations["start"] for record in trimmed] == [0, 1, 2]
+        assert trimmed.column_annotations["secondary_structure"] == "H-C"
+
+
+class TestWriteBlocks(object):
+    def test_blocks_without_kept_sites_are_left_out(self, tmp_path):
+        # every site of the second block is constant, so kpi trims them all
+        blocks = [block("ACGTA", "ACGAA", "TCGTA", "TCGAA"), block("AAAAA", "AAAAA")]
+        settings = BatchSettings.resolve(mode=TrimmingMode.kpi, sequence_type="nt")
+        output_file = str(tmp_path / "blocks.sto")
+
+        stats = write_blocks(
+            trim_blocks(blocks, settings, FileFormat.stockholm),
+            output_file,
+            FileFormat.stockholm,
+        )
+
+        output_blocks = list(AlignIO.parse(output_file, "stockholm"))
+        assert [[str(record.seq) for record in b] for b in output_blocks] == [
+            ["AT", "AA", "TT", "TA"]
+        ]
+        assert stats.summary["n_blocks"] == 2
+        assert stats.summary["n_empty_blocks"] == 1
+        assert stats.alignment_length == 10
+        assert stats.output_length == 2
+
+
+# source sequences of the MAF blocks below; block rows start at 2 and 1
+SOURCES = {"hg38.chr1": "TTACGTACGTAC", "mm10.chr4": "GACGAACGC"}
+MAF = """##maf version=1 scoring=none
+
+a score=10.0
+s hg38.chr1 2 10 + 12 ACGT--ACGTAC
+s mm10.chr4 1 8 + 9 ACG-AA-CGC--
+
+"""
+
+
+class TestMafBlocks(object):
+    @pytest.mark.parametrize("split_runs", [False, True])
+    def test_coordinates_match_sources(self, split_runs):
+        block = next(AlignIO.parse(io.StringIO(MAF), "maf"))
+        msa = MSA.from_bio_msa(block)
+        msa.trim(site_positions_to_trim=[0, 4, 5, 8])
+
+        blocks = trimmed_blocks(block, msa, split_runs)
+
+        # MAF blocks are split at trimmed sites either way
+        assert len(blocks) == 3
+        for trimmed in blocks:
+            assert "score" not in trimmed._annotations
+            for record in trimmed:
+                start, size = record.annotations["start"], record.annotations["size"]
+                assert size == len(str(record.seq).replace("-", ""))
+                assert SOURCES[record.id][start : start + size] == str(
+                    record.seq
+                ).replace("-", "")
+        assert [record.annotations["start"] for record in blocks[0]] == [3, 2]
+
+    def test_untrimmed_block_keeps_its_score(self):
+        block = next(AlignIO.parse(io.StringIO(MAF), "maf"))
+        msa = MSA.from_bio_msa(block)
+
+        (trimmed,) = trimmed_blocks(block, msa)
+
+        assert trimmed._annotations == {"score": "10.0"}
+
+    def test_sequences_without_kept_residues_are_left_out(self):
+        block = next(AlignIO.parse(io.StringIO(MAF), "maf"))
+        msa = MSA.from_bio_msa(block)
+        msa.trim(site_positions_to_trim=list(range(10)))
+
+        (trimmed,) = trimmed_blocks(block, msa)
+
+        assert [record.id for record in trimmed] == ["hg38.chr1"]
+        assert trimmed[0].annotations["start"] == 12 - 2
+        assert trimmed._annotations == {}
@@ -0,0 +1,64 @@
+import os
+import time
+import pytest
+
+from clipkit.cache import ResultCache, parse_size
+
+
+def store_entry(cache, tmp_path, name, size):
+    output_file = tmp_path / name
+    output_file.write_bytes(name.encode() * (size // len(name)))
+    key = ResultCache.key(str(output_file), mode="gappy")
+    cache.store(key, str(output_file), False, False, dict(stats={}))
+    return key
+
+
+class TestParseSize(object):
+    @pytest.mark.parametrize(
+        "size, expected",
+        [("100", 100), ("2K", 2048), ("1.5M", 1572864), ("10G", 10 * 1024**3), ("3gb", 3 * 1024**3)],
+    )
+    def test_parse_size(self, size, expected):
+        assert parse_size(size) == expected
+
+
+class TestResultCache(object):
+    def test_key_depends_on_input_and_parameters(self, tmp_path):
+        input_file = tmp_path / "in.fa"
+        input_file.write_text(">1\nA-GT\n")
+        key = ResultCache.key(str(input_file), mode="gappy", gaps=0.9)
+
+        assert key == ResultCache.key(str(input_file), gaps=0.9, mode="gappy")
+        assert key != ResultCache.key(str(input_file), mode="gappy", gaps=0.8)
+        input_file.write_text(">1\nA-GA\n")
+        assert key != ResultCache.key(str(input_file), mode="gappy", gaps=0.9)
+
+    def test_store_and_restore(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache"))
+        output_file = tmp_path / "out.fa"
+        output_file.write_text(">1\nAGT\n")
+        key = ResultCache.key(str(output_file))
+
+        assert cache.get(key) is None
+        cache.store(key, str(output_file), False, False, dict(stats={"a": 1}))
+        assert cache.get(key) == dict(stats={"a": 1})
+
+        restored_file = tmp_path / "restored.fa"
+        cache.restore(key, str(restored_file), False, False)
+        assert restored_file.read_text() == ">1\nAGT\n"
+
+    def test_evicts_least_recently_used_entries(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache"), max_size=3000)
+        first = store_entry(cache, tmp_path, "first", 1000)
+        second = store_entry(cache, tmp_path, "second", 1000)
+
+        # make the first entry the most recently used one
+        old = time.time() - 100
+        os.utime(os.path.join(cache.entry_path(second), "stats.json"), (old, old))
+        assert cache.get(first) is not None
+
+        third = store_entry(cache, tmp_path, "third", 1000)
+
+        assert cache.get(first) is not None
+        assert cache.get(second) is None
+        assert cache.get(third) is not None
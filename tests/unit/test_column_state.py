@@ -0,0 +1,67 @@
+import pytest
+import numpy as np
+
+from Bio import AlignIO
+from clipkit.column_state import ColumnState
+from clipkit.exceptions import InvalidColumnState
+from clipkit.modes import TrimmingMode
+from clipkit.msa import MSA
+
+
+def get_msa(file_path="tests/unit/examples/simple.fa", rows=None):
+    bio_msa = AlignIO.read(open(file_path), "fasta")
+    if rows is not None:
+        bio_msa = bio_msa[:rows]
+    msa = MSA.from_bio_msa(bio_msa)
+    msa.gap_chars = ["-"]
+    return msa
+
+
+class TestColumnState(object):
+    def test_extend_matches_full_counts(self):
+        full = ColumnState.from_msa(get_msa())
+        extended = ColumnState.from_msa(get_msa(rows=3)).extend(get_msa())
+
+        assert extended.n_rows == full.n_rows
+        assert extended.rows_digest == full.rows_digest
+        np.testing.assert_equal(extended.gap_counts, full.gap_counts)
+        np.testing.assert_equal(extended.states, full.states)
+        np.testing.assert_equal(extended.counts, full.counts)
+
+    def test_save_and_load(self, tmp_path):
+        state = ColumnState.from_msa(get_msa())
+        path = str(tmp_path / "state.npz")
+        state.save(path)
+
+        loaded = ColumnState.load(path)
+
+        assert loaded.n_rows == state.n_rows
+        assert loaded.gap_chars == state.gap_chars
+        assert loaded.rows_digest == state.rows_digest
+        np.testing.assert_equal(loaded.counts, state.counts)
+
+    def test_use_column_state_gives_same_trim(self):
+        expected = get_msa()
+        expected.trim(mode=TrimmingMode.kpic)
+
+        msa = get_msa()
+        msa.use_column_state(ColumnState.from_msa(get_msa(rows=2)).extend(msa))
+        msa.trim(mode=TrimmingMode.kpic)
+
+        np.testing.assert_equal(msa.sites_kept, expected.sites_kept)
+
+    def test_extend_rejects_different_rows(self):
+        state = ColumnState.from_msa(get_msa(rows=3))
+        msa = get_msa()
+        msa.header_info[0] = {"id": "x", "name": "x", "description": "x"}
+
+        with pytest.raises(InvalidColumnState):
+            state.extend(msa)
+
+    def test_extend_rejects_different_gap_chars(self):
+        state = ColumnState.from_msa(get_msa(rows=3))
+        msa = get_msa()
+        msa.gap_chars = ["-", "?"]
+
+        with pytest.raises(InvalidColumnState):
+            state.extend(msa)
@@ -1,6 +1,7 @@
 import os
 import pytest
 import subprocess
+import sys
 
 
 class TestEntrypoint(object):
@@ -23,3 +24,15 @@ class TestEntrypoint(object):
         cmd = "clipkit"
         exit_status = os.system(cmd)
         assert exit_status == 0
+
+    def test_startup_does_not_import_heavy_modules(self):
+        # printing help or the version should not wait for numpy or Biopython
+        code = (
+            "import sys\n"
+            "from clipkit.clipkit import create_parser\n"
+            "import clipkit.batch\n"
+            "create_parser().parse_args(sys.argv[1:])\n"
+            "print(sorted(m for m in ('numpy', 'Bio') if m in sys.modules))\n"
+        )
+        response = subprocess.check_output([sys.executable, "-c", code, "input.fa"])
+        assert response == b"[]\n"
@@ -1,8 +1,17 @@
 import pytest
+import numpy as np
 from pathlib import Path
 
 from Bio import AlignIO
-from clipkit.files import get_alignment_and_format, FileFormat
+from clipkit.files import (
+    get_alignment_and_format,
+    write_coordinate_map,
+    write_debug_log_file,
+    FileFormat,
+)
+from clipkit.modes import TrimmingMode
+from clipkit.msa import MSA
+from clipkit.settings import DEFAULT_NT_GAP_CHARS
 
 here = Path(__file__)
 
@@ -49,3 +58,52 @@ class TestAutomaticFileTypeDetermination(object):
         with pytest.raises(Exception) as excinfo:
             get_alignment_and_format(in_file, file_format)
         assert "File could not be read" in str(excinfo.value)
+
+
+class TestWriteDebugLogFile(object):
+    def test_matches_debug_log_info_across_chunks(self, tmp_path):
+        alignment = AlignIO.read(f"{here.parent}/examples/simple.fa", "fasta")
+        msa = MSA.from_bio_msa(alignment, gap_chars=DEFAULT_NT_GAP_CHARS)
+        msa.trim(TrimmingMode.gappy, gap_threshold=0.5)
+        log_file = tmp_path / "simple.fa.clipkit.log"
+
+        write_debug_log_file(msa, str(log_file), chunk_size=4)
+
+        expected = "".join(
+            f"{info[0] + 1} {info[1]} {info[2].value} {info[3]}\n"
+            for info in msa.generate_debug_log_info()
+        )
+        assert log_file.read_text() == expected
+
+
+class TestWriteCoordinateMap(object):
+    @pytest.mark.parametrize("sites_to_trim", [[], [1, 2, 6], [0, 7], list(range(8))])
+    def test_runs_map_trimmed_to_original_positions(self, tmp_path, sites_to_trim):
+        msa = MSA.from_matrix(np.array([list("ACGTACGT"), list("AC-TAC-T")]))
+        msa.trim(site_positions_to_trim=sites_to_trim)
+        map_file = tmp_path / "simple.fa.clipkit.map"
+
+        write_coordinate_map(msa, str(map_file))
+
+        lines = map_file.read_text().splitlines()
+        assert lines[0].split("\t") == [
+            "original_start",
+            "original_end",
+            "trimmed_start",
+            "trimmed_end",
+        ]
+        intervals = [list(map(int, line.split("\t"))) for line in lines[1:]]
+        original = [
+            position
+            for start, end, _, _ in intervals
+            for position in range(start, end + 1)
+        ]
+        trimmed = [
+            position
+            for _, _, start, end in intervals
+            for position in range(start, end + 1)
+        ]
+        assert original == (msa.kept_positions + 1).tolist()
+        assert trimmed == list(range(1, msa.length + 1))
+        # one line per run of kept sites
+        assert len(intervals) == len(set(original) - {p + 1 for p in original})
@@ -0,0 +1,44 @@
+import io
+import pytest
+
+from clipkit.headers import HeaderTable
+from clipkit.msa import MSA
+
+TITLES = [b"seq1 first sequence", b"", "séq3".encode("utf-8"), b"seq4\twith tab"]
+
+
+class TestHeaderTable(object):
+    def test_items_match_biopython_fasta_headers(self):
+        headers = HeaderTable.from_titles(TITLES)
+
+        assert len(headers) == 4
+        assert headers[0] == {
+            "id": "seq1",
+            "name": "seq1",
+            "description": "seq1 first sequence",
+        }
+        assert headers[1] == {"id": "", "name": "", "description": ""}
+        assert headers[2]["id"] == "séq3"
+        assert headers[-1]["id"] == "seq4"
+        with pytest.raises(IndexError):
+            headers[4]
+
+    def test_slices_and_iteration(self):
+        headers = HeaderTable.from_titles(TITLES)
+
+        assert isinstance(headers[1:3], HeaderTable)
+        assert headers[1:3] == [headers[1], headers[2]]
+        assert headers[3:1] == []
+        assert list(headers) == [headers[idx] for idx in range(4)]
+        assert headers.titles() == TITLES
+
+    def test_msa_from_fasta_writes_titles(self):
+        data = b">seq1 first sequence\nAC-T\n>seq2\r\nA--T\n"
+
+        msa = MSA.from_fasta_bytes(data)
+        output = io.BytesIO()
+        msa.write_fasta(output)
+
+        assert isinstance(msa.header_info, HeaderTable)
+        assert [info["id"] for info in msa.header_info] == ["seq1", "seq2"]
+        assert output.getvalue() == data.replace(b"\r", b"")
@@ -0,0 +1,285 @@
+import io
+import pytest
+import numpy as np
+from pathlib import Path
+
+from Bio import AlignIO, SeqIO
+
+from clipkit import kernels
+from clipkit.kernels import (
+    column_state_counts,
+    numpy_count_states,
+    numpy_count_weighted_states,
+    numpy_fasta_to_byte_matrix,
+    numpy_write_fasta,
+    packed_column_counts,
+    packed_gap_mask,
+    row_sample_positions,
+    site_patterns,
+    unique_rows,
+)
+from clipkit.msa import MSA
+from clipkit.settings import DEFAULT_AA_GAP_CHARS, DEFAULT_NT_GAP_CHARS
+
+here = Path(__file__)
+
+SAMPLES = [
+    f"{here.parent}/examples/simple.fa",
+    f"{here.parent}/examples/EOG091N44M8_aa.fa",
+    f"{here.parent.parent}/integration/samples/EOG091N44M8_nt.fa",
+    f"{here.parent.parent}/integration/samples/simple_long_description.fa",
+]
+
+requires_compiled_kernels = pytest.mark.skipif(
+    kernels._kernels is None, reason="compiled kernels are not built"
+)
+
+
+def read_bytes(path):
+    with open(path, "rb") as handle:
+        return handle.read()
+
+
+@pytest.fixture(params=["numpy", "compiled"])
+def kernel_implementation(request, monkeypatch):
+    if request.param == "numpy":
+        monkeypatch.setattr(kernels, "_kernels", None)
+    elif kernels._kernels is None:
+        pytest.skip("compiled kernels are not built")
+    return request.param
+
+
+class TestFastaToByteMatrix(object):
+    @pytest.mark.parametrize("path", SAMPLES)
+    def test_matches_biopython(self, path, kernel_implementation):
+        titles, matrix = kernels.fasta_to_byte_matrix(read_bytes(path))
+        alignment = AlignIO.read(path, "fasta")
+
+        assert [title.decode() for title in titles] == [
+            record.description for record in alignment
+        ]
+        assert [row.tobytes() for row in matrix] == [
+            bytes(record.seq) for record in alignment
+        ]
+
+    def test_whitespace_and_line_endings(self, kernel_implementation):
+        data = b">1 first \r\nA-G T\r\nAT\r\n>2\r\nA-\tGAAT\r\n\r\n"
+        titles, matrix = kernels.fasta_to_byte_matrix(data)
+        assert titles == [b"1 first", b"2"]
+        assert [row.tobytes() for row in matrix] == [b"A-GTAT", b"A-GAAT"]
+
+    @pytest.mark.parametrize(
+        "data", [b"", b"1\nACGT\n", b">1\nACGT\n>2\nACG\n", b"\n>1\nACGT\n"]
+    )
+    def test_rejects_invalid_input(self, data, kernel_implementation):
+        with pytest.raises(ValueError):
+            kernels.fasta_to_byte_matrix(data)
+
+
+class TestColumnStateCounts(object):
+    @pytest.mark.parametrize("path", SAMPLES)
+    @pytest.mark.parametrize("gap_chars", [DEFAULT_AA_GAP_CHARS, DEFAULT_NT_GAP_CHARS])
+    def test_matches_per_column_counting(self, path, gap_chars, kernel_implementation):
+        msa = MSA.from_fasta_bytes(read_bytes(path), gap_chars)
+        states, counts = column_state_counts(msa.matrix, gap_chars)
+
+        for column, column_counts in zip(msa.seq_records.T, counts.T):
+            chars, char_counts = np.unique(
+                [char.upper() for char in column], return_counts=True
+            )
+            expected = {
+                char: count
+                for char, count in zip(chars, char_counts)
+                if char not in gap_chars
+            }
+            observed = {
+                chr(state): count
+                for state, count in zip(states, column_counts)
+                if count
+            }
+            assert observed == expected
+
+    @requires_compiled_kernels
+    def test_compiled_and_numpy_counts_are_identical(self):
+        rng = np.random.default_rng(0)
+        matrix = rng.choice(np.frombuffer(b"ACGTacgtNn-?X", dtype=np.uint8), (57, 301))
+        state_index = np.full(256, -1, dtype=np.intp)
+        state_index[np.frombuffer(b"ACGTacgt", dtype=np.uint8)] = [0, 1, 2, 3] * 2
+
+        np.testing.assert_array_equal(
+            kernels._kernels.count_states(matrix, state_index, 4),
+            numpy_count_states(matrix, state_index, 4),
+        )
+
+    def test_weighted_counts_match_repeated_rows(self, kernel_implementation):
+        rng = np.random.default_rng(5)
+        matrix = rng.choice(np.frombuffer(b"ACGTacgtNn-?X", dtype=np.uint8), (9, 301))
+        weights = np.array([1, 3, 1, 2, 7, 1, 1, 4, 1], dtype=np.int32)
+
+        states, counts = column_state_counts(
+            matrix, DEFAULT_NT_GAP_CHARS, weights=weights
+        )
+        expected_states, expected_counts = column_state_counts(
+            np.repeat(matrix, weights, axis=0), DEFAULT_NT_GAP_CHARS
+        )
+
+        np.testing.assert_array_equal(states, expected_states)
+        np.testing.assert_array_equal(counts, expected_counts)
+
+    @requires_compiled_kernels
+    def test_compiled_and_numpy_weighted_counts_are_identical(self):
+        rng = np.random.default_rng(0)
+        matrix = rng.choice(np.frombuffer(b"ACGTacgtNn-?X", dtype=np.uint8), (57, 301))
+        weights = rng.integers(1, 10, 57, dtype=np.int32)
+        state_index = np.full(256, -1, dtype=np.intp)
+        state_index[np.frombuffer(b"ACGTacgt", dtype=np.uint8)] = [0, 1, 2, 3] * 2
+
+        np.testing.assert_array_equal(
+            kernels._kernels.count_weighted_states(matrix, weights, state_index, 4),
+            numpy_count_weighted_states(matrix, weights, state_index, 4),
+        )
+
+
+class TestWriteFasta(object):
+    @pytest.mark.parametrize("path", SAMPLES)
+    @pytest.mark.parametrize("step", [1, 2, 7])
+    def test_matches_biopython(self, path, step, kernel_implementation):
+        msa = MSA.from_fasta_bytes(read_bytes(path), DEFAULT_AA_GAP_CHARS)
+        msa.trim(site_positions_to_trim=np.arange(0, msa.original_length, step))
+
+        written = io.BytesIO()
+        msa.write_fasta(written)
+        expected = io.StringIO()
+        SeqIO.write(msa.to_bio_msa(), expected, "fasta")
+
+        assert written.getvalue().decode() == expected.getvalue()
+
+    @requires_compiled_kernels
+    @pytest.mark.parametrize("n_positions", [0, 59, 60, 61, 180])
+    def test_compiled_and_numpy_output_is_identical(self, n_positions):
+        rng = np.random.default_rng(1)
+        matrix = rng.choice(np.frombuffer(b"ACGT-", dtype=np.uint8), (5, 200))
+        positions = np.sort(rng.choice(200, n_positions, replace=False)).astype(
+            np.intp
+        )
+        titles = [f"seq{idx}".encode() for idx in range(5)]
+
+        compiled, fallback = io.BytesIO(), io.BytesIO()
+        kernels._kernels.write_fasta(compiled, titles, matrix, positions, 60)
+        numpy_write_fasta(fallback, titles, matrix, positions, 60)
+
+        assert compiled.getvalue() == fallback.getvalue()
+
+
+def related_matrix(n_rows, length, n_variable):
+    """
+    Closely related sequences: every column is constant except n_variable
+    """
+    rng = np.random.default_rng(2)
+    matrix = np.repeat(
+        rng.choice(np.frombuffer(b"ACGT", dtype=np.uint8), (1, length)), n_rows, axis=0
+    )
+    variable = rng.choice(length, n_variable, replace=False)
+    matrix[:, variable] = rng.choice(
+        np.frombuffer(b"ACGT-", dtype=np.uint8), (n_rows, n_variable)
+    )
+    return matrix
+
+
+class TestSitePatterns(object):
+    def test_groups_identical_columns(self, monkeypatch):
+        monkeypatch.setattr(kernels, "MIN_SITES_FOR_PATTERNS", 1)
+        matrix = related_matrix(8, 2000, 50)
+
+        positions, inverse = site_patterns(matrix)
+
+        assert len(positions) == len(np.unique(matrix, axis=1).T)
+        assert np.array_equal(matrix[:, positions][:, inverse], matrix)
+
+    def test_skips_short_alignments(self):
+        assert site_patterns(related_matrix(8, 2000, 50)) is None
+
+    def test_skips_alignments_with_few_repeated_columns(self, monkeypatch):
+        monkeypatch.setattr(kernels, "MIN_SITES_FOR_PATTERNS", 1)
+        rng = np.random.default_rng(3)
+        matrix = rng.choice(np.frombuffer(b"ACGT-", dtype=np.uint8), (20, 2000))
+
+        assert site_patterns(matrix) is None
+
+
+def group_rows(matrix, sample_positions=None):
+    if sample_positions is None:
+        sample_positions = row_sample_positions(matrix.shape[1])
+    return unique_rows(
+        matrix[:, sample_positions], lambda: [(0, matrix)], matrix.__getitem__
+    )
+
+
+class TestUniqueRows(object):
+    def test_groups_identical_rows(self):
+        data = b"ACGTACGTACCTACGTACCTAC-T"
+        matrix = np.frombuffer(data, dtype=np.uint8).reshape(6, 4)
+
+        positions, weights = group_rows(matrix)
+
+        np.testing.assert_array_equal(positions, [0, 2, 5])
+        np.testing.assert_array_equal(weights, [3, 2, 1])
+
+    def test_rows_equal_in_the_sample_are_compared_in_full(self):
+        data = b"ACGTACGTACCTACGTACCTAC-T"
+        matrix = np.frombuffer(data, dtype=np.uint8).reshape(6, 4)
+
+        positions, weights = group_rows(matrix, sample_positions=[0])
+
+        np.testing.assert_array_equal(positions, [0, 2, 5])
+        np.testing.assert_array_equal(weights, [3, 2, 1])
+
+    def test_all_rows_differ(self):
+        matrix = np.frombuffer(b"ACGTACCTAC-T", dtype=np.uint8).reshape(3, 4)
+
+        assert group_rows(matrix) is None
+
+    def test_skips_alignments_with_few_identical_rows(self):
+        matrix = np.frombuffer(b"ACGTACGTACCTAC-T", dtype=np.uint8).reshape(4, 4)
+
+        assert group_rows(matrix) is None
+
+    def test_colliding_digests_are_not_grouped(self, monkeypatch):
+        monkeypatch.setattr(
+            kernels, "row_digests", lambda rows: np.zeros((len(list(rows)), 2))
+        )
+        matrix = np.frombuffer(b"ACGTACGAACGTACGA", dtype=np.uint8).reshape(4, 4)
+
+        assert group_rows(matrix, sample_positions=[0]) is None
+
+
+class TestPackedGapMask(object):
+    @pytest.mark.parametrize("n_rows", [1, 8, 13, 64])
+    def test_matches_packbits(self, n_rows):
+        rng = np.random.default_rng(6)
+        matrix = rng.choice(np.frombuffer(b"ACGT-?n", dtype=np.uint8), (n_rows, 97))
+        is_gap = np.isin(matrix, np.frombuffer(b"-?", dtype=np.uint8))
+
+        packed = packed_gap_mask(matrix, ["-", "?"])
+
+        np.testing.assert_array_equal(packed, np.packbits(is_gap, axis=0))
+        np.testing.assert_array_equal(
+            packed_column_counts(packed), np.count_nonzero(is_gap, axis=0)
+        )
+
+
+class TestUnpackNibbles(object):
+    @pytest.mark.parametrize("n_rows", [1, 6, 7])
+    def test_unpacks_both_nibbles(self, n_rows, kernel_implementation):
+        rng = np.random.default_rng(7)
+        packed = rng.integers(0, 256, ((n_rows + 1) // 2, 23), dtype=np.uint8)
+        high_bytes = np.frombuffer(b"-ACGTRYSWKMBDHVN", dtype=np.uint8)[
+            np.arange(256) >> 4
+        ]
+        low_bytes = high_bytes[(np.arange(256) & 15) << 4]
+
+        matrix = kernels.unpack_nibbles(packed, high_bytes, low_bytes, n_rows)
+
+        assert matrix.shape == (n_rows, 23)
+        np.testing.assert_array_equal(matrix[0::2], high_bytes[packed])
+        np.testing.assert_array_equal(matrix[1::2], low_bytes[packed[: n_rows // 2]])
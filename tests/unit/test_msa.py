@@ -1,7 +1,11 @@
 import pytest
+import tracemalloc
 import numpy as np
 
 from Bio import AlignIO
+from clipkit import kernels
+from clipkit.exceptions import InvalidCodonAlignment
+from clipkit.modes import TrimmingMode
 from clipkit.msa import MSA
 
 
@@ -134,3 +138,127 @@ class TestMSA(object):
         msa = MSA.from_bio_msa(bio_msa)
         msa.trim(site_positions_to_trim=sites_to_trim, codon=True)
         np.testing.assert_equal(msa.trimmed, expected)
+
+    def test_keep_mask_and_trimmed_matrix(self):
+        bio_msa = get_biopython_msa("tests/unit/examples/simple.fa")
+        msa = MSA.from_bio_msa(bio_msa)
+        msa.trim(site_positions_to_trim=[1, 4])
+
+        np.testing.assert_equal(
+            msa.keep_mask, np.array([True, False, True, True, False, True])
+        )
+        np.testing.assert_equal(msa.kept_positions, np.array([0, 2, 3, 5]))
+        np.testing.assert_equal(msa.trimmed_matrix, msa.matrix[:, [0, 2, 3, 5]])
+        assert not msa.trimmed_matrix.flags.writeable
+
+    def test_trimmed_matrix_is_view_for_contiguous_sites(self):
+        bio_msa = get_biopython_msa("tests/unit/examples/simple.fa")
+        msa = MSA.from_bio_msa(bio_msa)
+        msa.trim(site_positions_to_trim=[0, 5])
+
+        assert np.shares_memory(msa.trimmed_matrix, msa.matrix)
+        np.testing.assert_equal(msa.trimmed_matrix, msa.matrix[:, 1:5])
+
+    def test_trim_codons_when_no_sites_are_trimmed(self):
+        bio_msa = get_biopython_msa("tests/unit/examples/simple.fa")
+        msa = MSA.from_bio_msa(bio_msa)
+        msa.trim(site_positions_to_trim=[], codon=True)
+        np.testing.assert_equal(msa.trimmed, msa.seq_records)
+
+    def test_trim_codons_of_protein(self):
+        codons = MSA.from_matrix(
+            np.array([list("ATGAAA---TAA"), list("ATGAAGCCCTGA")]), ["b", "a"]
+        )
+        protein = MSA.from_matrix(np.array([list("MKP*"), list("MK-*")]), ["a", "b"])
+        protein.trim(site_positions_to_trim=[1, 2])
+
+        codons.trim_codons_of(protein)
+
+        np.testing.assert_equal(codons.kept_positions, [0, 1, 2, 9, 10, 11])
+
+    @pytest.mark.parametrize(
+        "ids, protein_sites",
+        [(["a", "c"], "MKP*"), (["a", "b"], "MKP")],
+    )
+    def test_trim_codons_of_mismatched_protein(self, ids, protein_sites):
+        codons = MSA.from_matrix(
+            np.array([list("ATGAAA---TAA"), list("ATGAAGCCCTGA")]), ["a", "b"]
+        )
+        protein = MSA.from_matrix(np.array([list(protein_sites)] * 2), ids)
+        protein.trim(site_positions_to_trim=[])
+
+        with pytest.raises(InvalidCodonAlignment):
+            codons.trim_codons_of(protein)
+
+    @pytest.mark.parametrize(
+        "mode",
+        [TrimmingMode.kpic_smart_gap, TrimmingMode.kpi_gappy, TrimmingMode.kpic],
+    )
+    def test_site_patterns_give_identical_results(self, mode, monkeypatch):
+        rng = np.random.default_rng(4)
+        matrix = np.repeat(rng.choice(list("ACGT"), (1, 3000)), 10, axis=0)
+        variable = rng.choice(3000, 300, replace=False)
+        matrix[:, variable] = rng.choice(list("ACGT-"), (10, 300))
+
+        per_column = MSA.from_matrix(matrix, gap_chars=["-"])
+        per_column.trim(mode, gap_threshold=0.2)
+
+        monkeypatch.setattr(kernels, "MIN_SITES_FOR_PATTERNS", 1)
+        per_pattern = MSA.from_matrix(matrix, gap_chars=["-"])
+        per_pattern.trim(mode, gap_threshold=0.2)
+
+        assert per_pattern.site_patterns is not None
+        assert per_column.site_patterns is None
+        np.testing.assert_equal(
+            per_pattern.column_state_counts, per_column.column_state_counts
+        )
+        np.testing.assert_equal(
+            per_pattern.site_classification_types,
+            per_column.site_classification_types,
+        )
+        np.testing.assert_equal(per_pattern.keep_mask, per_column.keep_mask)
+
+    @pytest.mark.parametrize(
+        "mode",
+        [TrimmingMode.kpic_smart_gap, TrimmingMode.kpi_gappy, TrimmingMode.gappy],
+    )
+    def test_duplicate_sequences_give_identical_results(self, mode):
+        bio_msa = get_biopython_msa("tests/unit/examples/EOG091N44M8_aa.fa")
+        msa = MSA.from_bio_msa(bio_msa)
+        duplicated = MSA.from_matrix(np.repeat(msa.matrix[:12], [1, 4] * 6, axis=0))
+        expected = MSA.from_matrix(duplicated.matrix.copy())
+        expected._unique_rows_checked = True
+
+        for alignment in (duplicated, expected):
+            alignment.gap_chars = ["-", "?", "*", "X", "x"]
+            alignment.column_state_counts
+            alignment.trim(mode, gap_threshold=0.2)
+
+        assert duplicated.unique_rows is not None
+        assert expected.unique_rows is None
+        np.testing.assert_equal(
+            duplicated.column_state_counts, expected.column_state_counts
+        )
+        np.testing.assert_equal(
+            duplicated.column_gap_counts(), expected.column_gap_counts()
+        )
+        np.testing.assert_equal(duplicated.keep_mask, expected.keep_mask)
+        np.testing.assert_equal(duplicated.trimmed_matrix, expected.trimmed_matrix)
+
+    @pytest.mark.parametrize("duplicated", [False, True])
+    def test_grouping_rows_does_not_copy_them(self, duplicated):
+        rng = np.random.default_rng(7)
+        matrix = rng.choice(np.frombuffer(b"ACGT-", dtype=np.uint8), (200, 50000))
+        if duplicated:
+            matrix = np.repeat(matrix[:50], 4, axis=0)
+        msa = MSA.from_matrix(matrix)
+
+        tracemalloc.start()
+        try:
+            unique_rows = msa.unique_rows
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert (unique_rows is not None) == duplicated
+        assert peak < matrix.nbytes / 20
@@ -0,0 +1,62 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from clipkit.parallel import background_map, bounded_map
+
+
+def square(value):
+    return value * value
+
+
+class TestBoundedMap(object):
+    def test_results_are_in_input_order(self):
+        results = bounded_map(
+            square, range(20), workers=4, executor_class=ThreadPoolExecutor
+        )
+        assert list(results) == [value * value for value in range(20)]
+
+    def test_single_worker_runs_in_process(self):
+        assert list(bounded_map(square, [1, 2, 3], workers=1)) == [1, 4, 9]
+
+    def test_inputs_are_not_read_ahead_of_max_pending(self):
+        consumed = []
+
+        def items():
+            for value in range(10):
+                consumed.append(value)
+                yield value
+
+        results = bounded_map(
+            square,
+            items(),
+            workers=2,
+            max_pending=3,
+            executor_class=ThreadPoolExecutor,
+        )
+        assert next(results) == 0
+        assert len(consumed) == 3
+        results.close()
+
+
+class TestBackgroundMap(object):
+    def test_runs_on_another_thread_in_input_order(self):
+        def square_elsewhere(value):
+            assert threading.current_thread() is not threading.main_thread()
+            return square(value)
+
+        assert list(background_map(square_elsewhere, range(10))) == [
+            value * value for value in range(10)
+        ]
+
+    def test_inputs_are_not_read_ahead_of_max_pending(self):
+        consumed = []
+
+        def items():
+            for value in range(10):
+                consumed.append(value)
+                yield value
+
+        results = background_map(square, items(), max_pending=2)
+        assert next(results) == 0
+        assert len(consumed) == 2
+        results.close()
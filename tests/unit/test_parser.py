@@ -19,3 +19,17 @@ class TestParser(object):
         mode = "gappy"
         parsed = parser.parse_args([input_path, "-m", mode])
         assert parsed.mode == mode
+
+    def test_several_output_file_formats(self, parser):
+        input_path = "my/input/file.fa"
+        parsed = parser.parse_args(
+            [input_path, "-of", "fasta", "-of", "phylip_relaxed", "-m", "gappy"]
+        )
+        assert parsed.output_file_format == ["fasta", "phylip_relaxed"]
+        assert parsed.mode == "gappy"
+
+    def test_output_file_format_before_input(self, parser):
+        input_path = "my/input/file.fa"
+        parsed = parser.parse_args(["-of", "fasta", input_path, "-o", "out"])
+        assert parsed.input == input_path
+        assert parsed.output_file_format == ["fasta"]
@@ -0,0 +1,69 @@
+import json
+import tracemalloc
+
+from clipkit.profiling import StageProfile, StageTiming
+
+
+class TestStageProfile(object):
+    def test_stage_records_in_order(self):
+        profile = StageProfile()
+        with profile.stage("read", 100, "bytes"):
+            pass
+        with profile.stage("trim", 10) as stage:
+            stage.processed = 20
+
+        assert [stage.name for stage in profile.stages] == ["read", "trim"]
+        assert profile.stages[0].unit == "bytes"
+        assert profile.stages[1].processed == 20
+        assert all(stage.wall_time >= 0 for stage in profile.stages)
+
+    def test_stage_recorded_when_body_raises(self):
+        profile = StageProfile()
+        try:
+            with profile.stage("read"):
+                raise ValueError()
+        except ValueError:
+            pass
+
+        assert [stage.name for stage in profile.stages] == ["read"]
+
+    def test_throughput(self):
+        assert StageTiming("trim", wall_time=2.0, processed=10).throughput == 5.0
+        assert StageTiming("trim", wall_time=0.0, processed=10).throughput == 0.0
+
+    def test_save(self, tmp_path):
+        profile = StageProfile([StageTiming("read", 1.0, 0.5, 100, "bytes")])
+        path = tmp_path / "profile.json"
+
+        profile.save(str(path))
+
+        assert json.loads(path.read_text()) == [
+            {
+                "name": "read",
+                "wall_time": 1.0,
+                "cpu_time": 0.5,
+                "processed": 100,
+                "unit": "bytes",
+                "throughput": 100.0,
+            }
+        ]
+
+    def test_trace_memory(self):
+        profile = StageProfile(trace_memory=True)
+        with profile.stage("allocate"):
+            data = bytearray(1 << 20)
+        tracemalloc.stop()
+
+        stage = profile.stages[0]
+        assert stage.allocated_peak >= len(data)
+        assert stage.allocated_net >= len(data)
+        assert stage.peak_rss > 0
+        assert profile.memory_summary[0]["name"] == "allocate"
+
+    def test_memory_not_traced_by_default(self):
+        profile = StageProfile()
+        with profile.stage("read"):
+            pass
+
+        assert profile.stages[0].peak_rss is None
+        assert profile.stages[0].allocated_peak is None
@@ -0,0 +1,230 @@
+import io
+import tracemalloc
+
+import pytest
+import numpy as np
+
+from clipkit.modes import TrimmingMode
+from clipkit.msa import MSA
+from clipkit.settings import DEFAULT_NT_GAP_CHARS
+from clipkit.storage import ByteMatrix, NibbleMatrix, SparseRows
+
+
+def nucleotide_matrix(n_rows, n_columns=37):
+    rng = np.random.default_rng(n_rows)
+    return rng.choice(np.frombuffer(b"ACGT-NRY", dtype=np.uint8), (n_rows, n_columns))
+
+
+class TestNibbleMatrix(object):
+    @pytest.mark.parametrize("n_rows", [1, 2, 7, 10])
+    def test_round_trip(self, n_rows):
+        matrix = nucleotide_matrix(n_rows)
+        packed = NibbleMatrix.pack(matrix)
+
+        assert packed.shape == matrix.shape
+        assert packed.packed.nbytes == (n_rows + 1) // 2 * matrix.shape[1]
+        np.testing.assert_array_equal(packed.take(), matrix)
+
+    @pytest.mark.parametrize("start, stop", [(0, 3), (1, 4), (3, None), (6, 7)])
+    def test_rows(self, start, stop):
+        matrix = nucleotide_matrix(7)
+
+        np.testing.assert_array_equal(
+            NibbleMatrix.pack(matrix).rows(start, stop), matrix[start:stop]
+        )
+
+    def test_take(self):
+        matrix = nucleotide_matrix(7)
+        packed = NibbleMatrix.pack(matrix)
+        positions = np.array([0, 5, 6, 30])
+        rows = np.array([0, 3, 6])
+
+        np.testing.assert_array_equal(packed.take(positions), matrix[:, positions])
+        np.testing.assert_array_equal(packed.take(slice(2, 9)), matrix[:, 2:9])
+        np.testing.assert_array_equal(
+            packed.take(positions, rows), matrix[np.ix_(rows, positions)]
+        )
+
+    @pytest.mark.parametrize("n_rows", [1, 6, 7])
+    @pytest.mark.parametrize("gap_chars", [DEFAULT_NT_GAP_CHARS, ["-", "N"], ["?"]])
+    def test_counts_match_byte_matrix(self, n_rows, gap_chars):
+        matrix = nucleotide_matrix(n_rows)
+        packed, dense = NibbleMatrix.pack(matrix), ByteMatrix(matrix)
+        positions = np.array([1, 2, 3, 20])
+
+        for columns in (slice(None), positions):
+            states, counts = packed.state_counts(gap_chars, columns)
+            expected_states, expected_counts = dense.state_counts(gap_chars, columns)
+            np.testing.assert_array_equal(states, expected_states)
+            np.testing.assert_array_equal(counts, expected_counts)
+            np.testing.assert_array_equal(
+                packed.gap_counts(gap_chars, columns),
+                dense.gap_counts(gap_chars, columns),
+            )
+
+    @pytest.mark.parametrize("residue", [b"a", b"?", b"U", b"X"])
+    def test_characters_without_code_are_not_packed(self, residue):
+        matrix = nucleotide_matrix(4)
+        matrix[2, 5] = ord(residue)
+
+        assert NibbleMatrix.pack(matrix) is None
+
+
+def gappy_matrix(n_rows, n_columns=41):
+    rng = np.random.default_rng(n_rows)
+    matrix = np.full((n_rows, n_columns), ord("-"), dtype=np.uint8)
+    residues = rng.random((n_rows, n_columns)) < 0.15
+    matrix[residues] = rng.choice(
+        np.frombuffer(b"ACGTa?X", dtype=np.uint8), np.count_nonzero(residues)
+    )
+    # runs reaching either end of a row
+    matrix[0, :3] = ord("A")
+    matrix[-1, -3:] = ord("C")
+    return matrix
+
+
+def sparse_rows(matrix):
+    return SparseRows.from_rows(row.tobytes() for row in matrix)
+
+
+class TestSparseRows(object):
+    @pytest.mark.parametrize("n_rows", [1, 2, 9])
+    def test_round_trip(self, n_rows):
+        matrix = gappy_matrix(n_rows)
+        sparse = sparse_rows(matrix)
+
+        assert sparse.shape == matrix.shape
+        assert len(sparse.residues) == np.count_nonzero(matrix != ord("-"))
+        np.testing.assert_array_equal(sparse.take(), matrix)
+        np.testing.assert_array_equal(sparse.rows(2, 5), matrix[2:5])
+
+    def test_small_blocks(self, monkeypatch):
+        monkeypatch.setattr("clipkit.storage.CHUNK_CELLS", 4)
+        matrix = gappy_matrix(9)
+        sparse = sparse_rows(matrix)
+        positions = np.array([0, 1, 7, 40])
+
+        np.testing.assert_array_equal(sparse.take(positions), matrix[:, positions])
+        np.testing.assert_array_equal(
+            sparse.gap_counts(DEFAULT_NT_GAP_CHARS),
+            ByteMatrix(matrix).gap_counts(DEFAULT_NT_GAP_CHARS),
+        )
+
+    def test_take(self):
+        matrix = gappy_matrix(9)
+        sparse = sparse_rows(matrix)
+        positions = np.array([0, 5, 6, 40])
+        rows = np.array([0, 3, 8])
+
+        np.testing.assert_array_equal(sparse.take(positions), matrix[:, positions])
+        np.testing.assert_array_equal(sparse.take(slice(2, 9)), matrix[:, 2:9])
+        np.testing.assert_array_equal(
+            sparse.take(positions, rows), matrix[np.ix_(rows, positions)]
+        )
+
+    @pytest.mark.parametrize("gap_chars", [DEFAULT_NT_GAP_CHARS, ["?"], ["A", "-"]])
+    def test_counts_match_byte_matrix(self, gap_chars):
+        matrix = gappy_matrix(9)
+        sparse, dense = sparse_rows(matrix), ByteMatrix(matrix)
+
+        for columns in (slice(None), np.array([0, 1, 2, 30]), slice(3, 5)):
+            states, counts = sparse.state_counts(gap_chars, columns)
+            expected_states, expected_counts = dense.state_counts(gap_chars, columns)
+            np.testing.assert_array_equal(states, expected_states)
+            np.testing.assert_array_equal(counts, expected_counts)
+            np.testing.assert_array_equal(
+                sparse.gap_counts(gap_chars, columns),
+                dense.gap_counts(gap_chars, columns),
+            )
+
+    def test_rows_of_different_lengths(self):
+        with pytest.raises(ValueError):
+            SparseRows.from_rows([b"A--", b"A-"])
+
+    def test_mostly_gaps_fasta_is_read_sparse(self):
+        rows = [b"A" + b"-" * 39, b"-" * 39 + b"C", b"-" * 40]
+        data = b"".join(b">%d\n%s\n" % (idx, row) for idx, row in enumerate(rows))
+
+        msa = MSA.from_fasta_bytes(data)
+
+        assert isinstance(msa._storage, SparseRows)
+        np.testing.assert_array_equal(
+            msa.matrix, np.frombuffer(b"".join(rows), np.uint8).reshape(3, 40)
+        )
+        assert [info["id"] for info in msa.header_info] == ["0", "1", "2"]
+
+    def test_trimming_does_not_make_rows_dense(self):
+        # identical rows, which dense storage would count once per group
+        matrix = np.repeat(gappy_matrix(500, 5000), 4, axis=0)
+        matrix[:, 5:] = ord("-")
+        header_info = [
+            {"id": str(row), "name": str(row), "description": str(row)}
+            for row in range(len(matrix))
+        ]
+        sparse = MSA(header_info, sparse_rows(matrix), DEFAULT_NT_GAP_CHARS)
+
+        tracemalloc.start()
+        try:
+            sparse.trim(TrimmingMode.kpic_gappy, gap_threshold=0.9)
+            trimmed = sparse.to_bio_msa()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert sparse.unique_rows is None
+        assert peak < matrix.nbytes / 4
+        dense = MSA(header_info, matrix, DEFAULT_NT_GAP_CHARS)
+        dense.trim(TrimmingMode.kpic_gappy, gap_threshold=0.9)
+        assert [bytes(record.seq) for record in trimmed] == [
+            bytes(record.seq) for record in dense.to_bio_msa()
+        ]
+
+
+class TestPackedMSA(object):
+    @pytest.mark.parametrize(
+        "mode",
+        [TrimmingMode.smart_gap, TrimmingMode.kpic_gappy, TrimmingMode.kpi],
+    )
+    def test_packed_alignment_trims_and_writes_the_same(self, mode):
+        matrix = nucleotide_matrix(9, 200)
+        unpacked = MSA.from_matrix(matrix, gap_chars=DEFAULT_NT_GAP_CHARS)
+        packed = MSA.from_matrix(matrix.copy(), gap_chars=DEFAULT_NT_GAP_CHARS)
+        assert packed.pack_nucleotides()
+
+        for msa in (unpacked, packed):
+            msa.trim(mode, gap_threshold=0.3)
+
+        assert packed.is_packed
+        self.assert_same_output(packed, unpacked)
+
+    @pytest.mark.parametrize(
+        "mode",
+        [TrimmingMode.smart_gap, TrimmingMode.kpic_gappy, TrimmingMode.kpi],
+    )
+    def test_sparse_alignment_trims_and_writes_the_same(self, mode):
+        matrix = gappy_matrix(12, 200)
+        header_info = [
+            {"id": str(row), "name": str(row), "description": str(row)}
+            for row in range(len(matrix))
+        ]
+        dense = MSA(header_info, matrix, DEFAULT_NT_GAP_CHARS)
+        sparse = MSA(header_info, sparse_rows(matrix), DEFAULT_NT_GAP_CHARS)
+
+        for msa in (dense, sparse):
+            msa.trim(mode, gap_threshold=0.9)
+
+        assert not sparse.pack_nucleotides()
+        assert sparse.is_any_entry_sequence_only_gaps() == (
+            dense.is_any_entry_sequence_only_gaps()
+        )
+        self.assert_same_output(sparse, dense)
+
+    @staticmethod
+    def assert_same_output(packed, unpacked):
+        np.testing.assert_array_equal(packed.keep_mask, unpacked.keep_mask)
+        np.testing.assert_array_equal(packed.trimmed_matrix, unpacked.trimmed_matrix)
+        for complement in (False, True):
+            expected, output = io.BytesIO(), io.BytesIO()
+            unpacked.write_fasta(expected, complement)
+            packed.write_fasta(output, complement)
+            assert output.getvalue() == expected.getvalue()
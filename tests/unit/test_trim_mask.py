@@ -0,0 +1,28 @@
+import pytest
+import numpy as np
+
+from clipkit.exceptions import InvalidTrimMask
+from clipkit.msa import MSA
+from clipkit.trim_mask import TrimMask
+
+
+class TestTrimMask(object):
+    @pytest.mark.parametrize("length", [1, 8, 13])
+    def test_save_and_load(self, tmp_path, length):
+        keep_mask = np.random.default_rng(length).random(length) < 0.5
+        path = str(tmp_path / "mask.npz")
+        TrimMask(keep_mask).save(path)
+
+        loaded = TrimMask.load(path)
+
+        np.testing.assert_array_equal(loaded.keep_mask, keep_mask)
+
+    def test_trimmed_positions(self):
+        msa = MSA.from_matrix(np.array([list("AC-GT"), list("A--GA")]))
+        msa.trim(site_positions_to_trim=[1, 2])
+
+        mask = TrimMask.from_msa(msa)
+
+        np.testing.assert_array_equal(mask.trimmed_positions(msa), [1, 2])
+        with pytest.raises(InvalidTrimMask):
+            mask.trimmed_positions(MSA.from_matrix(np.array([list("ACGT")])))